@@ -5,29 +5,120 @@ https://github.com/Megabytemb/ha-facebook-messenger
 """
 from __future__ import annotations
 
+import asyncio
+from collections.abc import Awaitable
 import logging
+import time
+from typing import TypeVar
+
+import voluptuous as vol
 
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.const import CONF_NAME, Platform
-from homeassistant.core import HomeAssistant
-from homeassistant.helpers import aiohttp_client, config_entry_oauth2_flow, discovery
+from homeassistant.const import CONF_NAME, EVENT_HOMEASSISTANT_STOP, Platform
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers import (
+    config_entry_oauth2_flow,
+    device_registry as dr,
+    discovery,
+    entity_registry as er,
+)
+import homeassistant.helpers.config_validation as cv
+from homeassistant.helpers.start import async_at_started
 
-from .api import Facebook
-from .const import DOMAIN
+from .api import BASE_API, Facebook
+from .const import (
+    CONF_APPS,
+    CONF_CONNECT_TIMEOUT,
+    CONF_CONNECTION,
+    CONF_CONNECTION_LIMIT,
+    CONF_CONNECTION_LIMIT_PER_HOST,
+    CONF_DNS_CACHE_TTL,
+    CONF_GRAPH_URL,
+    CONF_KEEPALIVE_TIMEOUT,
+    CONF_METRICS,
+    CONF_READ_TIMEOUT,
+    CONF_SEND_CONCURRENCY,
+    CONF_WEBHOOK_OVERFLOW,
+    CONF_WEBHOOK_QUEUE_SIZE,
+    CONF_WEBHOOK_RECORD,
+    CONF_WEBHOOK_WORKERS,
+    DATA_PLATFORM_CONFIG,
+    DATA_RECORDER,
+    DATA_WEBHOOKS,
+    DEFAULT_METRICS,
+    DOMAIN,
+)
 from .coordinator import FacebookDataUpdateCoordinator
-from .webhook import async_setup_webhook, async_unload_webhook
+from .metrics import Metrics
+from .recorder import WebhookRecorder
+from .services import async_setup_services
+from .session import async_get_session, async_release_session
+from .webhook import async_attach_webhook, async_unload_webhook
+from .work_queue import OVERFLOW_POLICIES
 
 _LOGGER = logging.getLogger(__name__)
 
+_T = TypeVar("_T")
+
 PLATFORMS: list[Platform] = [
     Platform.BUTTON,
 ]
 
+# Defaults are applied where the options are used, so that connection
+# options set for an app only override the ones actually given
+CONNECTION_SCHEMA = vol.Schema(
+    {
+        vol.Optional(CONF_CONNECTION_LIMIT): cv.positive_int,
+        vol.Optional(CONF_CONNECTION_LIMIT_PER_HOST): cv.positive_int,
+        vol.Optional(CONF_KEEPALIVE_TIMEOUT): cv.positive_float,
+        vol.Optional(CONF_DNS_CACHE_TTL): cv.positive_int,
+        vol.Optional(CONF_CONNECT_TIMEOUT): cv.positive_float,
+        vol.Optional(CONF_READ_TIMEOUT): cv.positive_float,
+    }
+)
+
+APP_SCHEMA = vol.Schema({vol.Optional(CONF_CONNECTION): CONNECTION_SCHEMA})
+
+CONFIG_SCHEMA = vol.Schema(
+    {
+        DOMAIN: vol.Schema(
+            {
+                vol.Optional(CONF_SEND_CONCURRENCY): vol.All(
+                    vol.Coerce(int), vol.Range(min=1)
+                ),
+                vol.Optional(CONF_WEBHOOK_QUEUE_SIZE): vol.All(
+                    vol.Coerce(int), vol.Range(min=1)
+                ),
+                vol.Optional(CONF_WEBHOOK_WORKERS): vol.All(
+                    vol.Coerce(int), vol.Range(min=1)
+                ),
+                vol.Optional(CONF_WEBHOOK_OVERFLOW): vol.In(OVERFLOW_POLICIES),
+                vol.Optional(CONF_METRICS): cv.boolean,
+                vol.Optional(CONF_CONNECTION): CONNECTION_SCHEMA,
+                vol.Optional(CONF_APPS): {cv.string: APP_SCHEMA},
+                vol.Optional(CONF_GRAPH_URL): cv.url,
+                vol.Optional(CONF_WEBHOOK_RECORD): cv.string,
+            }
+        )
+    },
+    extra=vol.ALLOW_EXTRA,
+)
+
 
 async def async_setup(hass: HomeAssistant, config) -> bool:
     """Initialize the webhook component."""
     hass.data.setdefault(DOMAIN, {})
-    hass.data[DOMAIN]["platform_config"] = config.get(DOMAIN, {})
+    hass.data[DOMAIN][DATA_PLATFORM_CONFIG] = config.get(DOMAIN, {})
+    hass.data[DOMAIN].setdefault(DATA_WEBHOOKS, {})
+
+    if record_path := hass.data[DOMAIN][DATA_PLATFORM_CONFIG].get(CONF_WEBHOOK_RECORD):
+        recorder = hass.data[DOMAIN][DATA_RECORDER] = WebhookRecorder(
+            hass, hass.config.path(record_path)
+        )
+        hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, recorder.async_close)
+        _LOGGER.warning("Recording Facebook webhooks to %s", recorder.path)
+
+    async_setup_services(hass)
 
     return True
 
@@ -42,38 +133,79 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     )
 
     token = entry.data["token"]
-    client_session = aiohttp_client.async_get_clientsession(hass)
+    shared = async_get_session(hass, implementation.client_id)
+
+    platform_config = hass.data[DOMAIN][DATA_PLATFORM_CONFIG]
+    metrics_enabled = platform_config.get(CONF_METRICS, DEFAULT_METRICS)
 
     facebook = Facebook(
-        client_session=client_session,
+        client_session=shared.session,
         oauth_implementation=implementation,
         token=token,
+        rate_limiter=shared.rate_limiter,
+        circuit_breaker=shared.circuit_breaker,
+        metrics=Metrics() if metrics_enabled else None,
+        base_url=platform_config.get(CONF_GRAPH_URL, BASE_API),
     )
 
     coordinator = hass.data[DOMAIN][entry.entry_id] = FacebookDataUpdateCoordinator(
         hass, facebook
     )
 
-    await coordinator.async_set_page_token()
+    timings = coordinator.startup_timings
+    started = time.monotonic()
 
-    app_info = await coordinator.async_get_app_data()
     try:
-        await async_setup_webhook(hass, app_info)
-    except ValueError as exc:
-        if str(exc) == "Handler is already defined!":
-            _LOGGER.debug(
-                "Webhook Handler was already defined. Likely have "
-                "multiple pages using the same Facebook App "
-                "(or we're fresh off a Config setup)."
-            )
-        else:
-            raise exc
-
-    await coordinator.async_config_entry_first_refresh()
-
-    await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
+        # Load storage once up front, everything below reads from it
+        await _async_timed(timings, "load", coordinator.async_load())
+
+        _, app_info = await asyncio.gather(
+            _async_timed(timings, "page_token", coordinator.async_set_page_token()),
+            _async_timed(timings, "app_data", coordinator.async_get_app_data()),
+        )
+
+        results = await asyncio.gather(
+            _async_timed(
+                timings, "first_refresh", coordinator.async_config_entry_first_refresh()
+            ),
+            _async_timed(timings, "workers", coordinator.async_start_workers()),
+            return_exceptions=True,
+        )
+        if errors := [
+            result for result in results if isinstance(result, BaseException)
+        ]:
+            await coordinator.async_stop_workers()
+            raise errors[0]
+    except BaseException:
+        await async_release_session(hass, facebook.client_id)
+        raise
+
+    async_attach_webhook(hass, app_info, facebook.client_secret, coordinator)
+
+    _async_migrate_devices(hass, entry)
+    await hass.config_entries.async_forward_entry_setups(
+        entry, _async_platforms(coordinator)
+    )
     entry.async_on_unload(entry.add_update_listener(async_reload_entry))
 
+    timings["total"] = time.monotonic() - started
+    _LOGGER.debug(
+        "Set up %s in %.3fs: %s",
+        entry.title,
+        timings["total"],
+        ", ".join(f"{phase}={duration:.3f}s" for phase, duration in timings.items()),
+    )
+
+    # The app name is not needed to set up, so fetch it once Home Assistant
+    # has started rather than delaying startup with it
+    async def _async_update_app_info(_: HomeAssistant) -> None:
+        try:
+            await coordinator.async_update_app_info()
+        except Exception as exc:  # pylint: disable=broad-except
+            _LOGGER.warning("Failed to fetch Facebook app info: %s", exc)
+
+    entry.async_on_unload(async_at_started(hass, _async_update_app_info))
+
     hass.async_create_task(
         discovery.async_load_platform(
             hass,
@@ -83,21 +215,80 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
                 "entry_id": entry.entry_id,
                 CONF_NAME: f"{DOMAIN}_{entry.data['page_name']}",
             },
-            hass.data[DOMAIN]["platform_config"],
+            hass.data[DOMAIN][DATA_PLATFORM_CONFIG],
         )
     )
 
     return True
 
 
+@callback
+def _async_migrate_devices(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Merge the devices of an entry into one device keyed on the entry id.
+
+    Devices used to be keyed on the unique id of each entity. The first of them
+    takes the new identifier, keeping its id, name and area, and the entities
+    of the others are moved onto it before they are removed.
+    """
+    device_registry = dr.async_get(hass)
+    entity_registry = er.async_get(hass)
+    identifier = (DOMAIN, entry.entry_id)
+
+    old_devices = [
+        device
+        for device in dr.async_entries_for_config_entry(device_registry, entry.entry_id)
+        if identifier not in device.identifiers
+    ]
+    if not old_devices:
+        return
+
+    if (device := device_registry.async_get_device({identifier})) is None:
+        device = device_registry.async_update_device(
+            old_devices.pop(0).id, new_identifiers={identifier}
+        )
+
+    for old_device in old_devices:
+        for entity in er.async_entries_for_device(
+            entity_registry, old_device.id, include_disabled_entities=True
+        ):
+            entity_registry.async_update_entity(entity.entity_id, device_id=device.id)
+        device_registry.async_remove_device(old_device.id)
+
+    _LOGGER.debug("Migrated the devices of %s to %s", entry.title, device.id)
+
+
+@callback
+def _async_platforms(coordinator: FacebookDataUpdateCoordinator) -> list[Platform]:
+    """Return the platforms of an entry, with sensors only when metrics are on."""
+    if coordinator.fb.metrics is None:
+        return PLATFORMS
+    return [*PLATFORMS, Platform.SENSOR]
+
+
+async def _async_timed(
+    timings: dict[str, float], phase: str, awaitable: Awaitable[_T]
+) -> _T:
+    """Await a setup phase, recording how long it took."""
+    started = time.monotonic()
+    try:
+        return await awaitable
+    finally:
+        timings[phase] = time.monotonic() - started
+
+
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Handle removal of an entry."""
     coordinator = hass.data[DOMAIN][entry.entry_id]
-    app_info = await coordinator.async_get_app_data()
-    async_unload_webhook(hass, app_info)
 
-    if unloaded := await hass.config_entries.async_unload_platforms(entry, PLATFORMS):
+    if unloaded := await hass.config_entries.async_unload_platforms(
+        entry, _async_platforms(coordinator)
+    ):
         hass.data[DOMAIN].pop(entry.entry_id)
+
+        app_info = await coordinator.async_get_app_data()
+        async_unload_webhook(hass, app_info, coordinator)
+        await coordinator.async_stop_workers()
+        await async_release_session(hass, coordinator.fb.client_id)
     return unloaded
 
 
@@ -1,7 +1,16 @@
 """Facebook API Module."""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import AsyncIterator, Awaitable, Callable
+from contextlib import suppress
+from dataclasses import dataclass, replace
 import hashlib
 import hmac
+import json
 import time
+from typing import Any, BinaryIO
+from urllib.parse import urlencode
 
 import aiohttp
 
@@ -9,59 +18,195 @@ from homeassistant.helpers.config_entry_oauth2_flow import (
     AbstractOAuth2Implementation,
 )
 
+from .const import PAGE_CHANGE_FIELDS
+from .metrics import Metrics
+from .ratelimit import RateLimiter
+from .response_cache import ResponseCache
+from .retry import (
+    GET_RETRY_POLICY,
+    SEND_RETRY_POLICY,
+    CircuitBreaker,
+    RetryPolicy,
+    async_retry,
+)
+
 BASE_API = "https://graph.facebook.com/v17.0"
 
+PAGE_FIELDS = "link,name,id,app_id,followers_count"
+APP_FIELDS = "link,name,id,photo_url,weekly_active_users"
+
+# Number of items requested per page when iterating over a collection
+DEFAULT_PAGE_SIZE = 100
+
+# Maximum number of operations Graph accepts in a single batch request
+BATCH_LIMIT = 50
+
+# oddly, sometimes we seem to be ahead of facebook? so we'll knock a couple seconds off
+APPSECRET_TIME_SKEW = 5
+
+# Width of the time bucket an appsecret proof is reused for. Graph only
+# accepts an appsecret_time close to its own clock, so the width is capped.
+DEFAULT_PROOF_BUCKET_SECONDS = 30
+MAX_PROOF_BUCKET_SECONDS = 120
+
+# How long cached GET responses are used before being revalidated. Page data
+# is always revalidated, as a refresh is usually requested because it changed.
+PAGE_CACHE_TTL = 0
+APP_CACHE_TTL = 60 * 60
+
+# Streamed request bodies cannot be sent twice
+STREAMING_RETRY_POLICY = replace(SEND_RETRY_POLICY, attempts=1)
+
+# Graph error codes returned when an app, user or page is rate limited
+THROTTLING_ERROR_CODES = {4, 17, 32, 613, 80001, 80006}
+
+# Graph error code for an expired or invalidated access token
+INVALID_TOKEN_ERROR_CODE = 190
+
+# Graph error codes for temporary problems that are safe to retry
+TRANSIENT_ERROR_CODES = {1, 2, 4, 17, 341}
+
+
+class FacebookApiError(Exception):
+    """Error returned by the Graph API."""
+
+    def __init__(
+        self,
+        status: int,
+        error: dict | None = None,
+        *,
+        retry_after: float | None = None,
+    ) -> None:
+        """Init the error from a Graph error object."""
+        self.status = status
+        self.error = error or {}
+        self.code = self.error.get("code")
+        self.error_subcode = self.error.get("error_subcode")
+        self.retry_after = retry_after
+        super().__init__(self.error.get("message", f"Graph API error {status}"))
+
+    @property
+    def invalid_token(self) -> bool:
+        """Return True if the access token was rejected."""
+        return self.status == 401 or self.code == INVALID_TOKEN_ERROR_CODE
+
+    @property
+    def throttled(self) -> bool:
+        """Return True if the call was rejected by a rate limit."""
+        return self.status == 429 or self.code in THROTTLING_ERROR_CODES
+
+    @classmethod
+    async def async_from_response(
+        cls, resp: aiohttp.ClientResponse
+    ) -> FacebookApiError:
+        """Create the error from a failed Graph response."""
+        try:
+            body = await resp.json(content_type=None)
+        except ValueError:
+            body = None
+
+        retry_after = None
+        with suppress(TypeError, ValueError):
+            retry_after = float(resp.headers.get("Retry-After"))
+
+        error = body.get("error") if isinstance(body, dict) else None
+        return cls(resp.status, error, retry_after=retry_after)
+
+
+def is_retryable_error(exc: BaseException, policy: RetryPolicy) -> bool:
+    """Return True if a failed call may be retried under a retry policy."""
+    if isinstance(exc, FacebookApiError):
+        if exc.code in TRANSIENT_ERROR_CODES or exc.status == 429:
+            return True
+        return exc.status >= 500 and policy.retry_ambiguous
+
+    if isinstance(exc, aiohttp.ClientConnectorError):
+        # The connection was never made, so Graph did not see the call
+        return True
+
+    if isinstance(exc, (asyncio.TimeoutError, aiohttp.ClientError)):
+        return policy.retry_ambiguous
+
+    return False
 
-def generate_appsecret_proof(app_secret, access_token):
-    """Generate a HMAC SHA-256 hash of the access token using the app secret.
 
-    Generate a HMAC SHA-256 hash of the access token using the app secret as the key,
-    and return it along with the current timestamp.
+class AppSecretProofCache:
+    """Memoizes appsecret proofs per access token and time bucket.
+
+    All requests made with the same token inside one bucket share a proof, and
+    the HMAC key is prepared once and copied for each new proof.
     """
 
-    # Get the current timestamp as an integer
-    timestamp = int(time.time())
+    def __init__(
+        self, app_secret: str, bucket_seconds: int = DEFAULT_PROOF_BUCKET_SECONDS
+    ) -> None:
+        """Init the cache for an app secret."""
+        self._hmac = hmac.new(bytes(app_secret, "utf-8"), digestmod=hashlib.sha256)
+        self.bucket_seconds = min(max(1, bucket_seconds), MAX_PROOF_BUCKET_SECONDS)
+        self._bucket: int | None = None
+        self._proofs: dict[str, tuple[str, int]] = {}
 
-    # oddly, sometimes we seem to be ahead of facebook? so we'll knock a couple seconds off
-    timestamp = timestamp - 5
+    def get(self, access_token: str) -> tuple[str, int]:
+        """Return the proof and timestamp for an access token."""
+        bucket = int(time.time()) // self.bucket_seconds
 
-    # Prepare the message to be hashed
-    message = access_token + "|" + str(timestamp)
+        if bucket != self._bucket:
+            # Proofs from older buckets are never reused, so drop them
+            self._bucket = bucket
+            self._proofs = {}
 
-    # Create a new HMAC object with the app_secret as the key and SHA-256 as the digest algorithm
-    h = hmac.new(
-        bytes(app_secret, "utf-8"),
-        msg=bytes(message, "utf-8"),
-        digestmod=hashlib.sha256,
-    )
+        if (proof := self._proofs.get(access_token)) is None:
+            timestamp = bucket * self.bucket_seconds - APPSECRET_TIME_SKEW
+            h = self._hmac.copy()
+            h.update(bytes(f"{access_token}|{timestamp}", "utf-8"))
+            proof = self._proofs[access_token] = (h.hexdigest(), timestamp)
 
-    # Return the hexadecimal digest of the HMAC object
-    return h.hexdigest(), timestamp
+        return proof
 
 
 class Facebook:
-    """Facebook API Class."""
+    """Facebook API Class.
+
+    Holds the app credentials and tokens. Requests are made through a
+    FacebookClient bound to a single access token, obtained from user(), app()
+    or page(), so concurrent callers sharing this instance never see each
+    other's token.
+    """
 
     def __init__(
         self,
         client_session: aiohttp.ClientSession,
         oauth_implementation: AbstractOAuth2Implementation,
         token: dict,
+        *,
+        proof_bucket_seconds: int = DEFAULT_PROOF_BUCKET_SECONDS,
+        metrics: Metrics | None = None,
+        base_url: str = BASE_API,
+        rate_limiter: RateLimiter | None = None,
+        circuit_breaker: CircuitBreaker | None = None,
     ) -> None:
-        """Init Facebook API."""
+        """Init Facebook API.
+
+        rate_limiter and circuit_breaker may be shared with other instances
+        of the same app, otherwise each instance gets its own.
+        """
         self.oauth_implementation = oauth_implementation
         self.client_session = client_session
         self._token = token
-        self._access_token = None
         self._page_token = None
-        self._last_access_token_type = None
+        self._page_id = None
+        self._page_token_refresh: asyncio.Task | None = None
+        self.page_token_refresher: Callable[[], Awaitable[str]] | None = None
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()
+        self.response_cache = ResponseCache()
+        self.metrics = metrics
+        self.base_url = base_url.rstrip("/")
+        self._proof_bucket_seconds = proof_bucket_seconds
+        self._proof_cache: AppSecretProofCache | None = None
 
         self._user_token = self._token["access_token"]
 
-    def _reset_token(self):
-        """Reset access token after each use."""
-        self._access_token = None
-
     @property
     def client_id(self) -> str:
         """Shortut to app client ID."""
@@ -72,161 +217,448 @@ class Facebook:
         """Shortut to app client secret."""
         return self.oauth_implementation.client_secret
 
-    def user(self, token: str = None):
-        """Set the User Token."""
+    def user(self, token: str = None) -> FacebookClient:
+        """Return a client bound to the User Token."""
         if token is None:
             token = self._user_token
 
-        self._access_token = token
-        self._last_access_token_type = "user"
-        return self
+        return FacebookClient(self, token, f"app:{self.client_id}")
 
-    def app(self, token: str = None):
-        """Set the App Token."""
+    def app(self, token: str = None) -> FacebookClient:
+        """Return a client bound to the App Token."""
         if token is None:
             token = f"{self.client_id}|{self.client_secret}"
 
-        self._access_token = token
-        self._last_access_token_type = "app"
-        return self
+        return FacebookClient(self, token, f"app:{self.client_id}")
 
-    def page(self, token: str = None):
-        """Set the Page Token."""
+    def page(self, token: str = None) -> FacebookClient:
+        """Return a client bound to the Page Token.
+
+        When bound to the token set via set_page_token, a request rejected for
+        an invalid token refreshes the page token and is retried once.
+        """
+        page_id = None
+        refreshable = token is None
         if token is None:
             token = self._page_token
+            page_id = self._page_id
 
         if token is None:
             raise ValueError("Page token not supplied, nor set via set_page_token")
 
-        self._access_token = token
-        self._last_access_token_type = "page"
-        return self
+        return FacebookClient(self, token, f"page:{page_id}", refreshable=refreshable)
 
-    async def _get(self, url, *, params=None, **kwargs):
-        """Perform a GET request to the specified url with optional parameters."""
-        access_token = await self.get_access_token()
+    def set_page_token(self, page_token, page_id: str = None):
+        """Set the value of the page token."""
+        self._page_token = page_token
+        self._page_id = page_id
 
-        if params is None:
-            params = {}
-        params["access_token"] = access_token
+    async def async_refresh_page_token(self, stale_token: str) -> str:
+        """Replace a rejected page token using page_token_refresher.
 
-        appsecret_proof, appsecret_time = await self.async_get_app_secret_proof()
-        params["appsecret_proof"] = appsecret_proof
-        params["appsecret_time"] = appsecret_time
+        Concurrent callers share a single refresh, and a caller holding a token
+        that has already been replaced gets the new token straight away.
+        """
+        if self._page_token is not None and self._page_token != stale_token:
+            return self._page_token
 
-        resp = await self.client_session.get(url, params=params, **kwargs)
-        resp.raise_for_status()
+        if self.page_token_refresher is None:
+            raise ValueError("No page token refresher set")
 
-        self._reset_token()
+        if self._page_token_refresh is None:
+            self._page_token_refresh = asyncio.create_task(
+                self._async_refresh_page_token()
+            )
 
-        return resp
+        return await asyncio.shield(self._page_token_refresh)
 
-    async def _post(self, url, *, data=None, json=None, params=None, **kwargs):
-        """Perform a POST request to the specified url with optional payload and parameters."""
-        access_token = await self.get_access_token()
+    async def _async_refresh_page_token(self) -> str:
+        """Fetch a new page token."""
+        try:
+            self._page_token = await self.page_token_refresher()
+            return self._page_token
+        finally:
+            self._page_token_refresh = None
+
+    def get_app_secret_proof(self, access_token: str) -> tuple[str, int]:
+        """Generate the HMAC SHA-256 hash of an access token using the app secret.
+
+        Returns the proof along with the timestamp it was generated for. Proofs
+        are reused for requests made with the same token in the same time bucket.
+        """
+        if self._proof_cache is None:
+            self._proof_cache = AppSecretProofCache(
+                self.client_secret, self._proof_bucket_seconds
+            )
+
+        return self._proof_cache.get(access_token)
+
+
+def build_message_body(recipient: dict, body_message: Any) -> dict:
+    """Build the Send API body for a message to a recipient."""
+    return {
+        "recipient": recipient,
+        "message": body_message,
+        "messaging_type": "MESSAGE_TAG",
+        "tag": "ACCOUNT_UPDATE",
+    }
+
+
+class FacebookClient:
+    """Facebook API client bound to a single access token.
+
+    Instances are immutable and cheap to create, so many requests can run in
+    parallel against the same Facebook instance.
+    """
 
-        if params is None:
-            params = {}
-        params["access_token"] = access_token
+    __slots__ = ("_api", "_access_token", "_rate_limit_key", "_refreshable")
 
-        appsecret_proof, appsecret_time = await self.async_get_app_secret_proof()
+    def __init__(
+        self,
+        api: Facebook,
+        access_token: str,
+        rate_limit_key: str = "default",
+        *,
+        refreshable: bool = False,
+    ) -> None:
+        """Init the bound client."""
+        self._api = api
+        self._access_token = access_token
+        self._rate_limit_key = rate_limit_key
+        self._refreshable = refreshable
+
+    @property
+    def access_token(self) -> str:
+        """Return the access token this client is bound to."""
+        return self._access_token
+
+    @property
+    def base_url(self) -> str:
+        """Return the versioned Graph API URL requests are made to."""
+        return self._api.base_url
+
+    def _auth_params(self, params: dict | None) -> dict:
+        """Return a copy of params with the access token and appsecret proof."""
+        params = {} if params is None else dict(params)
+        params["access_token"] = self._access_token
+
+        appsecret_proof, appsecret_time = self._api.get_app_secret_proof(
+            self._access_token
+        )
         params["appsecret_proof"] = appsecret_proof
         params["appsecret_time"] = appsecret_time
 
-        resp = await self.client_session.post(
-            url, data=data, json=json, params=params, **kwargs
+        return params
+
+    async def _request(
+        self,
+        method: str,
+        url: str,
+        *,
+        retry_policy: RetryPolicy,
+        refresh_token: bool = True,
+        **kwargs,
+    ):
+        """Perform a request, retrying transient failures under retry_policy.
+
+        A request rejected for an invalid page token is sent again with a
+        refreshed token, unless refresh_token is False because its body can
+        only be sent once.
+        """
+        attempts = 0
+
+        def _attempt():
+            nonlocal attempts
+            attempts += 1
+            return self._request_once(method, url, **kwargs)
+
+        try:
+            return await async_retry(
+                _attempt,
+                policy=retry_policy,
+                is_retryable=is_retryable_error,
+                breaker=self._api.circuit_breaker,
+                acquire=self._async_acquire,
+            )
+        except FacebookApiError as err:
+            if not (
+                err.invalid_token
+                and refresh_token
+                and self._refreshable
+                and self._api.page_token_refresher is not None
+            ):
+                raise
+        finally:
+            if attempts > 1 and (metrics := self._api.metrics) is not None:
+                metrics.record_retries(method, url, attempts - 1)
+
+        access_token = await self._api.async_refresh_page_token(self._access_token)
+        client = FacebookClient(self._api, access_token, self._rate_limit_key)
+
+        return await client._request(  # pylint: disable=protected-access
+            method, url, retry_policy=retry_policy, **kwargs
         )
-        resp.raise_for_status()
 
-        self._reset_token()
+    async def _async_acquire(self, remaining: float) -> None:
+        """Wait for the rate limiter to let a call through.
 
-        return resp
+        Raises a throttling error at once if calls are held for longer than
+        remaining, the seconds left to make the call in, so the caller can
+        retry after the hold rather than wait it out.
+        """
+        rate_limiter = self._api.rate_limiter
+
+        if (held := rate_limiter.blocked_for(self._rate_limit_key)) >= remaining:
+            raise FacebookApiError(
+                429,
+                {"message": f"Calls to {self._rate_limit_key} held for {held:.0f}s"},
+                retry_after=held,
+            )
+
+        await rate_limiter.async_acquire(self._rate_limit_key)
 
-    async def async_get_app_secret_proof(self) -> tuple[str, str]:
-        """Retrieve the access token and generate its HMAC SHA-256 hash using the app secret.
+    async def _request_once(self, method: str, url: str, *, params=None, **kwargs):
+        """Perform a request, raising FacebookApiError on failure.
 
-        This method retrieves the current access token, generates a HMAC SHA-256 hash
-        of the access token using the app secret as the key, and returns it along
-        with the current timestamp.
+        The caller waits on the rate limiter first, see _request.
         """
-        access_token = await self.get_access_token()
-        appsecret_proof, timestamp = generate_appsecret_proof(
-            self.client_secret, access_token
+        rate_limiter = self._api.rate_limiter
+
+        if (metrics := self._api.metrics) is None:
+            resp = await self._api.client_session.request(
+                method, url, params=self._auth_params(params), **kwargs
+            )
+        else:
+            resp = await self._request_measured(
+                metrics, method, url, params=self._auth_params(params), **kwargs
+            )
+        rate_limiter.update(self._rate_limit_key, resp.headers)
+
+        if resp.status >= 400:
+            error = await FacebookApiError.async_from_response(resp)
+            if error.throttled:
+                # Retry no sooner than the limiter lets calls through again
+                error.retry_after = rate_limiter.throttled(
+                    self._rate_limit_key, error.retry_after
+                )
+            raise error
+
+        return resp
+
+    async def _request_measured(
+        self, metrics: Metrics, method: str, url: str, **kwargs
+    ):
+        """Perform a request, recording its latency, status and size."""
+        started = time.monotonic()
+        try:
+            resp = await self._api.client_session.request(method, url, **kwargs)
+        except Exception:
+            metrics.record_request(method, url, None, time.monotonic() - started)
+            raise
+
+        metrics.record_request(
+            method,
+            url,
+            resp.status,
+            time.monotonic() - started,
+            int(resp.request_info.headers.get("Content-Length") or 0),
+            resp.content_length or 0,
         )
+        return resp
 
-        return appsecret_proof, timestamp
+    async def _get(self, url, *, params=None, retry_policy=GET_RETRY_POLICY, **kwargs):
+        """Perform a GET request to the specified url with optional parameters."""
+        return await self._request(
+            "GET", url, params=params, retry_policy=retry_policy, **kwargs
+        )
 
-    def set_page_token(self, page_token):
-        """Set the value of the page token."""
-        self._page_token = page_token
+    async def _post(
+        self,
+        url,
+        *,
+        data=None,
+        json=None,
+        params=None,
+        retry_policy=SEND_RETRY_POLICY,
+        **kwargs,
+    ):
+        """Perform a POST request to the specified url with optional payload and parameters."""
+        return await self._request(
+            "POST",
+            url,
+            data=data,
+            json=json,
+            params=params,
+            retry_policy=retry_policy,
+            **kwargs,
+        )
 
-    async def get_access_token(self):
-        """Get the currently set access token."""
-        if self._access_token is None:
-            raise ValueError(
-                "Access token not set. Use the 'user()', 'app()', or 'page()' methods to set the access token."
-            )
-        return self._access_token
+    async def _get_json(self, url, *, params=None, ttl: float = 0):
+        """Perform a GET request through the response cache.
 
-    async def list_pages(self):
-        """Retrieve a list of pages associated with the user's account."""
-        url = BASE_API + "/me/accounts"
-        resp = await self._get(url)
+        A cached body younger than ttl is returned without a request, an older
+        one is revalidated with its ETag and reused if Graph reports it as not
+        modified.
+        """
+        cache = self._api.response_cache
+        key = (self._rate_limit_key, url, tuple(sorted((params or {}).items())))
+
+        cached = cache.get(key)
+        if cached is not None and cached.fresh:
+            cache.hits += 1
+            return cached.body
+
+        headers = None
+        if cached is not None and cached.etag:
+            headers = {"If-None-Match": cached.etag}
+
+        resp = await self._get(url, params=params, headers=headers)
+
+        etag = resp.headers.get("ETag")
+        if resp.status == 304 and cached is not None:
+            resp.release()
+            cache.revalidated += 1
+            body = cached.body
+            # A 304 need not repeat the ETag, which still identifies the body
+            etag = etag or cached.etag
+        else:
+            cache.misses += 1
+            body = await resp.json()
+
+        cache.set(key, body, etag, ttl)
+        return body
+
+    def batch(self) -> GraphBatch:
+        """Start a batch of requests made with this client's token."""
+        return GraphBatch(self)
+
+    async def iter_collection(
+        self,
+        path: str,
+        *,
+        fields: str | None = None,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        params: dict | None = None,
+    ) -> AsyncIterator[dict]:
+        """Iterate over the items of a Graph collection.
+
+        Pages are fetched lazily by following the after cursor, so a caller
+        that stops iterating early never requests the remaining pages.
+        """
+        url = self.base_url + path
+        params = {**(params or {}), "limit": page_size}
+        if fields:
+            params["fields"] = fields
 
-        return await resp.json()
+        while True:
+            resp = await self._get(url, params=params)
+            body = await resp.json()
+
+            for item in body.get("data", []):
+                yield item
+
+            paging = body.get("paging", {})
+            after = paging.get("cursors", {}).get("after")
+            if not paging.get("next") or not after:
+                return
+
+            params = {**params, "after": after}
+
+    def iter_pages(
+        self, *, fields: str | None = None, page_size: int = DEFAULT_PAGE_SIZE
+    ) -> AsyncIterator[dict]:
+        """Iterate over the pages associated with the user's account."""
+        return self.iter_collection("/me/accounts", fields=fields, page_size=page_size)
+
+    async def list_pages(self):
+        """Retrieve a list of all pages associated with the user's account."""
+        return {"data": [page async for page in self.iter_pages()]}
 
     async def get_page(self, page_id: str):
         """Retrieve a list of pages associated with the user's account."""
-        url = BASE_API + f"/{page_id}"
-        params = {"fields": "link,name,id,app_id,followers_count"}
-
-        resp = await self._get(url, params=params)
+        url = self.base_url + f"/{page_id}"
+        params = {"fields": PAGE_FIELDS}
 
-        return await resp.json()
+        return await self._get_json(url, params=params, ttl=PAGE_CACHE_TTL)
 
     async def get_app_info(self, app_id: str):
         """Get information about a Facebook app.."""
-        url = BASE_API + f"/{app_id}"
-        params = {"fields": "link,name,id,photo_url,weekly_active_users"}
+        url = self.base_url + f"/{app_id}"
+        params = {"fields": APP_FIELDS}
 
-        resp = await self._get(url, params=params)
-
-        return await resp.json()
+        return await self._get_json(url, params=params, ttl=APP_CACHE_TTL)
 
     async def setup_page_subscription(self, page_id: str):
         """Set up a subscription to receive messages from a specific Facebook page."""
-        url = BASE_API + f"/{page_id}/subscribed_apps"
+        url = self.base_url + f"/{page_id}/subscribed_apps"
 
-        params = {"subscribed_fields": "messages"}
+        params = {"subscribed_fields": ",".join(("messages", *PAGE_CHANGE_FIELDS))}
         resp = await self._post(url, params=params)
 
         return await resp.json()
 
     async def send_message(self, page_id: str, recipient: str, body_message: any):
         """Set up a subscription to receive messages from a specific Facebook page."""
-        url = BASE_API + f"/{page_id}/messages"
+        url = self.base_url + f"/{page_id}/messages"
 
-        body = {
-            "recipient": recipient,
-            "message": body_message,
-            "messaging_type": "MESSAGE_TAG",
-            "tag": "ACCOUNT_UPDATE",
-        }
+        body = build_message_body(recipient, body_message)
 
         resp = await self._post(url, json=body)
 
         return await resp.json()
 
+    async def upload_attachment(
+        self,
+        page_id: str,
+        attachment_type: str,
+        *,
+        url: str | None = None,
+        file: BinaryIO | None = None,
+        filename: str | None = None,
+        content_type: str | None = None,
+    ) -> str:
+        """Upload a reusable attachment, returning its attachment ID.
+
+        The attachment is either fetched by Facebook from url, or streamed
+        from file. A streamed upload is not retried, nor sent again with a
+        refreshed page token, as the file has already been consumed.
+        """
+        endpoint = self.base_url + f"/{page_id}/message_attachments"
+
+        payload: dict[str, Any] = {"is_reusable": True}
+        if url is not None:
+            payload["url"] = url
+        message = json.dumps(
+            {"attachment": {"type": attachment_type, "payload": payload}}
+        )
+
+        if file is None:
+            resp = await self._post(endpoint, data={"message": message})
+        else:
+            form = aiohttp.FormData()
+            form.add_field("message", message)
+            form.add_field(
+                "filedata", file, filename=filename, content_type=content_type
+            )
+            resp = await self._post(
+                endpoint,
+                data=form,
+                retry_policy=STREAMING_RETRY_POLICY,
+                refresh_token=False,
+            )
+
+        return (await resp.json())["attachment_id"]
+
     async def setup_subscription(
         self, app_id: str, callback_url: str, verify_token: str
     ):
         """Set up a subscription to receive messages from the specified app with a callback url and verification token."""
-        url = BASE_API + f"/{app_id}/subscriptions"
+        url = self.base_url + f"/{app_id}/subscriptions"
 
         body = {
             "object": "page",
             "callback_url": callback_url,
-            "fields": ["messages"],
+            "fields": ["messages", *PAGE_CHANGE_FIELDS],
             "include_values": True,
             "verify_token": verify_token,
         }
@@ -241,7 +673,7 @@ class Facebook:
         Given a user ID for a bot in Messenger, retrieve the IDs for apps owned by the same business
         """
 
-        url = BASE_API + f"/{user_psid}/ids_for_apps"
+        url = self.base_url + f"/{user_psid}/ids_for_apps"
 
         resp = await self._get(url)
 
@@ -252,7 +684,7 @@ class Facebook:
 
         Given a user ID for an app, retrieve the IDs for bots in Messenger owned by the same business
         """
-        url = BASE_API + f"/{user_asid}/ids_for_pages"
+        url = self.base_url + f"/{user_asid}/ids_for_pages"
 
         params = {}
         if page_id:
@@ -261,3 +693,116 @@ class Facebook:
         resp = await self._get(url, params=params)
 
         return await resp.json()
+
+
+@dataclass
+class GraphBatchResponse:
+    """Result of a single operation in a batch request."""
+
+    code: int
+    body: Any
+
+    @property
+    def ok(self) -> bool:
+        """Return True if the operation succeeded."""
+        return 200 <= self.code < 300
+
+    @property
+    def error(self) -> FacebookApiError | None:
+        """Return the error of a failed operation."""
+        if self.ok:
+            return None
+
+        error = self.body.get("error") if isinstance(self.body, dict) else None
+        return FacebookApiError(self.code, error)
+
+
+class GraphBatch:
+    """Collects up to BATCH_LIMIT Graph operations and sends them in one request.
+
+    Operations are run by Graph with the access token of the client that
+    created the batch, and execute() returns one GraphBatchResponse per
+    operation in the order they were added.
+    """
+
+    def __init__(self, client: FacebookClient) -> None:
+        """Init an empty batch."""
+        self._client = client
+        self._operations: list[dict] = []
+
+    def __len__(self) -> int:
+        """Return the number of queued operations."""
+        return len(self._operations)
+
+    def add(
+        self,
+        method: str,
+        relative_url: str,
+        *,
+        params: dict | None = None,
+        body: dict | None = None,
+    ) -> int:
+        """Queue an operation and return its index in the results."""
+        if len(self._operations) >= BATCH_LIMIT:
+            raise ValueError(f"A batch can hold at most {BATCH_LIMIT} operations")
+
+        if params:
+            relative_url = f"{relative_url}?{urlencode(params)}"
+
+        operation = {"method": method, "relative_url": relative_url}
+
+        if body is not None:
+            # Batch bodies are form encoded, with nested values as JSON
+            operation["body"] = urlencode(
+                {
+                    key: value if isinstance(value, str) else json.dumps(value)
+                    for key, value in body.items()
+                }
+            )
+
+        self._operations.append(operation)
+        return len(self._operations) - 1
+
+    def get_page(self, page_id: str) -> int:
+        """Queue a get_page operation."""
+        return self.add("GET", page_id, params={"fields": PAGE_FIELDS})
+
+    def send_message(self, page_id: str, recipient: dict, body_message: Any) -> int:
+        """Queue a send_message operation."""
+        return self.add(
+            "POST",
+            f"{page_id}/messages",
+            body=build_message_body(recipient, body_message),
+        )
+
+    def get_ids_for_pages(self, user_asid: str, page_id: str = None) -> int:
+        """Queue a get_ids_for_pages operation."""
+        params = {"page": page_id} if page_id else None
+        return self.add("GET", f"{user_asid}/ids_for_pages", params=params)
+
+    async def execute(self) -> list[GraphBatchResponse]:
+        """Send the queued operations as a single batch request."""
+        if not self._operations:
+            return []
+
+        data = {"batch": json.dumps(self._operations), "include_headers": "false"}
+        resp = await self._client._post(  # pylint: disable=protected-access
+            self._client.base_url + "/", data=data
+        )
+        items = await resp.json()
+
+        results = []
+        for item in items:
+            if item is None:
+                # Graph returns null for operations that did not complete
+                results.append(GraphBatchResponse(code=504, body=None))
+                continue
+
+            body = item.get("body")
+            if isinstance(body, str):
+                with suppress(ValueError):
+                    body = json.loads(body)
+
+            results.append(GraphBatchResponse(code=item.get("code", 500), body=body))
+
+        return results
@@ -0,0 +1,154 @@
+"""Reusable attachments uploaded once through the Attachment Upload API."""
+from __future__ import annotations
+
+import asyncio
+from collections import OrderedDict
+import hashlib
+import logging
+import mimetypes
+import os
+from typing import TYPE_CHECKING, Any
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers.storage import Store
+
+from .const import STORAGE_KEY
+
+if TYPE_CHECKING:
+    from .coordinator import FacebookDataUpdateCoordinator
+
+_LOGGER = logging.getLogger(__name__)
+
+ATTACHMENT_STORAGE_VERSION = 1
+ATTACHMENT_SAVE_DELAY = 1
+ATTACHMENT_CACHE_MAXSIZE = 500
+
+HASH_CHUNK_SIZE = 64 * 1024
+
+# Attachment types named after the top level MIME type they are used for
+MEDIA_ATTACHMENT_TYPES = ("image", "video", "audio")
+FILE_ATTACHMENT_TYPE = "file"
+
+
+def attachment_type_for(path: str) -> str:
+    """Return the Messenger attachment type for a file."""
+    content_type, _ = mimetypes.guess_type(path)
+    if content_type and (kind := content_type.split("/")[0]) in MEDIA_ATTACHMENT_TYPES:
+        return kind
+    return FILE_ATTACHMENT_TYPE
+
+
+def _hash_file(path: str) -> str:
+    """Return the SHA-256 digest of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        while chunk := file.read(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class AttachmentCache:
+    """Attachment IDs of the files uploaded for a page, keyed by content.
+
+    A file is hashed and only uploaded when no attachment with the same
+    content has been uploaded before, so a file sent to many recipients or
+    many times is uploaded once. Uploads are streamed from disk.
+    """
+
+    def __init__(
+        self, hass: HomeAssistant, coordinator: FacebookDataUpdateCoordinator
+    ) -> None:
+        """Initialize the attachment cache."""
+        self.hass = hass
+        self.coordinator = coordinator
+        self._store = Store(
+            hass,
+            ATTACHMENT_STORAGE_VERSION,
+            f"{STORAGE_KEY}.attachments.{coordinator.page_id}",
+        )
+        self._ids: OrderedDict[str, str] = OrderedDict()
+        self._uploads: dict[str, asyncio.Task] = {}
+        self.hits = 0
+        self.uploads = 0
+
+    async def async_load(self) -> None:
+        """Load cached attachment IDs."""
+        if stored := await self._store.async_load():
+            self._ids.update(stored.get("attachments", {}))
+
+    @callback
+    def _data_to_save(self) -> dict[str, Any]:
+        """Return the data to store."""
+        return {"attachments": dict(self._ids)}
+
+    async def async_get_file_attachment(
+        self, path: str, attachment_type: str | None = None
+    ) -> dict[str, Any]:
+        """Return a message attachment for a local file, uploading it if needed."""
+        if not self.hass.config.is_allowed_path(path):
+            raise HomeAssistantError(f"Sending {path} is not allowed")
+
+        if attachment_type is None:
+            attachment_type = attachment_type_for(path)
+
+        try:
+            digest = await self.hass.async_add_executor_job(_hash_file, path)
+        except OSError as err:
+            raise HomeAssistantError(f"Unable to read {path}: {err}") from err
+
+        key = f"{attachment_type}:{digest}"
+
+        if (attachment_id := self._ids.get(key)) is not None:
+            self._ids.move_to_end(key)
+            self.hits += 1
+        else:
+            # Concurrent sends of the same file share one upload
+            if (upload := self._uploads.get(key)) is None:
+                upload = self._uploads[key] = self.hass.async_create_task(
+                    self._async_upload_file(key, path, attachment_type)
+                )
+                upload.add_done_callback(lambda _: self._uploads.pop(key, None))
+            attachment_id = await asyncio.shield(upload)
+
+        return {"type": attachment_type, "payload": {"attachment_id": attachment_id}}
+
+    async def _async_upload_file(
+        self, key: str, path: str, attachment_type: str
+    ) -> str:
+        """Upload a file and cache its attachment ID."""
+        file = await self.hass.async_add_executor_job(open, path, "rb")
+        try:
+            attachment_id = await self.coordinator.fb.page().upload_attachment(
+                self.coordinator.page_id,
+                attachment_type,
+                file=file,
+                filename=os.path.basename(path),
+                content_type=mimetypes.guess_type(path)[0],
+            )
+        finally:
+            await self.hass.async_add_executor_job(file.close)
+
+        _LOGGER.debug("Uploaded %s as attachment %s", path, attachment_id)
+        self.uploads += 1
+
+        self._ids[key] = attachment_id
+        while len(self._ids) > ATTACHMENT_CACHE_MAXSIZE:
+            self._ids.popitem(last=False)
+        self._store.async_delay_save(self._data_to_save, ATTACHMENT_SAVE_DELAY)
+
+        return attachment_id
+
+    async def async_get_url_attachment(self, attachment: dict[str, Any]) -> dict:
+        """Replace the URL of an attachment with an uploaded attachment ID.
+
+        The content behind a URL can change, so it is not cached, but every
+        recipient of a message shares a single upload.
+        """
+        attachment_type = attachment.get("type", FILE_ATTACHMENT_TYPE)
+        attachment_id = await self.coordinator.fb.page().upload_attachment(
+            self.coordinator.page_id, attachment_type, url=attachment["payload"]["url"]
+        )
+        self.uploads += 1
+
+        return {"type": attachment_type, "payload": {"attachment_id": attachment_id}}
@@ -21,9 +21,11 @@ from homeassistant.helpers.selector import (
     SelectSelectorMode,
 )
 
-from .api import Facebook
+from .api import BASE_API, Facebook, FacebookApiError
 from .const import (
+    CONF_GRAPH_URL,
     CONF_WEBOOK_VERIFY_TOKEN,
+    DATA_PLATFORM_CONFIG,
     DOMAIN,
 )
 from .coordinator import FacebookDataUpdateCoordinator
@@ -64,10 +66,12 @@ class FacebookMessengerConfigFlow(
         implementation = self.flow_impl
         client_session = async_get_clientsession(self.hass)
 
+        platform_config = self.hass.data.get(DOMAIN, {}).get(DATA_PLATFORM_CONFIG, {})
         fb = Facebook(
             client_session=client_session,
             oauth_implementation=implementation,
             token=self._data["token"],
+            base_url=platform_config.get(CONF_GRAPH_URL, BASE_API),
         )
 
         self.coordinator = FacebookDataUpdateCoordinator(self.hass, fb)
@@ -96,7 +100,8 @@ class FacebookMessengerConfigFlow(
         if user_input is not None:
             page_index = user_input["page_index"]
             _LOGGER.debug("Facebook Index: %s", page_index)
-            page = self._data["page_data"][int(page_index)]
+            # Only the chosen page's token is kept in the entry
+            page = self._data.pop("page_data")[int(page_index)]
 
             await self.async_set_unique_id(page["id"])
             self._abort_if_unique_id_configured()
@@ -106,8 +111,12 @@ class FacebookMessengerConfigFlow(
             self._data["page_token"] = page["access_token"]
             return await self.async_step_webhook_info()
 
-        pages = await self.coordinator.fb.user().list_pages()
-        page_data = self._data["page_data"] = pages.get("data", [])
+        page_data = self._data["page_data"] = [
+            page
+            async for page in self.coordinator.fb.user().iter_pages(
+                fields="id,name,access_token"
+            )
+        ]
 
         select_options = []
 
@@ -135,8 +144,11 @@ class FacebookMessengerConfigFlow(
         """Handle discovery confirmation."""
         _LOGGER.debug("fn:async_step_webhook_info")
 
+        await self.coordinator.async_update_app_info()
         app_info = await self.coordinator.async_get_app_data()
-        webhook_url = await async_setup_webhook(self.hass, app_info)
+        webhook_url = await async_setup_webhook(
+            self.hass, app_info, self.coordinator.fb.client_secret
+        )
         app_id = self.coordinator.fb.client_id
 
         _LOGGER.debug("setting up Webhook URL: %s"), webhook_url
@@ -145,18 +157,20 @@ class FacebookMessengerConfigFlow(
                 app_id, webhook_url, app_info[CONF_WEBOOK_VERIFY_TOKEN]
             )
             _LOGGER.info(resp)
-        except ClientResponseError as exc:
+        except (ClientResponseError, FacebookApiError) as exc:
             _LOGGER.critical("Failed to setup Webhook: %s", str(exc))
             await self.async_abort(reason="webhook_setup_failed")
 
-        self.coordinator.fb.set_page_token(self._data["page_token"])
+        self.coordinator.fb.set_page_token(
+            self._data["page_token"], self._data["page_id"]
+        )
 
         try:
             resp = await self.coordinator.fb.page().setup_page_subscription(
                 self._data["page_id"]
             )
             _LOGGER.info(resp)
-        except ClientResponseError as exc:
+        except (ClientResponseError, FacebookApiError) as exc:
             _LOGGER.critical("Failed to subscribe Page to Webhook: %s", str(exc))
             await self.async_abort(reason="webhook_page_setup_failed")
 
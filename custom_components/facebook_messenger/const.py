@@ -1,4 +1,5 @@
 """Constants for facebook_messenger."""
+from datetime import timedelta
 
 ################################
 # Do not change! Will be set by release workflow
@@ -16,6 +17,9 @@ WEBHOOK_ID = "facebook_messenger_webhook"
 CONF_CLOUDHOOK_URL = "cloudhook_url"
 
 ATTR_TEXT = "text"
+ATTR_ATTACHMENT = "attachment"
+ATTR_ATTACHMENT_TYPE = "attachment_type"
+ATTR_FILE = "file"
 
 SAVE_DELAY = 10
 STORAGE_KEY = DOMAIN
@@ -23,3 +27,64 @@ STORAGE_VERSION = 1
 
 CONF_WEBOOK_VERIFY_TOKEN = "verify_token"
 CONF_APP_NAME = "app_name"
+CONF_PAGE_TOKEN = "page_token"
+
+# Cached page tokens are refreshed in the background once this old
+PAGE_TOKEN_TTL = 30 * 24 * 60 * 60
+
+DATA_PLATFORM_CONFIG = "platform_config"
+DATA_WEBHOOKS = "webhooks"
+DATA_REGISTRY = "registry"
+DATA_ID_RESOLVER = "id_resolver"
+DATA_SESSIONS = "sessions"
+DATA_RECORDER = "recorder"
+
+CONF_SEND_CONCURRENCY = "send_concurrency"
+DEFAULT_SEND_CONCURRENCY = 10
+
+CONF_WEBHOOK_QUEUE_SIZE = "webhook_queue_size"
+DEFAULT_WEBHOOK_QUEUE_SIZE = 1000
+CONF_WEBHOOK_WORKERS = "webhook_workers"
+DEFAULT_WEBHOOK_WORKERS = 4
+CONF_WEBHOOK_OVERFLOW = "webhook_overflow"
+DEFAULT_WEBHOOK_OVERFLOW = "drop_oldest"
+
+# Page data is polled at the active interval while the page has had webhook
+# activity within the activity timeout, and at the idle interval otherwise
+ACTIVE_UPDATE_INTERVAL = timedelta(minutes=5)
+IDLE_UPDATE_INTERVAL = timedelta(hours=6)
+ACTIVITY_TIMEOUT = timedelta(minutes=30)
+
+# Page change webhook fields that affect the polled page data
+PAGE_CHANGE_FIELDS = ("name",)
+
+# Versioned Graph API URL, only changed to point at a stand-in server
+CONF_GRAPH_URL = "graph_url"
+
+# File verified webhook payloads are recorded to, for replaying them
+CONF_WEBHOOK_RECORD = "webhook_record"
+
+# Record Graph and webhook metrics, exposed as diagnostic sensors
+CONF_METRICS = "metrics"
+DEFAULT_METRICS = False
+
+# Connection pool of the Graph session of each app, set under connection and
+# optionally overridden per app id under apps
+CONF_APPS = "apps"
+CONF_CONNECTION = "connection"
+CONF_CONNECTION_LIMIT = "limit"
+DEFAULT_CONNECTION_LIMIT = 100
+CONF_CONNECTION_LIMIT_PER_HOST = "limit_per_host"
+DEFAULT_CONNECTION_LIMIT_PER_HOST = 32
+CONF_KEEPALIVE_TIMEOUT = "keepalive_timeout"
+DEFAULT_KEEPALIVE_TIMEOUT = 60
+CONF_DNS_CACHE_TTL = "dns_cache_ttl"
+DEFAULT_DNS_CACHE_TTL = 300
+CONF_CONNECT_TIMEOUT = "connect_timeout"
+DEFAULT_CONNECT_TIMEOUT = 10
+CONF_READ_TIMEOUT = "read_timeout"
+DEFAULT_READ_TIMEOUT = 30
+
+# Redelivered webhook events are recognised for this long
+DEDUPE_MAXSIZE = 10000
+DEDUPE_TTL = 3600
@@ -1,25 +1,46 @@
 """DataUpdateCoordinator for the Facebook Messenger integration."""
-from datetime import timedelta
+import asyncio
 import logging
 import random
-import secrets
+import time
 
 from homeassistant.components import persistent_notification
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.const import CONF_WEBHOOK_ID
-from homeassistant.helpers.storage import Store
+from homeassistant.core import callback
+from homeassistant.exceptions import ConfigEntryAuthFailed
 from homeassistant.helpers.update_coordinator import (
     DataUpdateCoordinator,
+    UpdateFailed,
 )
 
-from .api import Facebook
+from .api import Facebook, FacebookApiError
+from .attachments import AttachmentCache
 from .const import (
-    CONF_APP_NAME,
-    CONF_WEBOOK_VERIFY_TOKEN,
+    ACTIVE_UPDATE_INTERVAL,
+    ACTIVITY_TIMEOUT,
+    CONF_PAGE_TOKEN,
+    CONF_SEND_CONCURRENCY,
+    CONF_WEBHOOK_OVERFLOW,
+    CONF_WEBHOOK_QUEUE_SIZE,
+    CONF_WEBHOOK_WORKERS,
+    DATA_PLATFORM_CONFIG,
+    DEDUPE_MAXSIZE,
+    DEDUPE_TTL,
+    DEFAULT_SEND_CONCURRENCY,
+    DEFAULT_WEBHOOK_OVERFLOW,
+    DEFAULT_WEBHOOK_QUEUE_SIZE,
+    DEFAULT_WEBHOOK_WORKERS,
     DOMAIN,
-    STORAGE_KEY,
-    STORAGE_VERSION,
+    IDLE_UPDATE_INTERVAL,
+    PAGE_CHANGE_FIELDS,
 )
+from .dedupe import DedupeCache, messaging_event_key
+from .events import MessageEvent, parse_messaging_event
+from .ids import IdResolver, async_get_id_resolver
+from .outbox import Outbox
+from .registry import AppRegistry, async_get_registry
+from .retry import CircuitOpenError
+from .work_queue import WorkQueue
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -46,112 +67,277 @@ class FacebookDataUpdateCoordinator(DataUpdateCoordinator):
             hass,
             _LOGGER,
             name=DOMAIN,
-            update_interval=timedelta(minutes=5),
+            update_interval=IDLE_UPDATE_INTERVAL,
         )
         self.fb: Facebook = fb_api
-        self._store = Store(hass, STORAGE_VERSION, f"{STORAGE_KEY}")
-        self.saved_data: dict = None
+        self.registry: AppRegistry | None = None
+        self.id_resolver: IdResolver | None = None
         self.page_id = None
 
         if self.config_entry is not None:
             self.page_id = self.config_entry.data["page_id"]
 
         self.pending_codes = []
+        self._last_activity: float | None = None
+        self._data_changed = True
+        # Seconds spent in each phase of the last setup
+        self.startup_timings: dict[str, float] = {}
 
-        self._app_name = None
+        self.dedupe = DedupeCache(maxsize=DEDUPE_MAXSIZE, ttl=DEDUPE_TTL)
+
+        platform_config = hass.data.get(DOMAIN, {}).get(DATA_PLATFORM_CONFIG, {})
+        self.webhook_queue = WorkQueue(
+            hass,
+            self._async_process_webhook_entry,
+            name=f"{DOMAIN} {self.page_id} webhook queue",
+            maxsize=platform_config.get(
+                CONF_WEBHOOK_QUEUE_SIZE, DEFAULT_WEBHOOK_QUEUE_SIZE
+            ),
+            workers=platform_config.get(CONF_WEBHOOK_WORKERS, DEFAULT_WEBHOOK_WORKERS),
+            overflow=platform_config.get(
+                CONF_WEBHOOK_OVERFLOW, DEFAULT_WEBHOOK_OVERFLOW
+            ),
+        )
+        self.attachments = AttachmentCache(hass, self)
+        self.outbox = Outbox(
+            hass,
+            self,
+            concurrency=platform_config.get(
+                CONF_SEND_CONCURRENCY, DEFAULT_SEND_CONCURRENCY
+            ),
+        )
 
     async def async_set_page_token(self):
-        """Get a new page access token for our page."""
-        if self.page_id is not None:
-            page_token = await self.get_page_token()
-            self.fb.set_page_token(page_token)
+        """Set the page access token for our page.
+
+        The token is taken from storage, or from the config entry, and only
+        fetched from Graph when neither has one. A cached token past its expiry
+        is still used while a new one is fetched in the background, and a token
+        Graph rejects is replaced through the page token refresher.
+        """
+        if self.page_id is None:
+            return
+
+        await self.async_load()
+        cached = self.registry.async_get_page_token(self.page_id)
+
+        if cached is None and (
+            page_token := self.config_entry.data.get(CONF_PAGE_TOKEN)
+        ):
+            cached = self.registry.async_set_page_token(self.page_id, page_token)
+
+        if cached is None:
+            page_token = await self._async_fetch_page_token()
+        else:
+            page_token = cached["access_token"]
+
+        self.fb.set_page_token(page_token, self.page_id)
+        self.fb.page_token_refresher = self._async_fetch_page_token
+
+        if cached is not None and cached["expires_at"] < time.time():
+            _LOGGER.debug("Cached page token expired, refreshing in the background")
+            self.hass.async_create_background_task(
+                self._async_refresh_expired_page_token(page_token),
+                f"{DOMAIN} {self.page_id} page token refresh",
+            )
+
+    async def _async_refresh_expired_page_token(self, page_token: str) -> None:
+        """Refresh an expired page token, keeping the old one if that fails."""
+        try:
+            await self.fb.async_refresh_page_token(page_token)
+        except Exception as exc:  # pylint: disable=broad-except
+            _LOGGER.warning("Failed to refresh expired page token: %s", exc)
+
+    async def _async_fetch_page_token(self) -> str:
+        """Fetch the page token from Graph and cache it."""
+        page_token = await self.get_page_token()
+        await self.async_load()
+        self.registry.async_set_page_token(self.page_id, page_token)
+        return page_token
 
     async def async_get_app_data(self):
         """Get App Data from Storage for fb app."""
         await self.async_load()
+        return self.registry.async_get_app(self.fb.client_id)
 
-        self.saved_data.setdefault("apps", {})
-        app_data = self.saved_data["apps"].get(self.fb.client_id, {})
-
-        changed = False
-
-        if app_data.get(CONF_WEBHOOK_ID) is None:
-            webhook_id = app_data[CONF_WEBHOOK_ID] = secrets.token_hex(32)
-            _LOGGER.debug("Generated webhook_id: %s", webhook_id)
-            changed = True
-
-        if app_data.get(CONF_WEBOOK_VERIFY_TOKEN) is None:
-            verify_token = app_data[CONF_WEBOOK_VERIFY_TOKEN] = secrets.token_hex(32)
-            _LOGGER.debug("Generated verify_token: %s", verify_token)
-            changed = True
-
-        if self._app_name is None:
-            fb_app_data = await self.fb.app().get_app_info(self.fb.client_id)
-            app_data[CONF_APP_NAME] = self._app_name = app_name = fb_app_data["name"]
-            _LOGGER.debug("Got facebook app name: %s", app_name)
-            changed = True
-
-        if changed is True:
-            self.saved_data["apps"][self.fb.client_id] = app_data
-            await self._async_save()
-
-        return app_data
+    async def async_update_app_info(self) -> None:
+        """Update the stored app name from Graph, once per app."""
+        await self.async_load()
+        await self.registry.async_update_app_info(self.fb)
 
     async def get_page_token(self):
         """Retrieve the access token for the Facebook page associated with the provided page ID."""
-        pages = await self.fb.user().list_pages()
-        page_data = pages.get("data", [])
-
-        for page in page_data:
+        async for page in self.fb.user().iter_pages(fields="id,access_token"):
             if page["id"] == self.page_id:
                 return page["access_token"]
 
         raise ValueError("Page Token unable to be obtained.")
 
     async def async_load(self) -> None:
-        """Load config."""
-        if self.saved_data is None:
-            if stored := await self._store.async_load():
-                self.saved_data = stored
-
-        # If still None, initialise it.
-        if self.saved_data is None:
-            self.saved_data = {}
-
-    async def _async_save(self) -> None:
-        """Save config."""
-        await self._store.async_save(self.saved_data)
+        """Load the shared app registry and ID resolver."""
+        if self.registry is None:
+            self.registry = await async_get_registry(self.hass)
+        if self.id_resolver is None:
+            self.id_resolver = await async_get_id_resolver(self.hass)
 
     async def _async_update_data(self):
         """Fetch data from API endpoint."""
-        data = await self.fb.page().get_page(self.page_id)
+        self.update_interval = (
+            ACTIVE_UPDATE_INTERVAL if self.is_active else IDLE_UPDATE_INTERVAL
+        )
+        self._data_changed = True
+        try:
+            data = await self.fb.page().get_page(self.page_id)
+        except FacebookApiError as err:
+            if err.invalid_token:
+                raise ConfigEntryAuthFailed(err) from err
+            raise UpdateFailed(f"Error fetching page: {err}") from err
+        except CircuitOpenError as err:
+            raise UpdateFailed(str(err)) from err
+        self._data_changed = not self.last_update_success or data != self.data
         return data
 
-    async def handle_webhook_entry(self, object: str, entry: dict):
-        """Handle a webhook entry by processing the messaging data and performing actions based on the received messages."""
-        _LOGGER.info(entry["messaging"])
+    @callback
+    def async_update_listeners(self) -> None:
+        """Update listeners, unless a refresh returned unchanged data."""
+        if not self._data_changed:
+            self._data_changed = True
+            return
+
+        super().async_update_listeners()
+
+    @property
+    def is_active(self) -> bool:
+        """Return True if the page had webhook activity recently."""
+        return (
+            self._last_activity is not None
+            and time.monotonic() - self._last_activity
+            < ACTIVITY_TIMEOUT.total_seconds()
+        )
 
-        for message in entry["messaging"]:
-            text_message = message["message"]["text"]
-            if text_message in self.pending_codes:
-                psid = message["sender"]["id"]
-                page_name = self.data.get("name")
+    @callback
+    def async_mark_activity(self) -> None:
+        """Record webhook activity, switching to the active poll interval."""
+        was_active = self.is_active
+        self._last_activity = time.monotonic()
+
+        if not was_active and self.update_interval != ACTIVE_UPDATE_INTERVAL:
+            self.update_interval = ACTIVE_UPDATE_INTERVAL
+            if self._listeners:
+                # The refresh also schedules the following poll at the new interval
+                self.hass.async_create_task(self.async_request_refresh())
+
+    async def async_start_workers(self) -> None:
+        """Start processing queued webhook entries and outbound messages."""
+        self.webhook_queue.async_start()
+        await asyncio.gather(self.attachments.async_load(), self.outbox.async_start())
+
+    async def async_stop_workers(self) -> None:
+        """Stop processing queued webhook entries and outbound messages."""
+        await self.webhook_queue.async_stop()
+        await self.outbox.async_stop()
+
+    async def async_enqueue_webhook_entry(
+        self, object: str, entry: dict, received: float | None = None
+    ) -> bool:
+        """Queue a webhook entry for processing, returning False if rejected.
+
+        Messaging events that Facebook has already delivered are dropped first.
+        received is the monotonic time the webhook was received at.
+        """
+        keys = []
+
+        if (messaging := entry.get("messaging")) is not None:
+            events = []
+            for event in messaging:
+                key = messaging_event_key(event)
+                if not self.dedupe.seen(key):
+                    keys.append(key)
+                    events.append(event)
+
+            if not events:
+                _LOGGER.debug("Dropped duplicate webhook entry")
+                return True
+
+            entry = {**entry, "messaging": events}
+
+        if received is None:
+            received = time.monotonic()
+
+        if not await self.webhook_queue.async_put((object, entry, received)):
+            # Let the redelivery of a rejected entry through
+            for key in keys:
+                self.dedupe.forget(key)
+            return False
+
+        return True
+
+    async def _async_process_webhook_entry(self, item: tuple[str, dict, float]) -> None:
+        """Process a webhook entry taken from the queue."""
+        object, entry, received = item
+
+        if (metrics := self.fb.metrics) is None:
+            await self.handle_webhook_entry(object, entry)
+            return
+
+        started = time.monotonic()
+        try:
+            await self.handle_webhook_entry(object, entry)
+        finally:
+            metrics.record_webhook_entry(started - received, time.monotonic() - started)
 
-                msg = f"The Facebook PSID for code {text_message} on page {page_name} is: {psid}"
+    async def handle_webhook_entry(self, object: str, entry: dict):
+        """Handle a webhook entry by firing an event for each messaging event and matching pending codes."""
+        _LOGGER.debug(entry.get("messaging"))
+
+        if changes := entry.get("changes"):
+            self.async_mark_activity()
+            fields = {change.get("field") for change in changes}
+            if not fields.isdisjoint(PAGE_CHANGE_FIELDS):
+                _LOGGER.debug("Page changed (%s), refreshing", ", ".join(fields))
+                await self.async_request_refresh()
+
+        if entry.get("messaging"):
+            self.async_mark_activity()
+
+        for raw_event in entry.get("messaging", ()):
+            if (event := parse_messaging_event(self.page_id, raw_event)) is None:
+                _LOGGER.debug("Ignoring unsupported messaging event: %s", raw_event)
+                continue
+
+            self.hass.bus.async_fire(
+                f"{DOMAIN}_{event.event_type}", event.as_event_data()
+            )
+
+            if (
+                isinstance(event, MessageEvent)
+                and not event.is_echo
+                and event.text in self.pending_codes
+            ):
+                self._async_match_code(event.text, event.sender_id)
+
+    @callback
+    def _async_match_code(self, text_message: str, psid: str) -> None:
+        """Notify the user of the PSID that sent a pending matching code."""
+        page_name = self.data.get("name")
+
+        msg = (
+            f"The Facebook PSID for code {text_message} on page {page_name} is: {psid}"
+        )
 
-                _LOGGER.info(msg)
+        _LOGGER.info(msg)
 
-                persistent_notification.async_create(
-                    self.hass,
-                    msg,
-                    "Match Facebook ID",
-                )
+        persistent_notification.async_create(
+            self.hass,
+            msg,
+            "Match Facebook ID",
+        )
 
-                persistent_notification.async_dismiss(
-                    self.hass, notification_id=f"{DOMAIN}_{text_message}"
-                )
+        persistent_notification.async_dismiss(
+            self.hass, notification_id=f"{DOMAIN}_{text_message}"
+        )
 
-                self.pending_codes.remove(text_message)
+        self.pending_codes.remove(text_message)
 
     async def display_matching_id(self):
         """Generate a matching code, add it to the list of pending codes, and display a persistent notification with instructions for matching the Facebook ID."""
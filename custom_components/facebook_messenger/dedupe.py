@@ -0,0 +1,86 @@
+"""Deduplication of redelivered webhook events."""
+from __future__ import annotations
+
+from collections import OrderedDict
+from collections.abc import Hashable
+import time
+from typing import Any
+
+# Keys of a messaging event that are common to every event type
+COMMON_EVENT_FIELDS = ("sender", "recipient", "timestamp")
+
+
+def messaging_event_key(event: dict) -> Hashable:
+    """Return the key identifying a messaging event across redeliveries.
+
+    Messages and postbacks carry a unique mid. Other events, such as reads and
+    deliveries, are identified by their sender, timestamp and type.
+    """
+    for field in ("message", "postback"):
+        if isinstance(value := event.get(field), dict) and (mid := value.get("mid")):
+            return mid
+
+    kind = next((key for key in event if key not in COMMON_EVENT_FIELDS), None)
+    return (event.get("sender", {}).get("id"), event.get("timestamp"), kind)
+
+
+class DedupeCache:
+    """Bounded set of recently seen keys that expire after a TTL.
+
+    Keys are kept in insertion order, so both expiry and eviction of the
+    least recently added key happen from the front in O(1).
+    """
+
+    def __init__(self, *, maxsize: int, ttl: float) -> None:
+        """Initialize the cache."""
+        self.maxsize = max(1, maxsize)
+        self.ttl = ttl
+        self._expires: OrderedDict[Hashable, float] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        """Return the number of keys held."""
+        return len(self._expires)
+
+    @property
+    def stats(self) -> dict[str, Any]:
+        """Return cache size and hit statistics."""
+        total = self.hits + self.misses
+        return {
+            "size": len(self._expires),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else None,
+        }
+
+    def seen(self, key: Hashable) -> bool:
+        """Return True if the key was seen within the TTL, recording it if not."""
+        now = time.monotonic()
+        self._expire(now)
+
+        if key in self._expires:
+            self.hits += 1
+            return True
+
+        self.misses += 1
+        self._expires[key] = now + self.ttl
+
+        while len(self._expires) > self.maxsize:
+            self._expires.popitem(last=False)
+
+        return False
+
+    def forget(self, key: Hashable) -> None:
+        """Forget a key, so it is processed again when redelivered."""
+        self._expires.pop(key, None)
+
+    def _expire(self, now: float) -> None:
+        """Drop keys whose TTL has passed."""
+        expires = self._expires
+        while expires:
+            key, expires_at = next(iter(expires.items()))
+            if expires_at > now:
+                break
+            del expires[key]
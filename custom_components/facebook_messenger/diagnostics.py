@@ -0,0 +1,59 @@
+"""Diagnostics support for facebook_messenger."""
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import CONF_ACCESS_TOKEN, CONF_TOKEN, CONF_WEBHOOK_ID
+from homeassistant.core import HomeAssistant
+
+from .const import CONF_PAGE_TOKEN, CONF_WEBOOK_VERIFY_TOKEN, DOMAIN
+from .coordinator import FacebookDataUpdateCoordinator
+
+TO_REDACT = {
+    CONF_ACCESS_TOKEN,
+    CONF_TOKEN,
+    CONF_PAGE_TOKEN,
+    CONF_WEBHOOK_ID,
+    CONF_WEBOOK_VERIFY_TOKEN,
+}
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    """Return diagnostics for a config entry."""
+    coordinator: FacebookDataUpdateCoordinator = hass.data[DOMAIN][entry.entry_id]
+    fb = coordinator.fb
+
+    return {
+        "entry": async_redact_data(entry.as_dict(), TO_REDACT),
+        "app": async_redact_data(await coordinator.async_get_app_data(), TO_REDACT),
+        "page": coordinator.data,
+        "startup_timings": coordinator.startup_timings,
+        "polling": {
+            "update_interval": coordinator.update_interval.total_seconds(),
+            "active": coordinator.is_active,
+        },
+        "graph": {
+            "rate_limits": fb.rate_limiter.utilisation,
+            "circuit_open": fb.circuit_breaker.is_open,
+            "circuit_failures": fb.circuit_breaker.failures,
+            "response_cache": fb.response_cache.stats,
+        },
+        "webhook": {
+            "queue": coordinator.webhook_queue.stats,
+            "dedupe": coordinator.dedupe.stats,
+        },
+        "outbox": {
+            "pending": len(coordinator.outbox.pending),
+            "dead_letters": len(coordinator.outbox.dead_letters),
+        },
+        "attachments": {
+            "hits": coordinator.attachments.hits,
+            "uploads": coordinator.attachments.uploads,
+        },
+        "ids": coordinator.id_resolver.stats,
+        "metrics": None if fb.metrics is None else fb.metrics.as_dict(),
+    }
@@ -33,7 +33,7 @@ class FacebookEntity(CoordinatorEntity):
     def device_info(self) -> DeviceInfo | None:
         """Return common device info."""
         return DeviceInfo(
-            identifiers={(DOMAIN, self.unique_id)},
+            identifiers={(DOMAIN, self.coordinator.config_entry.entry_id)},
             name=NAME,
             model=INTEGRATION_VERSION,
             manufacturer=NAME,
@@ -0,0 +1,189 @@
+"""Typed parser for Messenger webhook messaging events."""
+from __future__ import annotations
+
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Any, ClassVar
+
+
+@dataclass(slots=True)
+class MessagingEvent:
+    """Fields common to every messaging event."""
+
+    event_type: ClassVar[str]
+
+    page_id: str
+    sender_id: str | None
+    recipient_id: str | None
+    timestamp: int | None
+
+    def as_event_data(self) -> dict[str, Any]:
+        """Return the event as Home Assistant event data."""
+        return {name: getattr(self, name) for name in self.__match_args__}
+
+
+@dataclass(slots=True)
+class MessageEvent(MessagingEvent):
+    """A message sent to, or echoed from, the page."""
+
+    event_type = "message"
+
+    mid: str | None
+    text: str | None
+    attachments: list[dict[str, Any]]
+    quick_reply_payload: str | None
+    is_echo: bool
+
+
+@dataclass(slots=True)
+class PostbackEvent(MessagingEvent):
+    """A button or menu item tapped by the user."""
+
+    event_type = "postback"
+
+    mid: str | None
+    title: str | None
+    payload: str | None
+
+
+@dataclass(slots=True)
+class DeliveryEvent(MessagingEvent):
+    """Messages from the page delivered to the user."""
+
+    event_type = "delivery"
+
+    mids: list[str]
+    watermark: int | None
+
+
+@dataclass(slots=True)
+class ReadEvent(MessagingEvent):
+    """Messages from the page read by the user."""
+
+    event_type = "read"
+
+    watermark: int | None
+
+
+@dataclass(slots=True)
+class ReactionEvent(MessagingEvent):
+    """A reaction added to or removed from a message."""
+
+    event_type = "reaction"
+
+    mid: str | None
+    reaction: str | None
+    emoji: str | None
+    action: str | None
+
+
+@dataclass(slots=True)
+class ReferralEvent(MessagingEvent):
+    """A user arriving at an existing conversation through a referral."""
+
+    event_type = "referral"
+
+    ref: str | None
+    source: str | None
+    type: str | None
+
+
+@dataclass(slots=True)
+class OptinEvent(MessagingEvent):
+    """A user opting in through a plugin or one-time notification request."""
+
+    event_type = "optin"
+
+    ref: str | None
+    payload: str | None
+
+
+def _parse_message(common: tuple, message: dict) -> MessageEvent:
+    """Parse a message event."""
+    attachments = [
+        {
+            "type": attachment.get("type"),
+            "url": (attachment.get("payload") or {}).get("url"),
+        }
+        for attachment in message.get("attachments", ())
+    ]
+    quick_reply = message.get("quick_reply") or {}
+
+    return MessageEvent(
+        *common,
+        message.get("mid"),
+        message.get("text"),
+        attachments,
+        quick_reply.get("payload"),
+        message.get("is_echo", False),
+    )
+
+
+def _parse_postback(common: tuple, postback: dict) -> PostbackEvent:
+    """Parse a postback event."""
+    return PostbackEvent(
+        *common, postback.get("mid"), postback.get("title"), postback.get("payload")
+    )
+
+
+def _parse_delivery(common: tuple, delivery: dict) -> DeliveryEvent:
+    """Parse a delivery event."""
+    return DeliveryEvent(*common, delivery.get("mids", []), delivery.get("watermark"))
+
+
+def _parse_read(common: tuple, read: dict) -> ReadEvent:
+    """Parse a read event."""
+    return ReadEvent(*common, read.get("watermark"))
+
+
+def _parse_reaction(common: tuple, reaction: dict) -> ReactionEvent:
+    """Parse a reaction event."""
+    return ReactionEvent(
+        *common,
+        reaction.get("mid"),
+        reaction.get("reaction"),
+        reaction.get("emoji"),
+        reaction.get("action"),
+    )
+
+
+def _parse_referral(common: tuple, referral: dict) -> ReferralEvent:
+    """Parse a referral event."""
+    return ReferralEvent(
+        *common, referral.get("ref"), referral.get("source"), referral.get("type")
+    )
+
+
+def _parse_optin(common: tuple, optin: dict) -> OptinEvent:
+    """Parse an optin event."""
+    return OptinEvent(*common, optin.get("ref"), optin.get("payload"))
+
+
+PARSERS: dict[str, Callable[[tuple, dict], MessagingEvent]] = {
+    "message": _parse_message,
+    "postback": _parse_postback,
+    "delivery": _parse_delivery,
+    "read": _parse_read,
+    "reaction": _parse_reaction,
+    "referral": _parse_referral,
+    "optin": _parse_optin,
+}
+
+
+def parse_messaging_event(page_id: str, event: dict) -> MessagingEvent | None:
+    """Parse a raw messaging event, returning None for unsupported types.
+
+    Only the fields exposed on the typed events are read, everything else in
+    the payload is skipped.
+    """
+    for field, parser in PARSERS.items():
+        if isinstance(value := event.get(field), dict):
+            common = (
+                page_id,
+                (event.get("sender") or {}).get("id"),
+                (event.get("recipient") or {}).get("id"),
+                event.get("timestamp"),
+            )
+            return parser(common, value)
+
+    return None
@@ -0,0 +1,62 @@
+"""Bounded concurrency fan-out for sending to many recipients."""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Awaitable, Callable, Hashable, Iterable
+from dataclasses import dataclass, field
+import logging
+from typing import Any
+
+_LOGGER = logging.getLogger(__name__)
+
+
+@dataclass
+class FanOutResult:
+    """Per-target results and errors of a fan-out run."""
+
+    results: dict[Hashable, Any] = field(default_factory=dict)
+    errors: dict[Hashable, BaseException] = field(default_factory=dict)
+
+    @property
+    def succeeded(self) -> list[Hashable]:
+        """Return the targets that were sent successfully."""
+        return list(self.results)
+
+    @property
+    def failed(self) -> list[Hashable]:
+        """Return the targets that failed."""
+        return list(self.errors)
+
+    @property
+    def partial_failure(self) -> bool:
+        """Return True if some, but not all, targets failed."""
+        return bool(self.errors) and bool(self.results)
+
+
+async def async_fan_out(
+    targets: Iterable[Hashable],
+    send: Callable[[Hashable], Awaitable[Any]],
+    *,
+    limit: int,
+) -> FanOutResult:
+    """Run send for every target with at most limit calls in flight.
+
+    Errors are collected per target rather than raised, so one slow or failing
+    recipient does not stall or abort the others.
+    """
+    result = FanOutResult()
+    semaphore = asyncio.Semaphore(max(1, limit))
+
+    async def _send(target: Hashable) -> None:
+        async with semaphore:
+            try:
+                result.results[target] = await send(target)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:  # pylint: disable=broad-except
+                _LOGGER.debug("Sending to %s failed: %s", target, exc)
+                result.errors[target] = exc
+
+    await asyncio.gather(*(_send(target) for target in dict.fromkeys(targets)))
+
+    return result
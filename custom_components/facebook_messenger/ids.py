@@ -0,0 +1,159 @@
+"""Cache of page scoped IDs resolved from app scoped IDs and friendly names."""
+from __future__ import annotations
+
+import asyncio
+from collections import OrderedDict
+from collections.abc import Iterable
+import logging
+import time
+from typing import Any
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+
+from .const import DATA_ID_RESOLVER, DOMAIN, SAVE_DELAY, STORAGE_KEY
+
+_LOGGER = logging.getLogger(__name__)
+
+ID_STORAGE_VERSION = 1
+ID_CACHE_MAXSIZE = 10000
+# Page scoped IDs never change, the TTL only lets users who left drop out
+ID_CACHE_TTL = 30 * 24 * 60 * 60
+
+
+async def async_get_id_resolver(hass: HomeAssistant) -> IdResolver:
+    """Return the ID resolver, loading it from storage on first use."""
+    domain_data = hass.data.setdefault(DOMAIN, {})
+
+    if (load := domain_data.get(DATA_ID_RESOLVER)) is None:
+        resolver = IdResolver(hass)
+        load = domain_data[DATA_ID_RESOLVER] = hass.async_create_task(
+            _async_load_resolver(resolver)
+        )
+
+    try:
+        return await asyncio.shield(load)
+    except Exception:
+        # Let the next caller try again
+        if domain_data.get(DATA_ID_RESOLVER) is load:
+            domain_data.pop(DATA_ID_RESOLVER)
+        raise
+
+
+async def _async_load_resolver(resolver: IdResolver) -> IdResolver:
+    """Load a resolver and return it."""
+    await resolver.async_load()
+    return resolver
+
+
+class IdResolver:
+    """Maps app scoped IDs and friendly names to page scoped IDs.
+
+    Resolved IDs are held in a bounded least recently used cache that is
+    saved to storage, so resolving a notify target never calls Graph.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize the resolver."""
+        self.hass = hass
+        self._store = Store(hass, ID_STORAGE_VERSION, f"{STORAGE_KEY}.ids")
+        # (page_id, asid) -> (psid, expires_at)
+        self._psids: OrderedDict[tuple[str, str], tuple[str, float]] = OrderedDict()
+        self.names: dict[str, str] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def stats(self) -> dict[str, Any]:
+        """Return cache size and hit statistics."""
+        total = self.hits + self.misses
+        return {
+            "size": len(self._psids),
+            "maxsize": ID_CACHE_MAXSIZE,
+            "names": len(self.names),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else None,
+        }
+
+    async def async_load(self) -> None:
+        """Load cached IDs from storage, dropping expired ones."""
+        if not (stored := await self._store.async_load()):
+            return
+
+        now = time.time()
+        for page_id, asid, psid, expires_at in stored.get("psids", []):
+            if expires_at > now:
+                self._psids[(page_id, asid)] = (psid, expires_at)
+
+        self.names = stored.get("names", {})
+
+    @callback
+    def _data_to_save(self) -> dict[str, Any]:
+        """Return the data to store."""
+        return {
+            "psids": [
+                (page_id, asid, psid, expires_at)
+                for (page_id, asid), (psid, expires_at) in self._psids.items()
+            ],
+            "names": self.names,
+        }
+
+    @callback
+    def _async_schedule_save(self) -> None:
+        """Save the cache after SAVE_DELAY seconds."""
+        self._store.async_delay_save(self._data_to_save, SAVE_DELAY)
+
+    @callback
+    def async_get_psid(self, page_id: str, asid: str) -> str | None:
+        """Return the cached page scoped ID of a user, if known and not expired."""
+        key = (page_id, asid)
+
+        if (cached := self._psids.get(key)) is None:
+            self.misses += 1
+            return None
+
+        psid, expires_at = cached
+        if expires_at <= time.time():
+            del self._psids[key]
+            self.misses += 1
+            return None
+
+        self._psids.move_to_end(key)
+        self.hits += 1
+        return psid
+
+    @callback
+    def async_set_psid(self, page_id: str, asid: str, psid: str) -> None:
+        """Cache the page scoped ID of a user."""
+        key = (page_id, asid)
+        self._psids[key] = (psid, time.time() + ID_CACHE_TTL)
+        self._psids.move_to_end(key)
+
+        while len(self._psids) > ID_CACHE_MAXSIZE:
+            self._psids.popitem(last=False)
+
+        self._async_schedule_save()
+
+    @callback
+    def async_set_names(self, names: dict[str, str]) -> None:
+        """Set friendly names for app scoped IDs."""
+        if names.items() <= self.names.items():
+            return
+
+        self.names.update(names)
+        self._async_schedule_save()
+
+    @callback
+    def async_resolve_targets(self, page_id: str, targets: Iterable[str]) -> list[str]:
+        """Resolve friendly names and app scoped IDs to page scoped IDs.
+
+        Targets that are not known are assumed to already be page scoped IDs.
+        """
+        resolved = []
+
+        for target in targets:
+            asid = self.names.get(target, target)
+            resolved.append(self.async_get_psid(page_id, asid) or asid)
+
+        return resolved
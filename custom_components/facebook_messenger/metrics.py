@@ -0,0 +1,198 @@
+"""Instrumentation of Graph API calls and webhook handling."""
+from __future__ import annotations
+
+from bisect import bisect_left
+from dataclasses import dataclass, field
+import re
+import time
+from typing import Any
+
+# Upper bounds in seconds of the latency histogram buckets, the last bucket
+# holding everything slower
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+_HOST_RE = re.compile(r"^https?://[^/]+(/v\d+\.\d+)?")
+_ID_RE = re.compile(r"/[\d_]+(?=/|$)")
+
+
+def endpoint_name(method: str, url: str) -> str:
+    """Return the endpoint of a Graph URL, with object IDs replaced."""
+    path = _ID_RE.sub("/{id}", _HOST_RE.sub("", url)) or "/"
+    return f"{method} {path}"
+
+
+class Histogram:
+    """Fixed bucket histogram of durations."""
+
+    __slots__ = ("buckets", "counts", "count", "total", "max")
+
+    def __init__(self, buckets: tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        """Initialize the histogram."""
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        """Record a duration."""
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    @property
+    def mean(self) -> float | None:
+        """Return the mean duration."""
+        return self.total / self.count if self.count else None
+
+    def percentile(self, percent: float) -> float | None:
+        """Return an estimate of a percentile, as the upper bound of its bucket."""
+        if not self.count:
+            return None
+
+        rank = percent / 100 * self.count
+        seen = 0
+        for bound, count in zip((*self.buckets, self.max), self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+
+        return self.max
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the histogram summary and bucket counts."""
+        return {
+            "count": self.count,
+            "mean": self.mean,
+            "max": self.max,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "buckets": {
+                f"le_{bound}": count
+                for bound, count in zip((*self.buckets, "inf"), self.counts)
+            },
+        }
+
+
+@dataclass(slots=True)
+class EndpointMetrics:
+    """Counters and latencies of a single Graph endpoint."""
+
+    latency: Histogram = field(default_factory=Histogram)
+    statuses: dict[str, int] = field(default_factory=dict)
+    requests: int = 0
+    errors: int = 0
+    retries: int = 0
+    bytes_sent: int = 0
+    bytes_received: int = 0
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the endpoint metrics."""
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "retries": self.retries,
+            "bytes_sent": self.bytes_sent,
+            "bytes_received": self.bytes_received,
+            "statuses": dict(self.statuses),
+            "latency": self.latency.as_dict(),
+        }
+
+
+class Metrics:
+    """Latencies, status codes, retries and bytes of Graph calls and webhooks.
+
+    Metrics are opt in. When disabled no Metrics instance is created, and the
+    instrumented code only pays for a None check.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the metrics."""
+        self.started = time.time()
+        self.endpoints: dict[str, EndpointMetrics] = {}
+        self.graph_latency = Histogram()
+        self.webhook_dispatch_latency = Histogram()
+        self.webhook_processing_time = Histogram()
+
+    def _endpoint(self, method: str, url: str) -> EndpointMetrics:
+        """Return the metrics of the endpoint of a request."""
+        name = endpoint_name(method, url)
+        if (endpoint := self.endpoints.get(name)) is None:
+            endpoint = self.endpoints[name] = EndpointMetrics()
+        return endpoint
+
+    def record_request(
+        self,
+        method: str,
+        url: str,
+        status: int | None,
+        duration: float,
+        bytes_sent: int = 0,
+        bytes_received: int = 0,
+    ) -> None:
+        """Record a request attempt, with a status of None if it failed to complete."""
+        endpoint = self._endpoint(method, url)
+        endpoint.requests += 1
+        endpoint.latency.observe(duration)
+        endpoint.bytes_sent += bytes_sent
+        endpoint.bytes_received += bytes_received
+
+        status_key = "error" if status is None else str(status)
+        endpoint.statuses[status_key] = endpoint.statuses.get(status_key, 0) + 1
+        if status is None or status >= 400:
+            endpoint.errors += 1
+
+        self.graph_latency.observe(duration)
+
+    def record_retries(self, method: str, url: str, retries: int) -> None:
+        """Record the retries made by a request."""
+        self._endpoint(method, url).retries += retries
+
+    def record_webhook_entry(
+        self, dispatch_latency: float, processing_time: float
+    ) -> None:
+        """Record the handling of a webhook entry.
+
+        dispatch_latency is the time from receiving the webhook to starting on
+        the entry, and processing_time the time spent handling it.
+        """
+        self.webhook_dispatch_latency.observe(dispatch_latency)
+        self.webhook_processing_time.observe(processing_time)
+
+    @property
+    def requests(self) -> int:
+        """Return the number of Graph requests made."""
+        return sum(endpoint.requests for endpoint in self.endpoints.values())
+
+    @property
+    def errors(self) -> int:
+        """Return the number of Graph requests that failed."""
+        return sum(endpoint.errors for endpoint in self.endpoints.values())
+
+    @property
+    def retries(self) -> int:
+        """Return the number of Graph requests retried."""
+        return sum(endpoint.retries for endpoint in self.endpoints.values())
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return all metrics."""
+        return {
+            "started": self.started,
+            "graph": {
+                "requests": self.requests,
+                "errors": self.errors,
+                "retries": self.retries,
+                "latency": self.graph_latency.as_dict(),
+                "endpoints": {
+                    name: endpoint.as_dict()
+                    for name, endpoint in sorted(self.endpoints.items())
+                },
+            },
+            "webhook": {
+                "dispatch_latency": self.webhook_dispatch_latency.as_dict(),
+                "processing_time": self.webhook_processing_time.as_dict(),
+            },
+        }
@@ -10,9 +10,16 @@ from homeassistant.components.notify import (
     BaseNotificationService,
 )
 from homeassistant.core import HomeAssistant
+from homeassistant.exceptions import HomeAssistantError
 from homeassistant.helpers.typing import ConfigType, DiscoveryInfoType
 
-from .const import ATTR_TEXT, DOMAIN
+from .const import (
+    ATTR_ATTACHMENT,
+    ATTR_ATTACHMENT_TYPE,
+    ATTR_FILE,
+    ATTR_TEXT,
+    DOMAIN,
+)
 from .coordinator import FacebookDataUpdateCoordinator
 
 _LOGGER = logging.getLogger(__name__)
@@ -44,15 +51,41 @@ class FacebookNotificationService(BaseNotificationService):
         self.coordinator = coordinator
 
     async def async_send_message(self, message: str = "", **kwargs: Any) -> None:
-        """Send a message via Facebook Messenger."""
+        """Send a message via Facebook Messenger.
+
+        Messages are queued in the page's outbox and sent in the background.
+        A local file given as file in data is uploaded once and reused, and an
+        attachment given by URL is uploaded once for all targets.
+
+        Targets may be page scoped IDs, or app scoped IDs and friendly names
+        already looked up with the resolve_ids service.
+        """
         body = {ATTR_TEXT: message}
         targets = kwargs.get(ATTR_TARGET)
 
+        if not targets:
+            raise HomeAssistantError("No targets to send the message to")
+
         if data := kwargs.get(ATTR_DATA):
             body.update(data)
 
-        page_id = self.coordinator.page_id
+        attachments = self.coordinator.attachments
+        if (path := body.pop(ATTR_FILE, None)) is not None:
+            body[ATTR_ATTACHMENT] = await attachments.async_get_file_attachment(
+                path, body.pop(ATTR_ATTACHMENT_TYPE, None)
+            )
+        elif isinstance(attachment := body.get(ATTR_ATTACHMENT), dict) and (
+            attachment.get("payload") or {}
+        ).get("url"):
+            body[ATTR_ATTACHMENT] = await attachments.async_get_url_attachment(
+                attachment
+            )
+
+        # Messenger rejects empty text, so send the attachment on its own
+        if ATTR_ATTACHMENT in body and not body[ATTR_TEXT]:
+            del body[ATTR_TEXT]
 
-        for target in targets:
-            recipient = {"id": target}
-            await self.coordinator.fb.page().send_message(page_id, recipient, body)
+        targets = self.coordinator.id_resolver.async_resolve_targets(
+            self.coordinator.page_id, targets
+        )
+        self.coordinator.outbox.async_enqueue(targets, body)
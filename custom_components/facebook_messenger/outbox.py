@@ -0,0 +1,237 @@
+"""Durable outbox for messages sent through the notify service."""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Iterable
+from contextlib import suppress
+from dataclasses import replace
+import logging
+import time
+from typing import TYPE_CHECKING, Any
+import uuid
+
+import async_timeout
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+
+from .api import BATCH_LIMIT, is_retryable_error
+from .const import DOMAIN, STORAGE_KEY
+from .fanout import FanOutResult, async_fan_out
+from .retry import SEND_RETRY_POLICY, CircuitOpenError
+
+if TYPE_CHECKING:
+    from .coordinator import FacebookDataUpdateCoordinator
+
+_LOGGER = logging.getLogger(__name__)
+
+OUTBOX_STORAGE_VERSION = 1
+OUTBOX_SAVE_DELAY = 1
+
+OUTBOX_MAX_ATTEMPTS = 5
+# Delay before retrying a failed message, doubled after every attempt, unless
+# Graph says when to retry
+OUTBOX_RETRY_DELAY = 30
+DEAD_LETTER_LIMIT = 100
+
+# Fired for each message given up on, so automations can react to it
+EVENT_SEND_FAILED = f"{DOMAIN}_send_failed"
+
+# Delivery is at least once, so failures that leave it unknown whether Graph
+# sent the message are retried too
+OUTBOX_RETRY_POLICY = replace(SEND_RETRY_POLICY, retry_ambiguous=True)
+
+
+class Outbox:
+    """Persistent queue of outbound messages for a page.
+
+    Messages are accepted immediately, saved to storage and sent in the
+    background in Graph batches. A message is only removed once Graph accepts
+    it, so anything still queued when Home Assistant stops is replayed on the
+    next start. Messages that keep failing are moved to a dead letter list.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        coordinator: FacebookDataUpdateCoordinator,
+        *,
+        concurrency: int,
+    ) -> None:
+        """Initialize the outbox."""
+        self.hass = hass
+        self.coordinator = coordinator
+        self.concurrency = concurrency
+        self._store = Store(
+            hass,
+            OUTBOX_STORAGE_VERSION,
+            f"{STORAGE_KEY}.outbox.{coordinator.page_id}",
+        )
+        self.pending: list[dict[str, Any]] = []
+        self.dead_letters: list[dict[str, Any]] = []
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    async def async_start(self) -> None:
+        """Load queued messages and start sending them."""
+        if stored := await self._store.async_load():
+            self.pending = stored.get("pending", []) + self.pending
+            self.dead_letters = stored.get("dead_letters", [])
+
+        if self.pending:
+            _LOGGER.info("Replaying %s queued messages", len(self.pending))
+
+        self._task = self.hass.async_create_background_task(
+            self._async_drain(), f"{DOMAIN} {self.coordinator.page_id} outbox"
+        )
+
+    async def async_stop(self) -> None:
+        """Stop sending and save what is still queued."""
+        if self._task is not None:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+        await self._store.async_save(self._data_to_save())
+
+    @callback
+    def async_enqueue(self, targets: Iterable[str], message: dict) -> None:
+        """Queue a message for each target."""
+        now = time.time()
+
+        for target in dict.fromkeys(targets):
+            self.pending.append(
+                {
+                    "id": uuid.uuid4().hex,
+                    "recipient": target,
+                    "message": message,
+                    "attempts": 0,
+                    "created": now,
+                    "next_attempt": now,
+                }
+            )
+
+        self._async_schedule_save()
+        self._wakeup.set()
+
+    @callback
+    def _data_to_save(self) -> dict[str, Any]:
+        """Return the data to store."""
+        return {"pending": self.pending, "dead_letters": self.dead_letters}
+
+    @callback
+    def _async_schedule_save(self) -> None:
+        """Save the outbox after a short delay."""
+        self._store.async_delay_save(self._data_to_save, OUTBOX_SAVE_DELAY)
+
+    async def _async_drain(self) -> None:
+        """Send queued messages as they become due."""
+        while True:
+            self._wakeup.clear()
+            now = time.time()
+
+            due = [item for item in self.pending if item["next_attempt"] <= now]
+            if not due:
+                timeout = None
+                if self.pending:
+                    timeout = min(item["next_attempt"] for item in self.pending) - now
+
+                with suppress(asyncio.TimeoutError):
+                    async with async_timeout.timeout(timeout):
+                        await self._wakeup.wait()
+                continue
+
+            items = due[: BATCH_LIMIT * self.concurrency]
+            result = await self._async_send(items)
+            self._async_process_result(items, result)
+
+    async def _async_send(self, items: list[dict[str, Any]]) -> FanOutResult:
+        """Send items in Graph batches, returning a result per item id."""
+        page_id = self.coordinator.page_id
+        chunks = {
+            index: items[index : index + BATCH_LIMIT]
+            for index in range(0, len(items), BATCH_LIMIT)
+        }
+
+        async def _send_chunk(index: int):
+            batch = self.coordinator.fb.page().batch()
+            for item in chunks[index]:
+                batch.send_message(page_id, {"id": item["recipient"]}, item["message"])
+            return await batch.execute()
+
+        chunk_result = await async_fan_out(chunks, _send_chunk, limit=self.concurrency)
+
+        result = FanOutResult()
+        for index, chunk in chunks.items():
+            if (exc := chunk_result.errors.get(index)) is not None:
+                result.errors.update((item["id"], exc) for item in chunk)
+                continue
+
+            for item, response in zip(chunk, chunk_result.results[index]):
+                if response.ok:
+                    result.results[item["id"]] = response.body
+                else:
+                    result.errors[item["id"]] = response.error
+
+        return result
+
+    @callback
+    def _async_process_result(
+        self, items: list[dict[str, Any]], result: FanOutResult
+    ) -> None:
+        """Remove sent items, and reschedule or dead letter failed ones."""
+        done = set(result.results)
+        now = time.time()
+
+        for item in items:
+            if (exc := result.errors.get(item["id"])) is None:
+                continue
+
+            item["error"] = str(exc)
+
+            if getattr(exc, "throttled", False):
+                # Graph did not fail the message, it will take it after the reset
+                delay = exc.retry_after or OUTBOX_RETRY_DELAY
+                item["next_attempt"] = now + delay
+                _LOGGER.debug(
+                    "Sending to %s throttled, retrying in %ss", item["recipient"], delay
+                )
+                continue
+
+            item["attempts"] += 1
+            retryable = isinstance(exc, CircuitOpenError) or is_retryable_error(
+                exc, OUTBOX_RETRY_POLICY
+            )
+            if retryable and item["attempts"] < OUTBOX_MAX_ATTEMPTS:
+                delay = getattr(exc, "retry_after", None) or (
+                    OUTBOX_RETRY_DELAY * 2 ** (item["attempts"] - 1)
+                )
+                item["next_attempt"] = now + delay
+                _LOGGER.debug(
+                    "Retrying message to %s in %ss: %s", item["recipient"], delay, exc
+                )
+                continue
+
+            _LOGGER.error(
+                "Giving up on message to %s after %s attempts: %s",
+                item["recipient"],
+                item["attempts"],
+                exc,
+            )
+            done.add(item["id"])
+            self.dead_letters.append(item)
+            self.hass.bus.async_fire(
+                EVENT_SEND_FAILED,
+                {
+                    "page_id": self.coordinator.page_id,
+                    "recipient": item["recipient"],
+                    "message": item["message"],
+                    "attempts": item["attempts"],
+                    "error": item["error"],
+                },
+            )
+
+        del self.dead_letters[:-DEAD_LETTER_LIMIT]
+        self.pending = [item for item in self.pending if item["id"] not in done]
+        self._async_schedule_save()
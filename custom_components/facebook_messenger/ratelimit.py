@@ -0,0 +1,186 @@
+"""Rate limiting of Graph API calls driven by Facebook's usage headers."""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Mapping
+from dataclasses import dataclass
+import json
+import logging
+import time
+from typing import Any
+
+_LOGGER = logging.getLogger(__name__)
+
+APP_USAGE_HEADER = "X-App-Usage"
+PAGE_USAGE_HEADER = "X-Page-Usage"
+BUSINESS_USAGE_HEADER = "X-Business-Use-Case-Usage"
+
+USAGE_FIELDS = ("call_count", "total_time", "total_cputime")
+
+DEFAULT_RATE = 20.0
+DEFAULT_BURST = 50.0
+
+# Usage percentage above which the rate is scaled down, reaching
+# MIN_RATE_SCALE of the full rate at 100% usage.
+SLOWDOWN_THRESHOLD = 75.0
+MIN_RATE_SCALE = 0.05
+
+# How long to pause after a throttling error that gives no reset time
+DEFAULT_THROTTLE_BACKOFF = 60.0
+
+
+def _usage_of(stats: Mapping[str, Any]) -> tuple[float, float]:
+    """Return the highest usage percentage and the regain time in seconds."""
+    usage = max((float(stats.get(field) or 0) for field in USAGE_FIELDS), default=0)
+    regain = float(stats.get("estimated_time_to_regain_access") or 0) * 60
+    return usage, regain
+
+
+def parse_usage_headers(headers: Mapping[str, str]) -> tuple[float, float] | None:
+    """Return the highest usage percentage and regain time reported in headers.
+
+    Returns None when the response carries no usage headers.
+    """
+    usages = []
+
+    for header in (APP_USAGE_HEADER, PAGE_USAGE_HEADER):
+        if value := headers.get(header):
+            try:
+                usages.append(_usage_of(json.loads(value)))
+            except (ValueError, AttributeError):
+                _LOGGER.debug("Invalid %s header: %s", header, value)
+
+    if value := headers.get(BUSINESS_USAGE_HEADER):
+        try:
+            for business_usages in json.loads(value).values():
+                usages.extend(_usage_of(stats) for stats in business_usages)
+        except (ValueError, AttributeError, TypeError):
+            _LOGGER.debug("Invalid %s header: %s", BUSINESS_USAGE_HEADER, value)
+
+    if not usages:
+        return None
+
+    return max(usage for usage, _ in usages), max(regain for _, regain in usages)
+
+
+@dataclass
+class TokenBucket:
+    """Token bucket for one rate limited scope."""
+
+    rate: float
+    burst: float
+    tokens: float
+    updated: float
+    usage: float = 0.0
+    blocked_until: float = 0.0
+
+    def refill(self, now: float) -> None:
+        """Add the tokens accrued since the last update."""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+
+class RateLimiter:
+    """Per-scope token buckets that slow down as Graph reports rising usage.
+
+    Each scope, such as an app or a page, gets a bucket refilled at the base
+    rate. Once the usage headers report more than SLOWDOWN_THRESHOLD percent
+    the refill rate is scaled down, and when Graph throttles a scope, or
+    reports a time to regain access, calls are held until then.
+    """
+
+    def __init__(
+        self, *, rate: float = DEFAULT_RATE, burst: float = DEFAULT_BURST
+    ) -> None:
+        """Initialize the rate limiter."""
+        self.rate = rate
+        self.burst = burst
+        self._buckets: dict[str, TokenBucket] = {}
+
+    def _bucket(self, key: str) -> TokenBucket:
+        """Return the bucket for a scope, creating it full."""
+        if (bucket := self._buckets.get(key)) is None:
+            bucket = self._buckets[key] = TokenBucket(
+                rate=self.rate,
+                burst=self.burst,
+                tokens=self.burst,
+                updated=time.monotonic(),
+            )
+        return bucket
+
+    async def async_acquire(self, key: str) -> None:
+        """Wait until a call may be made in a scope."""
+        bucket = self._bucket(key)
+
+        while True:
+            now = time.monotonic()
+
+            if bucket.blocked_until > now:
+                await asyncio.sleep(bucket.blocked_until - now)
+                continue
+
+            bucket.refill(now)
+
+            if bucket.tokens >= 1:
+                bucket.tokens -= 1
+                return
+
+            await asyncio.sleep((1 - bucket.tokens) / bucket.rate)
+
+    def update(self, key: str, headers: Mapping[str, str]) -> None:
+        """Adjust the rate of a scope from the usage headers of a response."""
+        if (parsed := parse_usage_headers(headers)) is None:
+            return
+
+        usage, regain = parsed
+        bucket = self._bucket(key)
+        bucket.refill(time.monotonic())
+        bucket.usage = usage
+
+        if usage > SLOWDOWN_THRESHOLD:
+            scale = (100 - usage) / (100 - SLOWDOWN_THRESHOLD)
+            bucket.rate = self.rate * max(MIN_RATE_SCALE, scale)
+        else:
+            bucket.rate = self.rate
+
+        if regain:
+            self._block(key, bucket, regain)
+
+    def throttled(self, key: str, retry_after: float | None = None) -> float:
+        """Hold calls in a scope after Graph throttled it.
+
+        Returns how long calls in the scope are now held for, in seconds.
+        """
+        bucket = self._bucket(key)
+        bucket.usage = max(bucket.usage, 100.0)
+        bucket.rate = self.rate * MIN_RATE_SCALE
+        self._block(key, bucket, retry_after or DEFAULT_THROTTLE_BACKOFF)
+        return self.blocked_for(key)
+
+    def blocked_for(self, key: str) -> float:
+        """Return how long calls in a scope are held for, in seconds."""
+        if (bucket := self._buckets.get(key)) is None:
+            return 0.0
+        return max(0.0, bucket.blocked_until - time.monotonic())
+
+    def _block(self, key: str, bucket: TokenBucket, seconds: float) -> None:
+        """Hold calls in a scope for a number of seconds."""
+        blocked_until = time.monotonic() + seconds
+        if blocked_until > bucket.blocked_until:
+            _LOGGER.warning(
+                "Graph rate limit reached for %s, pausing %ss", key, seconds
+            )
+            bucket.blocked_until = blocked_until
+
+    @property
+    def utilisation(self) -> dict[str, dict[str, float]]:
+        """Return the usage, current rate and remaining block time per scope."""
+        now = time.monotonic()
+        return {
+            key: {
+                "usage": bucket.usage,
+                "rate": bucket.rate,
+                "blocked_for": max(0.0, bucket.blocked_until - now),
+            }
+            for key, bucket in self._buckets.items()
+        }
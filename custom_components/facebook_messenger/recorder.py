@@ -0,0 +1,86 @@
+"""Recording of received webhook payloads for later replay.
+
+Recordings are JSON lines, gzip compressed when the file name ends in .gz.
+Each line is [received unix time, signature header, payload], the payload
+kept byte for byte so its signature still verifies when it is replayed with
+scripts/webhook_replay.py.
+"""
+from __future__ import annotations
+
+import gzip
+import json
+import logging
+import time
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.event import async_call_later
+
+_LOGGER = logging.getLogger(__name__)
+
+# Recorded payloads are written in batches at most this often
+RECORD_FLUSH_INTERVAL = 1
+
+
+def encode_record(received: float, signature: str | None, payload: bytes) -> str:
+    """Return the recording line of a webhook payload."""
+    return json.dumps(
+        [round(received, 3), signature, payload.decode("utf-8", "surrogateescape")],
+        separators=(",", ":"),
+    )
+
+
+def decode_record(line: str) -> tuple[float, str | None, bytes]:
+    """Return the received time, signature and payload of a recording line."""
+    received, signature, payload = json.loads(line)
+    return received, signature, payload.encode("utf-8", "surrogateescape")
+
+
+class WebhookRecorder:
+    """Appends the payloads of verified webhooks to a recording file."""
+
+    def __init__(self, hass: HomeAssistant, path: str) -> None:
+        """Initialize the recorder."""
+        self.hass = hass
+        self.path = path
+        self.recorded = 0
+        self._lines: list[str] = []
+        self._unsub_flush: CALLBACK_TYPE | None = None
+
+    @callback
+    def async_record(self, payload: bytes, signature: str | None) -> None:
+        """Record a webhook payload, writing it out shortly."""
+        self._lines.append(encode_record(time.time(), signature, payload))
+        self.recorded += 1
+
+        if self._unsub_flush is None:
+            self._unsub_flush = async_call_later(
+                self.hass, RECORD_FLUSH_INTERVAL, self._async_flush
+            )
+
+    @callback
+    def _async_flush(self, _=None) -> None:
+        """Write the recorded payloads in the executor."""
+        self._unsub_flush = None
+        lines, self._lines = self._lines, []
+
+        if lines:
+            self.hass.async_add_executor_job(self._write, lines)
+
+    async def async_close(self, _=None) -> None:
+        """Write any payloads still waiting."""
+        if self._unsub_flush is not None:
+            self._unsub_flush()
+            self._unsub_flush = None
+
+        lines, self._lines = self._lines, []
+        if lines:
+            await self.hass.async_add_executor_job(self._write, lines)
+
+    def _write(self, lines: list[str]) -> None:
+        """Append lines to the recording."""
+        opener = gzip.open if self.path.endswith(".gz") else open
+        try:
+            with opener(self.path, "at", encoding="utf-8") as file:
+                file.write("\n".join(lines) + "\n")
+        except OSError as err:
+            _LOGGER.error("Failed to record webhooks to %s: %s", self.path, err)
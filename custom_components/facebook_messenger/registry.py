@@ -0,0 +1,148 @@
+"""Process-wide registry of Facebook app data shared by all config entries."""
+from __future__ import annotations
+
+import asyncio
+import logging
+import secrets
+import time
+from typing import TYPE_CHECKING, Any
+
+from homeassistant.const import CONF_WEBHOOK_ID
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+
+from .const import (
+    CONF_APP_NAME,
+    CONF_WEBOOK_VERIFY_TOKEN,
+    DATA_REGISTRY,
+    DOMAIN,
+    PAGE_TOKEN_TTL,
+    SAVE_DELAY,
+    STORAGE_KEY,
+    STORAGE_VERSION,
+)
+
+if TYPE_CHECKING:
+    from .api import Facebook
+
+_LOGGER = logging.getLogger(__name__)
+
+
+async def async_get_registry(hass: HomeAssistant) -> AppRegistry:
+    """Return the app registry, loading it from storage on first use."""
+    domain_data = hass.data.setdefault(DOMAIN, {})
+
+    if (load := domain_data.get(DATA_REGISTRY)) is None:
+        registry = AppRegistry(hass)
+        load = domain_data[DATA_REGISTRY] = hass.async_create_task(
+            _async_load_registry(registry)
+        )
+
+    try:
+        return await asyncio.shield(load)
+    except Exception:
+        # Let the next caller try again
+        if domain_data.get(DATA_REGISTRY) is load:
+            domain_data.pop(DATA_REGISTRY)
+        raise
+
+
+async def _async_load_registry(registry: AppRegistry) -> AppRegistry:
+    """Load a registry and return it."""
+    await registry.async_load()
+    return registry
+
+
+class AppRegistry:
+    """App metadata and page tokens, kept in memory and saved to one store.
+
+    Every coordinator reads and writes through the same registry, so storage
+    is loaded once, changes are batched into delayed saves and no coordinator
+    overwrites what another one saved.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize the registry."""
+        self.hass = hass
+        self._store = Store(hass, STORAGE_VERSION, STORAGE_KEY)
+        self.apps: dict[str, dict[str, Any]] = {}
+        self.page_tokens: dict[str, dict[str, Any]] = {}
+        self._app_info_fetches: dict[str, asyncio.Task] = {}
+
+    async def async_load(self) -> None:
+        """Load the registry from storage."""
+        if stored := await self._store.async_load():
+            self.apps = stored.get("apps", {})
+            self.page_tokens = stored.get("page_tokens", {})
+
+    @callback
+    def _data_to_save(self) -> dict[str, Any]:
+        """Return the data to store."""
+        return {"apps": self.apps, "page_tokens": self.page_tokens}
+
+    @callback
+    def async_schedule_save(self) -> None:
+        """Save the registry after SAVE_DELAY seconds."""
+        self._store.async_delay_save(self._data_to_save, SAVE_DELAY)
+
+    @callback
+    def async_get_app(self, client_id: str) -> dict[str, Any]:
+        """Return the data of an app, generating its webhook secrets if missing."""
+        app_data = self.apps.setdefault(client_id, {})
+
+        changed = False
+
+        if app_data.get(CONF_WEBHOOK_ID) is None:
+            webhook_id = app_data[CONF_WEBHOOK_ID] = secrets.token_hex(32)
+            _LOGGER.debug("Generated webhook_id: %s", webhook_id)
+            changed = True
+
+        if app_data.get(CONF_WEBOOK_VERIFY_TOKEN) is None:
+            verify_token = app_data[CONF_WEBOOK_VERIFY_TOKEN] = secrets.token_hex(32)
+            _LOGGER.debug("Generated verify_token: %s", verify_token)
+            changed = True
+
+        if changed is True:
+            self.async_schedule_save()
+
+        return app_data
+
+    async def async_update_app_info(self, fb: Facebook) -> None:
+        """Update the stored app name from Graph.
+
+        Concurrent callers share the request in flight. Later callers fetch
+        the app info again, through the response cache, so a renamed app is
+        picked up once the cached info expires.
+        """
+        client_id = fb.client_id
+
+        if (fetch := self._app_info_fetches.get(client_id)) is None:
+            fetch = self._app_info_fetches[client_id] = self.hass.async_create_task(
+                fb.app().get_app_info(client_id)
+            )
+            fetch.add_done_callback(
+                lambda _: self._app_info_fetches.pop(client_id, None)
+            )
+
+        fb_app_data = await asyncio.shield(fetch)
+
+        app_data = self.async_get_app(client_id)
+        if app_data.get(CONF_APP_NAME) != (app_name := fb_app_data["name"]):
+            app_data[CONF_APP_NAME] = app_name
+            _LOGGER.debug("Got facebook app name: %s", app_name)
+            self.async_schedule_save()
+
+    @callback
+    def async_get_page_token(self, page_id: str) -> dict[str, Any] | None:
+        """Return the cached token of a page and its expiry."""
+        return self.page_tokens.get(page_id)
+
+    @callback
+    def async_set_page_token(self, page_id: str, page_token: str) -> dict[str, Any]:
+        """Cache the token of a page with its expiry."""
+        cached = self.page_tokens[page_id] = {
+            "access_token": page_token,
+            "expires_at": time.time() + PAGE_TOKEN_TTL,
+        }
+        self.async_schedule_save()
+        return cached
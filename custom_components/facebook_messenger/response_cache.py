@@ -0,0 +1,74 @@
+"""Cache of Graph GET responses revalidated with ETags."""
+from __future__ import annotations
+
+from collections import OrderedDict
+from collections.abc import Hashable
+from dataclasses import dataclass
+import time
+from typing import Any
+
+DEFAULT_MAXSIZE = 256
+
+
+@dataclass(slots=True)
+class CachedResponse:
+    """A parsed response body and the validator to revalidate it with."""
+
+    body: Any
+    etag: str | None
+    expires_at: float
+
+    @property
+    def fresh(self) -> bool:
+        """Return True if the body may be used without asking Graph."""
+        return time.monotonic() < self.expires_at
+
+
+class ResponseCache:
+    """Least recently used cache of parsed Graph responses.
+
+    A fresh entry is returned without a request. Once its TTL has passed it
+    is revalidated with If-None-Match, and a 304 response keeps the cached
+    body, so an unchanged object is neither downloaded nor parsed again.
+    """
+
+    def __init__(self, *, maxsize: int = DEFAULT_MAXSIZE) -> None:
+        """Initialize the cache."""
+        self.maxsize = max(1, maxsize)
+        self._entries: OrderedDict[Hashable, CachedResponse] = OrderedDict()
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        """Return the number of cached responses."""
+        return len(self._entries)
+
+    @property
+    def stats(self) -> dict[str, int]:
+        """Return cache size and hit statistics."""
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "revalidated": self.revalidated,
+            "misses": self.misses,
+        }
+
+    def get(self, key: Hashable) -> CachedResponse | None:
+        """Return the cached response for a key, fresh or not."""
+        if (cached := self._entries.get(key)) is not None:
+            self._entries.move_to_end(key)
+        return cached
+
+    def set(self, key: Hashable, body: Any, etag: str | None, ttl: float) -> None:
+        """Cache a response body for ttl seconds."""
+        self._entries[key] = CachedResponse(body, etag, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> None:
+        """Drop the cached response for a key."""
+        self._entries.pop(key, None)
@@ -0,0 +1,194 @@
+"""Retries with backoff and a circuit breaker for Graph API calls."""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+import logging
+import random
+import time
+from typing import TypeVar
+
+import async_timeout
+
+_LOGGER = logging.getLogger(__name__)
+
+_T = TypeVar("_T")
+
+CIRCUIT_FAILURE_THRESHOLD = 5
+CIRCUIT_RESET_TIMEOUT = 30.0
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """How often and how long a call is retried.
+
+    retry_ambiguous controls whether errors that leave it unknown if Graph
+    processed the call, such as timeouts and 5xx responses, are retried. It
+    is only safe for idempotent calls.
+    """
+
+    attempts: int
+    base_delay: float
+    max_delay: float
+    deadline: float
+    retry_ambiguous: bool
+
+    def backoff(self, attempt: int) -> float:
+        """Return the delay before a retry, using exponential backoff with full jitter."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+
+
+GET_RETRY_POLICY = RetryPolicy(
+    attempts=4, base_delay=0.5, max_delay=8, deadline=30, retry_ambiguous=True
+)
+SEND_RETRY_POLICY = RetryPolicy(
+    attempts=3, base_delay=1, max_delay=10, deadline=30, retry_ambiguous=False
+)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling Graph while it is failing."""
+
+
+class CircuitBreaker:
+    """Fails calls fast after repeated failures, until a trial call succeeds.
+
+    After failure_threshold consecutive failures the circuit opens and calls
+    are rejected. Once reset_timeout has passed a single trial call is let
+    through, closing the circuit again if it succeeds.
+    """
+
+    def __init__(
+        self,
+        *,
+        failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+        reset_timeout: float = CIRCUIT_RESET_TIMEOUT,
+    ) -> None:
+        """Initialize the circuit breaker."""
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self._opened_at: float | None = None
+        self._trial_in_flight = False
+
+    @property
+    def is_open(self) -> bool:
+        """Return True if calls are currently being rejected."""
+        return self._opened_at is not None
+
+    def before_call(self) -> None:
+        """Raise CircuitOpenError if a call may not be made now."""
+        if self._opened_at is None:
+            return
+
+        if (
+            time.monotonic() - self._opened_at < self.reset_timeout
+            or self._trial_in_flight
+        ):
+            raise CircuitOpenError("Graph API is failing, not calling it for now")
+
+        self._trial_in_flight = True
+
+    def release(self) -> None:
+        """Release a trial call that ended without an outcome."""
+        self._trial_in_flight = False
+
+    def record_success(self) -> None:
+        """Record a call that reached Graph, closing the circuit."""
+        if self._opened_at is not None:
+            _LOGGER.info("Graph API recovered, closing circuit")
+
+        self.failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        """Record a failed call, opening the circuit after too many."""
+        self.failures += 1
+        self._trial_in_flight = False
+
+        if self._opened_at is not None or self.failures >= self.failure_threshold:
+            if self._opened_at is None:
+                _LOGGER.warning(
+                    "Graph API failed %s times, failing fast for %ss",
+                    self.failures,
+                    self.reset_timeout,
+                )
+            self._opened_at = time.monotonic()
+
+
+async def _async_wait_for_turn(
+    acquire: Callable[[float], Awaitable[None]],
+    remaining: float,
+    last_error: Exception | None,
+) -> None:
+    """Wait for acquire, re-raising the last error if the deadline passes first."""
+    try:
+        async with async_timeout.timeout(max(0, remaining)):
+            await acquire(remaining)
+    except asyncio.TimeoutError:
+        if last_error is not None:
+            raise last_error from None
+        raise
+
+
+async def async_retry(
+    call: Callable[[], Awaitable[_T]],
+    *,
+    policy: RetryPolicy,
+    is_retryable: Callable[[BaseException, RetryPolicy], bool],
+    breaker: CircuitBreaker,
+    acquire: Callable[[float], Awaitable[None]] | None = None,
+) -> _T:
+    """Run call, retrying retryable errors until the policy is exhausted.
+
+    Delays honour a retry_after attribute on the raised error, and no attempt
+    is started or allowed to run past the policy deadline. acquire, such as a
+    rate limiter, is awaited with the seconds left before the deadline before
+    each attempt, and may raise at once if it cannot let the call through in
+    time. Time spent waiting on it is not a failure of the call, so it is
+    never counted by the breaker.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + policy.deadline
+    attempt = 0
+    last_error: Exception | None = None
+
+    while True:
+        if acquire is not None:
+            await _async_wait_for_turn(acquire, deadline - loop.time(), last_error)
+
+        breaker.before_call()
+
+        try:
+            async with async_timeout.timeout(max(0, deadline - loop.time())):
+                result = await call()
+        except asyncio.CancelledError:
+            breaker.release()
+            raise
+        except Exception as exc:
+            retryable = is_retryable(exc, policy)
+
+            if retryable and not getattr(exc, "throttled", False):
+                breaker.record_failure()
+            else:
+                # Graph answered, so it is up even if the call was rejected
+                breaker.record_success()
+
+            attempt += 1
+            last_error = exc
+            if not retryable or attempt >= policy.attempts:
+                raise
+
+            delay = max(policy.backoff(attempt), getattr(exc, "retry_after", 0) or 0)
+            if loop.time() + delay >= deadline:
+                raise
+
+            _LOGGER.debug(
+                "Retrying in %.2fs after attempt %s failed: %s", delay, attempt, exc
+            )
+            await asyncio.sleep(delay)
+        else:
+            breaker.record_success()
+            return result
@@ -1,56 +1,165 @@
 """Sensor platform for facebook_messenger."""
 from __future__ import annotations
 
-from homeassistant.components.sensor import SensorEntity, SensorEntityDescription
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any
+
+from homeassistant.components.sensor import (
+    SensorDeviceClass,
+    SensorEntity,
+    SensorEntityDescription,
+    SensorStateClass,
+)
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.const import EntityCategory, UnitOfTime
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.helpers.event import async_track_time_interval
+
+from .const import DOMAIN
+from .coordinator import FacebookDataUpdateCoordinator
+from .entity import FacebookEntity
+from .metrics import Metrics
+
+# Metrics change with every request, so they are written on an interval
+# rather than on every change
+METRICS_UPDATE_INTERVAL = timedelta(seconds=30)
+
+
+@dataclass
+class FacebookMetricsRequiredKeysMixin:
+    """Mixin for required keys."""
+
+    value_fn: Callable[[Metrics, FacebookDataUpdateCoordinator], Any]
+
+
+@dataclass
+class FacebookMetricsSensorEntityDescription(
+    SensorEntityDescription, FacebookMetricsRequiredKeysMixin
+):
+    """Describes a Facebook metrics sensor."""
+
+    attributes_fn: Callable[[Metrics], dict[str, Any]] | None = None
 
-from .const import DOMAIN, NAME
-from .scheduler import Scheduler
 
 ENTITY_DESCRIPTIONS = (
-    SensorEntityDescription(
-        key="actionsCount",
-        name="Actions count",
-        icon="mdi:format-quote-close",
+    FacebookMetricsSensorEntityDescription(
+        key="graph_requests",
+        name="Graph requests",
+        icon="mdi:api",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda metrics, _: metrics.requests,
+    ),
+    FacebookMetricsSensorEntityDescription(
+        key="graph_errors",
+        name="Graph errors",
+        icon="mdi:alert-circle-outline",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda metrics, _: metrics.errors,
+    ),
+    FacebookMetricsSensorEntityDescription(
+        key="graph_retries",
+        name="Graph retries",
+        icon="mdi:refresh",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda metrics, _: metrics.retries,
+    ),
+    FacebookMetricsSensorEntityDescription(
+        key="graph_latency",
+        name="Graph latency (p95)",
+        device_class=SensorDeviceClass.DURATION,
+        native_unit_of_measurement=UnitOfTime.SECONDS,
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=lambda metrics, _: metrics.graph_latency.percentile(95),
+        attributes_fn=lambda metrics: {
+            name: {
+                "requests": endpoint.requests,
+                "errors": endpoint.errors,
+                "p95": endpoint.latency.percentile(95),
+            }
+            for name, endpoint in metrics.endpoints.items()
+        },
+    ),
+    FacebookMetricsSensorEntityDescription(
+        key="webhook_dispatch_latency",
+        name="Webhook dispatch latency (p95)",
+        device_class=SensorDeviceClass.DURATION,
+        native_unit_of_measurement=UnitOfTime.SECONDS,
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=lambda metrics, _: metrics.webhook_dispatch_latency.percentile(95),
+    ),
+    FacebookMetricsSensorEntityDescription(
+        key="webhook_processing_time",
+        name="Webhook processing time (p95)",
+        device_class=SensorDeviceClass.DURATION,
+        native_unit_of_measurement=UnitOfTime.SECONDS,
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=lambda metrics, _: metrics.webhook_processing_time.percentile(95),
+    ),
+    FacebookMetricsSensorEntityDescription(
+        key="webhook_queue_depth",
+        name="Webhook queue depth",
+        icon="mdi:tray-full",
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=lambda _, coordinator: coordinator.webhook_queue.depth,
     ),
 )
 
 
 async def async_setup_entry(
-    hass: HomeAssistant, entry: ConfigEntry, async_add_devices: AddEntitiesCallback
+    hass: HomeAssistant, entry: ConfigEntry, async_add_entities: AddEntitiesCallback
 ):
     """Set up the sensor platform."""
-    scheduler = hass.data[DOMAIN]["scheduler"]
+    coordinator: FacebookDataUpdateCoordinator = hass.data[DOMAIN][entry.entry_id]
 
-    async_add_devices(
-        ActionsCountSensor(
-            config_entry=entry,
-            entity_description=entity_description,
-            scheduler=scheduler,
-        )
+    async_add_entities(
+        FacebookMetricsSensor(hass, coordinator, entity_description)
         for entity_description in ENTITY_DESCRIPTIONS
     )
 
 
-class ActionsCountSensor(SensorEntity):
-    """facebook_messenger Sensor class."""
+class FacebookMetricsSensor(FacebookEntity, SensorEntity):
+    """Diagnostic sensor showing a Graph or webhook metric."""
+
+    entity_description: FacebookMetricsSensorEntityDescription
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
 
     def __init__(
         self,
-        config_entry: ConfigEntry,
-        entity_description: SensorEntityDescription,
-        scheduler: Scheduler,
+        hass: HomeAssistant,
+        coordinator: FacebookDataUpdateCoordinator,
+        entity_description: FacebookMetricsSensorEntityDescription,
     ) -> None:
         """Initialize the sensor class."""
+        super().__init__(hass, coordinator)
         self.entity_description = entity_description
-        self._config_entry = config_entry
-        self._name = NAME
-        self._attr_unique_id = f"{config_entry.entry_id}-sensor"
-        self._scheduler: Scheduler = scheduler
+        self.key = entity_description.key
+        self._metrics: Metrics = coordinator.fb.metrics
+
+    async def async_added_to_hass(self) -> None:
+        """Write the metric on an interval."""
+        await super().async_added_to_hass()
+        self.async_on_remove(
+            async_track_time_interval(
+                self.hass, self._async_write_metrics, METRICS_UPDATE_INTERVAL
+            )
+        )
+
+    @callback
+    def _async_write_metrics(self, _: datetime) -> None:
+        """Write the current value of the metric."""
+        self.async_write_ha_state()
 
     @property
-    def native_value(self) -> str:
+    def native_value(self) -> Any:
         """Return the native value of the sensor."""
-        return len(self._scheduler.scheduled_actions)
+        return self.entity_description.value_fn(self._metrics, self.coordinator)
+
+    @property
+    def extra_state_attributes(self) -> dict[str, Any] | None:
+        """Return the per endpoint breakdown, if any."""
+        if (attributes_fn := self.entity_description.attributes_fn) is None:
+            return None
+        return attributes_fn(self._metrics)
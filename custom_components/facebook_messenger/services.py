@@ -0,0 +1,132 @@
+"""Services for the Facebook Messenger integration."""
+from __future__ import annotations
+
+import logging
+
+import voluptuous as vol
+
+from homeassistant.core import HomeAssistant, ServiceCall, callback
+from homeassistant.exceptions import HomeAssistantError
+import homeassistant.helpers.config_validation as cv
+
+from .api import BATCH_LIMIT, Facebook
+from .const import (
+    CONF_SEND_CONCURRENCY,
+    DATA_PLATFORM_CONFIG,
+    DEFAULT_SEND_CONCURRENCY,
+    DOMAIN,
+)
+from .coordinator import FacebookDataUpdateCoordinator
+from .fanout import async_fan_out
+from .ids import async_get_id_resolver
+
+_LOGGER = logging.getLogger(__name__)
+
+SERVICE_RESOLVE_IDS = "resolve_ids"
+
+ATTR_IDS = "ids"
+ATTR_NAMES = "names"
+ATTR_PAGE_ID = "page_id"
+
+EVENT_IDS_RESOLVED = f"{DOMAIN}_ids_resolved"
+
+RESOLVE_IDS_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_IDS, default=[]): vol.All(cv.ensure_list, [cv.string]),
+        vol.Optional(ATTR_NAMES, default={}): {cv.string: cv.string},
+        vol.Optional(ATTR_PAGE_ID): cv.string,
+    }
+)
+
+
+@callback
+def async_setup_services(hass: HomeAssistant) -> None:
+    """Register the integration services."""
+
+    async def async_resolve_ids(call: ServiceCall) -> None:
+        await _async_resolve_ids(hass, call)
+
+    hass.services.async_register(
+        DOMAIN, SERVICE_RESOLVE_IDS, async_resolve_ids, schema=RESOLVE_IDS_SCHEMA
+    )
+
+
+async def _async_resolve_ids(hass: HomeAssistant, call: ServiceCall) -> None:
+    """Resolve app scoped IDs to the page scoped IDs of every configured page.
+
+    The lookups of each app are sent as Graph batches, and the results are
+    cached for the notify service and fired as an event.
+    """
+    resolver = await async_get_id_resolver(hass)
+    resolver.async_set_names(call.data[ATTR_NAMES])
+
+    asids = list(dict.fromkeys([*call.data[ATTR_IDS], *call.data[ATTR_NAMES].values()]))
+    if not asids:
+        raise HomeAssistantError("No IDs to resolve")
+
+    coordinators = [
+        coordinator
+        for coordinator in hass.data[DOMAIN].values()
+        if isinstance(coordinator, FacebookDataUpdateCoordinator)
+        and call.data.get(ATTR_PAGE_ID, coordinator.page_id) == coordinator.page_id
+    ]
+    if not coordinators:
+        raise HomeAssistantError("No Facebook pages to resolve IDs for")
+
+    # Pages grouped by the app whose token looks them up
+    apps: dict[str, tuple[FacebookDataUpdateCoordinator, set[str]]] = {}
+    for coordinator in coordinators:
+        apps.setdefault(coordinator.fb.client_id, (coordinator, set()))[1].add(
+            coordinator.page_id
+        )
+
+    concurrency = hass.data[DOMAIN][DATA_PLATFORM_CONFIG].get(
+        CONF_SEND_CONCURRENCY, DEFAULT_SEND_CONCURRENCY
+    )
+    resolved: dict[str, dict[str, str]] = {asid: {} for asid in asids}
+
+    for coordinator, page_ids in apps.values():
+        for asid, psids in (
+            await _async_resolve_for_app(coordinator.fb, asids, concurrency)
+        ).items():
+            for page_id in page_ids.intersection(psids):
+                resolver.async_set_psid(page_id, asid, psids[page_id])
+                resolved[asid][page_id] = psids[page_id]
+
+    hass.bus.async_fire(EVENT_IDS_RESOLVED, {ATTR_IDS: resolved})
+
+
+async def _async_resolve_for_app(
+    fb: Facebook, asids: list[str], concurrency: int
+) -> dict[str, dict[str, str]]:
+    """Return the page scoped IDs of each app scoped ID, keyed by page ID."""
+    chunks = {
+        index: asids[index : index + BATCH_LIMIT]
+        for index in range(0, len(asids), BATCH_LIMIT)
+    }
+
+    async def _resolve_chunk(index: int):
+        batch = fb.app().batch()
+        for asid in chunks[index]:
+            batch.get_ids_for_pages(asid)
+        return await batch.execute()
+
+    result = await async_fan_out(chunks, _resolve_chunk, limit=concurrency)
+
+    for index, exc in result.errors.items():
+        _LOGGER.warning("Failed to resolve %s: %s", ", ".join(chunks[index]), exc)
+
+    psids: dict[str, dict[str, str]] = {}
+    for index, responses in result.results.items():
+        for asid, response in zip(chunks[index], responses):
+            if not response.ok:
+                _LOGGER.warning("Failed to resolve %s: %s", asid, response.error)
+                continue
+
+            psids[asid] = {
+                item["page"]["id"]: item["id"]
+                for item in response.body.get("data", [])
+                if "page" in item
+            }
+
+    return psids
@@ -0,0 +1,133 @@
+"""Dedicated aiohttp sessions for Graph API traffic, shared per app.
+
+Rate limits and Graph failures also apply to an app as a whole, so config
+entries of the same app share its rate limiter and circuit breaker too.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+import logging
+from typing import Any
+
+import aiohttp
+
+from homeassistant.const import EVENT_HOMEASSISTANT_CLOSE
+from homeassistant.core import CALLBACK_TYPE, Event, HomeAssistant, callback
+from homeassistant.helpers.aiohttp_client import SERVER_SOFTWARE
+from homeassistant.util.ssl import client_context
+
+from .const import (
+    CONF_APPS,
+    CONF_CONNECT_TIMEOUT,
+    CONF_CONNECTION,
+    CONF_CONNECTION_LIMIT,
+    CONF_CONNECTION_LIMIT_PER_HOST,
+    CONF_DNS_CACHE_TTL,
+    CONF_KEEPALIVE_TIMEOUT,
+    CONF_READ_TIMEOUT,
+    DATA_PLATFORM_CONFIG,
+    DATA_SESSIONS,
+    DEFAULT_CONNECT_TIMEOUT,
+    DEFAULT_CONNECTION_LIMIT,
+    DEFAULT_CONNECTION_LIMIT_PER_HOST,
+    DEFAULT_DNS_CACHE_TTL,
+    DEFAULT_KEEPALIVE_TIMEOUT,
+    DEFAULT_READ_TIMEOUT,
+    DOMAIN,
+)
+from .ratelimit import RateLimiter
+from .retry import CircuitBreaker
+
+_LOGGER = logging.getLogger(__name__)
+
+
+@dataclass
+class SharedSession:
+    """The Graph session, rate limiter and breaker of an app, and their users."""
+
+    session: aiohttp.ClientSession
+    users: int
+    unsub_close: CALLBACK_TYPE
+    rate_limiter: RateLimiter
+    circuit_breaker: CircuitBreaker
+
+
+def connection_options(hass: HomeAssistant, client_id: str) -> dict[str, Any]:
+    """Return the connection options of an app.
+
+    Options under connection apply to every app, and can be overridden for a
+    single app under apps.
+    """
+    platform_config = hass.data[DOMAIN].get(DATA_PLATFORM_CONFIG, {})
+    app_config = platform_config.get(CONF_APPS, {}).get(client_id, {})
+    return {
+        **platform_config.get(CONF_CONNECTION, {}),
+        **app_config.get(CONF_CONNECTION, {}),
+    }
+
+
+def create_session(options: dict[str, Any]) -> aiohttp.ClientSession:
+    """Create a session with a connection pool tuned for Graph."""
+    connector = aiohttp.TCPConnector(
+        limit=options.get(CONF_CONNECTION_LIMIT, DEFAULT_CONNECTION_LIMIT),
+        limit_per_host=options.get(
+            CONF_CONNECTION_LIMIT_PER_HOST, DEFAULT_CONNECTION_LIMIT_PER_HOST
+        ),
+        keepalive_timeout=options.get(
+            CONF_KEEPALIVE_TIMEOUT, DEFAULT_KEEPALIVE_TIMEOUT
+        ),
+        ttl_dns_cache=options.get(CONF_DNS_CACHE_TTL, DEFAULT_DNS_CACHE_TTL),
+        enable_cleanup_closed=True,
+        ssl=client_context(),
+    )
+    timeout = aiohttp.ClientTimeout(
+        total=None,
+        connect=options.get(CONF_CONNECT_TIMEOUT, DEFAULT_CONNECT_TIMEOUT),
+        sock_read=options.get(CONF_READ_TIMEOUT, DEFAULT_READ_TIMEOUT),
+    )
+    return aiohttp.ClientSession(
+        connector=connector,
+        timeout=timeout,
+        headers={"User-Agent": SERVER_SOFTWARE},
+    )
+
+
+@callback
+def async_get_session(hass: HomeAssistant, client_id: str) -> SharedSession:
+    """Return the Graph session of an app, creating it for the first user."""
+    sessions: dict[str, SharedSession] = hass.data[DOMAIN].setdefault(DATA_SESSIONS, {})
+
+    if (shared := sessions.get(client_id)) is not None:
+        shared.users += 1
+        return shared
+
+    session = create_session(connection_options(hass, client_id))
+
+    async def _async_close(_: Event) -> None:
+        await session.close()
+
+    shared = sessions[client_id] = SharedSession(
+        session,
+        1,
+        hass.bus.async_listen_once(EVENT_HOMEASSISTANT_CLOSE, _async_close),
+        RateLimiter(),
+        CircuitBreaker(),
+    )
+    return shared
+
+
+async def async_release_session(hass: HomeAssistant, client_id: str) -> None:
+    """Release the Graph session of an app, closing it after the last user."""
+    sessions: dict[str, SharedSession] = hass.data[DOMAIN].get(DATA_SESSIONS, {})
+
+    if (shared := sessions.get(client_id)) is None:
+        return
+
+    shared.users -= 1
+    if shared.users > 0:
+        return
+
+    del sessions[client_id]
+    shared.unsub_close()
+    await shared.session.close()
+    _LOGGER.debug("Closed Graph session for app %s", client_id)
@@ -1,7 +1,10 @@
 """Webhook Module."""
+from __future__ import annotations
+
 import hashlib
 import hmac
 import logging
+import time
 
 from aiohttp.web import Request, Response
 
@@ -9,12 +12,24 @@ from homeassistant.components import webhook
 from homeassistant.const import CONF_WEBHOOK_ID
 from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.network import NoURLAvailableError, get_url
-
-from .const import CONF_APP_NAME, CONF_WEBOOK_VERIFY_TOKEN, DOMAIN
+from homeassistant.util.json import json_loads
+
+from .const import (
+    CONF_APP_NAME,
+    CONF_WEBOOK_VERIFY_TOKEN,
+    DATA_RECORDER,
+    DATA_WEBHOOKS,
+    DOMAIN,
+    NAME,
+)
 from .coordinator import FacebookDataUpdateCoordinator
+from .recorder import WebhookRecorder
 
 _LOGGER = logging.getLogger(__name__)
 
+SIGNATURE_HEADER = "x-hub-signature-256"
+SIGNATURE_PREFIX = "sha256="
+
 
 @callback
 async def async_get_webhook_url(hass: HomeAssistant, webhook_id: str):
@@ -51,18 +66,83 @@ async def async_get_webhook_url(hass: HomeAssistant, webhook_id: str):
     return webhook_url
 
 
-def async_unload_webhook(hass: HomeAssistant, app_info: dict):
-    """Unload webhook based entry."""
-    webhook.async_unregister(hass, app_info[CONF_WEBHOOK_ID])
+@callback
+def async_get_webhook_handler(
+    hass: HomeAssistant, app_info: dict, app_secret: str
+) -> WebhookHandler:
+    """Return the webhook handler for an app, registering it if needed.
+
+    All pages of a Facebook App share one webhook, so a single handler is
+    registered per app and dispatches entries to the page coordinators
+    attached to it.
+    """
+    handlers: dict[str, WebhookHandler] = hass.data[DOMAIN][DATA_WEBHOOKS]
+    webhook_id = app_info[CONF_WEBHOOK_ID]
+
+    if (webhook_handler := handlers.get(webhook_id)) is not None:
+        return webhook_handler
+
+    webhook_handler = handlers[webhook_id] = WebhookHandler(
+        verify_token=app_info[CONF_WEBOOK_VERIFY_TOKEN],
+        app_secret=app_secret,
+        recorder=hass.data[DOMAIN].get(DATA_RECORDER),
+    )
+
+    webhook.async_register(
+        hass,
+        DOMAIN,
+        # The app name is only known once the app info has been fetched
+        app_info.get(CONF_APP_NAME, NAME),
+        webhook_id,
+        webhook_handler,
+        allowed_methods=["GET", "POST"],
+        local_only=False,
+    )
+
+    return webhook_handler
 
 
 @callback
-async def async_setup_webhook(hass: HomeAssistant, app_info: dict) -> str:
+def async_attach_webhook(
+    hass: HomeAssistant,
+    app_info: dict,
+    app_secret: str,
+    coordinator: FacebookDataUpdateCoordinator,
+) -> None:
+    """Route webhook entries for the coordinator's page to it."""
+    webhook_handler = async_get_webhook_handler(hass, app_info, app_secret)
+    webhook_handler.attach(coordinator)
+
+
+@callback
+def async_unload_webhook(
+    hass: HomeAssistant, app_info: dict, coordinator: FacebookDataUpdateCoordinator
+):
+    """Detach a page from its app webhook, unregistering it after the last page."""
+    handlers: dict[str, WebhookHandler] = hass.data[DOMAIN][DATA_WEBHOOKS]
+    webhook_id = app_info[CONF_WEBHOOK_ID]
+
+    if (webhook_handler := handlers.get(webhook_id)) is None:
+        return
+
+    webhook_handler.detach(coordinator)
+
+    if not webhook_handler.coordinators:
+        _LOGGER.debug("Last page detached, unregistering webhook %s", webhook_id)
+        webhook.async_unregister(hass, webhook_id)
+        handlers.pop(webhook_id)
+
+
+@callback
+async def async_setup_webhook(
+    hass: HomeAssistant, app_info: dict, app_secret: str
+) -> str:
     """Initialize a webhook based on the configuration entry.
 
     Args:
         hass: Home Assistant instance.
         app_info: app_info dict from coordinator.
+        app_secret: Secret of the Facebook App, used to verify payloads.
 
     Returns:
         str: URL of the registered webhook.
@@ -70,27 +150,37 @@ async def async_setup_webhook(hass: HomeAssistant, app_info: dict) -> str:
 
     webhook_url = await async_get_webhook_url(hass, app_info[CONF_WEBHOOK_ID])
 
-    webhook_handler = WebhookHandler(verify_token=app_info[CONF_WEBOOK_VERIFY_TOKEN])
-
-    webhook.async_register(
-        hass,
-        DOMAIN,
-        app_info[CONF_APP_NAME],
-        app_info[CONF_WEBHOOK_ID],
-        webhook_handler,
-        allowed_methods=["GET", "POST"],
-        local_only=False,
-    )
+    async_get_webhook_handler(hass, app_info, app_secret)
 
     return webhook_url
 
 
 class WebhookHandler:
-    """Handles incoming webhooks."""
-
-    def __init__(self, *, verify_token: str = None):
+    """Handles incoming webhooks for all pages of a Facebook App."""
+
+    def __init__(
+        self,
+        *,
+        verify_token: str = None,
+        app_secret: str,
+        recorder: WebhookRecorder | None = None,
+    ):
         """Initialize the webhook handler."""
         self.verify_token = verify_token
+        self.recorder = recorder
+        self._hmac = hmac.new(app_secret.encode("utf-8"), digestmod=hashlib.sha256)
+        self.coordinators: dict[str, FacebookDataUpdateCoordinator] = {}
+
+    @callback
+    def attach(self, coordinator: FacebookDataUpdateCoordinator) -> None:
+        """Attach a page coordinator to this handler."""
+        self.coordinators[coordinator.page_id] = coordinator
+
+    @callback
+    def detach(self, coordinator: FacebookDataUpdateCoordinator) -> None:
+        """Detach a page coordinator from this handler."""
+        if self.coordinators.get(coordinator.page_id) is coordinator:
+            self.coordinators.pop(coordinator.page_id)
 
     async def __call__(self, hass: HomeAssistant, webhook_id: str, request: Request):
         """Handle incoming webhooks."""
@@ -119,69 +209,70 @@ class WebhookHandler:
         return Response(status=403)
 
     async def handle_post(self, hass: HomeAssistant, request: Request) -> Response:
-        """Handle POST request."""
+        """Handle POST request.
 
-        data: dict = await request.json()
-        _LOGGER.debug(data)
+        The body is read once and its signature verified before it is decoded,
+        so forged or junk requests are rejected without parsing them.
+        """
+        received = time.monotonic()
+        payload = await request.read()
+
+        signature = request.headers.get(SIGNATURE_HEADER)
+        if not self.verify_signature(payload, signature):
+            return Response(status=401)
+
+        if self.recorder is not None:
+            self.recorder.async_record(payload, signature)
 
-        verfied = False
+        try:
+            data = json_loads(payload)
+        except ValueError:
+            _LOGGER.warning("Received webhook payload that is not valid JSON")
+            return Response(status=400)
+
+        if not isinstance(data, dict):
+            return Response(status=400)
+
+        _LOGGER.debug(data)
 
         object_type = data.get("object")
 
+        rejected = False
+
         for entry in data.get("entry", []):
-            page_id = entry["id"]
-            coordinator = find_coordinator_for_page(hass, page_id)
+            coordinator = self.coordinators.get(entry["id"])
 
             if coordinator is None:
                 continue
 
-            if verfied is False:
-                client_secret = coordinator.fb.client_secret
-
-                await verify_request_signature(request, client_secret)
-                verfied = True
+            if not await coordinator.async_enqueue_webhook_entry(
+                object_type, entry, received
+            ):
+                rejected = True
 
-            if verfied is True:
-                hass.async_create_task(
-                    coordinator.handle_webhook_entry(object_type, entry)
-                )
-            else:
-                return Response(status=401)
+        if rejected:
+            # Facebook redelivers the payload when we do not return a 200
+            _LOGGER.warning("Webhook queue full, asking Facebook to retry")
+            return Response(status=503)
 
         return Response(status=200)
 
+    def verify_signature(self, payload: bytes, signature: str | None) -> bool:
+        """Verify the payload signature using a constant time compare."""
+        if not signature:
+            _LOGGER.debug("Couldn't find '%s' in headers", SIGNATURE_HEADER)
+            return False
 
-async def verify_request_signature(request, app_secret):
-    """Verify the request signature by comparing it with the expected signature generated using the provided app secret."""
-    signature = request.headers.get("x-hub-signature-256")
+        if not signature.startswith(SIGNATURE_PREFIX):
+            _LOGGER.debug("Unsupported signature format")
+            return False
 
-    if not signature:
-        _LOGGER.warning("Couldn't find 'x-hub-signature-256' in headers.")
-        return
+        h = self._hmac.copy()
+        h.update(payload)
 
-    signature = signature.split("=")[1]
-    payload = await request.read()
-    expected_signature = hmac.new(
-        app_secret.encode("utf-8"), payload, hashlib.sha256
-    ).hexdigest()
+        if not hmac.compare_digest(signature[len(SIGNATURE_PREFIX) :], h.hexdigest()):
+            _LOGGER.debug("Failed to validate signature")
+            return False
 
-    if signature != expected_signature:
-        _LOGGER.warning("Failed to validate signature")
-    else:
         _LOGGER.debug("Signature validated")
-
-
-def find_coordinator_for_page(
-    hass: HomeAssistant, page_id: str
-) -> FacebookDataUpdateCoordinator | None:
-    """Find the coordinator associated with a specific page ID in HomeAssistant data."""
-    for config_entry in hass.data[DOMAIN]:
-        coordinator: FacebookDataUpdateCoordinator = hass.data[DOMAIN][config_entry]
-
-        if not isinstance(coordinator, FacebookDataUpdateCoordinator):
-            continue
-
-        if coordinator.page_id == page_id:
-            return coordinator
-
-    return None
+        return True
@@ -0,0 +1,151 @@
+"""Bounded work queue with a fixed worker pool."""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Awaitable, Callable
+import logging
+import time
+from typing import Any
+
+from homeassistant.core import HomeAssistant
+
+_LOGGER = logging.getLogger(__name__)
+
+OVERFLOW_DROP_OLDEST = "drop_oldest"
+OVERFLOW_BLOCK = "block"
+OVERFLOW_REJECT = "reject"
+
+OVERFLOW_POLICIES = (OVERFLOW_DROP_OLDEST, OVERFLOW_BLOCK, OVERFLOW_REJECT)
+
+# Weight of the newest sample in the average latency
+LATENCY_SMOOTHING = 0.1
+
+
+class WorkQueue:
+    """Bounded queue processed by a fixed number of workers.
+
+    When the queue is full, new items are handled according to the overflow
+    policy: drop the oldest queued item, wait for room, or reject the new item.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        handler: Callable[[Any], Awaitable[None]],
+        *,
+        name: str,
+        maxsize: int,
+        workers: int,
+        overflow: str = OVERFLOW_DROP_OLDEST,
+    ) -> None:
+        """Initialize the queue."""
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {overflow}")
+
+        self.hass = hass
+        self.name = name
+        self.overflow = overflow
+        self._handler = handler
+        self._queue: asyncio.Queue[tuple[float, Any]] = asyncio.Queue(max(1, maxsize))
+        self._worker_count = max(1, workers)
+        self._workers: list[asyncio.Task] = []
+
+        self.processed = 0
+        self.dropped = 0
+        self.rejected = 0
+        self.failed = 0
+        self.last_latency: float | None = None
+        self.average_latency: float | None = None
+        self.max_latency: float = 0.0
+
+    @property
+    def depth(self) -> int:
+        """Return the number of queued items."""
+        return self._queue.qsize()
+
+    @property
+    def stats(self) -> dict[str, Any]:
+        """Return queue depth and processing statistics."""
+        return {
+            "depth": self.depth,
+            "maxsize": self._queue.maxsize,
+            "workers": self._worker_count,
+            "overflow": self.overflow,
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "rejected": self.rejected,
+            "failed": self.failed,
+            "last_latency": self.last_latency,
+            "average_latency": self.average_latency,
+            "max_latency": self.max_latency,
+        }
+
+    def async_start(self) -> None:
+        """Start the workers."""
+        if self._workers:
+            return
+
+        self._workers = [
+            self.hass.async_create_background_task(
+                self._async_worker(), f"{self.name} worker {index}"
+            )
+            for index in range(self._worker_count)
+        ]
+
+    async def async_stop(self) -> None:
+        """Stop the workers, discarding anything still queued."""
+        for worker in self._workers:
+            worker.cancel()
+
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def async_join(self) -> None:
+        """Wait until every queued item has been processed."""
+        await self._queue.join()
+
+    async def async_put(self, item: Any) -> bool:
+        """Queue an item, returning False if it was rejected."""
+        queued = (time.monotonic(), item)
+
+        if self.overflow == OVERFLOW_BLOCK:
+            await self._queue.put(queued)
+            return True
+
+        if self._queue.full():
+            if self.overflow == OVERFLOW_REJECT:
+                self.rejected += 1
+                return False
+
+            self._queue.get_nowait()
+            self._queue.task_done()
+            self.dropped += 1
+            _LOGGER.debug("%s full, dropped oldest item", self.name)
+
+        self._queue.put_nowait(queued)
+        return True
+
+    async def _async_worker(self) -> None:
+        """Process queued items until cancelled."""
+        while True:
+            queued_at, item = await self._queue.get()
+            try:
+                await self._handler(item)
+            except Exception:  # pylint: disable=broad-except
+                self.failed += 1
+                _LOGGER.exception("Error processing item from %s", self.name)
+            finally:
+                self._queue.task_done()
+
+            self._record_latency(time.monotonic() - queued_at)
+
+    def _record_latency(self, latency: float) -> None:
+        """Record the time an item took from being queued to being processed."""
+        self.processed += 1
+        self.last_latency = latency
+        self.max_latency = max(self.max_latency, latency)
+
+        if self.average_latency is None:
+            self.average_latency = latency
+        else:
+            self.average_latency += LATENCY_SMOOTHING * (latency - self.average_latency)
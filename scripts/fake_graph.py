@@ -0,0 +1,493 @@
+#!/usr/bin/env python3
+"""Stand-in Graph API server for developing and load testing the integration.
+
+Serves the parts of the Graph API the integration uses, with configurable
+latency and injected errors, and can deliver signed webhooks back to Home
+Assistant. The test suite runs it in-process. Point the integration at it
+in configuration.yaml:
+
+    facebook_messenger:
+      graph_url: http://127.0.0.1:8765/v17.0
+
+The OAuth login still goes through Facebook, so set the entry up against the
+real Graph API first, or reuse an existing entry. Counters are served as JSON
+from /_stats.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+from collections import Counter
+import hashlib
+import hmac
+import json
+import logging
+import random
+import time
+from typing import Any
+from urllib.parse import parse_qsl, urlsplit
+import uuid
+
+from aiohttp import ClientError, ClientSession, ClientTimeout, web
+
+_LOGGER = logging.getLogger("fake_graph")
+
+BATCH_LIMIT = 50
+DEFAULT_PAGE_SIZE = 25
+STATS_INTERVAL = 10
+
+
+def graph_error(code: int, message: str, *, transient: bool = False) -> dict:
+    """Return a Graph error body."""
+    return {
+        "error": {
+            "message": message,
+            "type": "OAuthException",
+            "code": code,
+            "is_transient": transient,
+            "fbtrace_id": uuid.uuid4().hex[:11],
+        }
+    }
+
+
+def pick_fields(obj: dict, fields: str | None) -> dict:
+    """Return the requested fields of an object, always including its id."""
+    if not fields:
+        return {key: obj[key] for key in ("id", "name") if key in obj}
+    wanted = {"id", *fields.split(",")}
+    return {key: value for key, value in obj.items() if key in wanted}
+
+
+class FakeGraph:
+    """In-memory Graph API with pages, an app and a webhook subscription."""
+
+    def __init__(self, args: argparse.Namespace) -> None:
+        """Initialize the fake Graph API."""
+        self.args = args
+        self.app = {
+            "id": args.app_id,
+            "name": args.app_name,
+            "link": f"https://www.facebook.com/games/?app_id={args.app_id}",
+        }
+        self.pages: dict[str, dict[str, Any]] = {}
+        for index in range(args.pages):
+            page_id = str(100000000000000 + index)
+            self.pages[page_id] = {
+                "id": page_id,
+                "name": f"Test page {index}",
+                "link": f"https://www.facebook.com/{page_id}",
+                "app_id": args.app_id,
+                "followers_count": 0,
+                "access_token": f"page-token-{page_id}",
+            }
+        self.callback_url: str | None = args.webhook_url
+        self.verify_token: str | None = None
+
+        self.requests: Counter[str] = Counter()
+        self.statuses: Counter[int] = Counter()
+        self.messages_sent = 0
+        self.webhooks: Counter[str] = Counter()
+        self._calls: list[float] = []
+        self._deliveries: set[asyncio.Task] = set()
+
+    def usage(self) -> int:
+        """Return the call count percentage of the usage window."""
+        cutoff = time.monotonic() - self.args.usage_window
+        self._calls = [called for called in self._calls if called > cutoff]
+        return min(100, len(self._calls) * 100 // self.args.call_limit)
+
+    @property
+    def stats(self) -> dict[str, Any]:
+        """Return the request and webhook counters."""
+        return {
+            "requests": dict(self.requests),
+            "statuses": {str(status): count for status, count in self.statuses.items()},
+            "messages_sent": self.messages_sent,
+            "webhooks": dict(self.webhooks),
+            "usage": self.usage(),
+            "callback_url": self.callback_url,
+        }
+
+    async def handle(self, request: web.Request) -> web.Response:
+        """Handle a Graph request, adding latency and injected errors."""
+        if request.path == "/_stats":
+            return web.json_response(self.stats)
+
+        self._calls.append(time.monotonic())
+        delay = self.args.latency + random.uniform(0, self.args.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        headers = {"X-App-Usage": json.dumps({"call_count": self.usage()})}
+
+        if random.random() < self.args.error_rate:
+            status, body = 500, graph_error(
+                2, "Service temporarily unavailable", transient=True
+            )
+        elif random.random() < self.args.throttle_rate or (
+            self.args.enforce_limit and self.usage() >= 100
+        ):
+            status, body = 400, graph_error(4, "Application request limit reached")
+            headers["X-App-Usage"] = json.dumps({"call_count": 100})
+        elif "access_token" not in request.query:
+            status, body = 400, graph_error(104, "An access token is required")
+        else:
+            params = dict(request.query)
+            params.update(await self._read_body(request))
+            path = request.path.split("/")[2:]
+            status, body = await self.dispatch(request.method, path, params)
+
+        self.statuses[status] += 1
+
+        if request.method == "GET" and status == 200:
+            etag = '"' + hashlib.sha1(json.dumps(body).encode()).hexdigest() + '"'
+            headers["ETag"] = etag
+            if request.headers.get("If-None-Match") == etag:
+                if self.args.omit_304_etag:
+                    del headers["ETag"]
+                return web.Response(status=304, headers=headers)
+
+        return web.json_response(body, status=status, headers=headers)
+
+    async def _read_body(self, request: web.Request) -> dict[str, Any]:
+        """Return the JSON or form fields of a request body."""
+        if not request.can_read_body:
+            return {}
+
+        if request.content_type == "application/json":
+            return await request.json()
+
+        fields = {}
+        for key, value in (await request.post()).items():
+            if isinstance(value, web.FileField):
+                fields[key] = len(value.file.read())
+            else:
+                fields[key] = value
+        return fields
+
+    async def dispatch(
+        self, method: str, path: list[str], params: dict[str, Any]
+    ) -> tuple[int, Any]:
+        """Route a request to an endpoint, returning its status and body."""
+        path = [part for part in path if part]
+        endpoint = f"{method} /{'/'.join(['{id}' if part.isdigit() else part for part in path])}"
+        self.requests[endpoint] += 1
+
+        match method, path:
+            case "POST", []:
+                return await self._batch(params)
+            case "GET", ["me", "accounts"]:
+                return self._accounts(params)
+            case "GET", [object_id]:
+                return self._object(object_id, params)
+            case "POST", [page_id, "messages"]:
+                return self._send_message(page_id, params)
+            case "POST", [page_id, "subscribed_apps"] if page_id in self.pages:
+                return 200, {"success": True}
+            case "POST", [app_id, "subscriptions"]:
+                return await self._subscribe(app_id, params)
+            case "POST", [page_id, "message_attachments"]:
+                return 200, {"attachment_id": str(uuid.uuid4().int)[:15]}
+            case "GET", [user_id, "ids_for_pages"]:
+                return self._ids_for_pages(user_id, params)
+            case "GET", [user_id, "ids_for_apps"]:
+                return 200, {"data": [{"id": user_id, "app": self.app}]}
+
+        return 400, graph_error(100, f"Unknown path components: /{'/'.join(path)}")
+
+    def _missing(self, object_id: str) -> tuple[int, dict]:
+        """Return the error for an unknown object."""
+        return 400, graph_error(100, f"Object with ID '{object_id}' does not exist")
+
+    async def _batch(self, params: dict[str, Any]) -> tuple[int, Any]:
+        """Run the operations of a batch request."""
+        try:
+            operations = json.loads(params["batch"])
+        except (KeyError, ValueError):
+            return 400, graph_error(100, "The parameter batch is required")
+
+        if len(operations) > BATCH_LIMIT:
+            return 400, graph_error(
+                100, f"Too many requests in batch, max {BATCH_LIMIT}"
+            )
+
+        results = []
+        for operation in operations:
+            url = urlsplit(operation["relative_url"])
+            op_params = dict(parse_qsl(url.query))
+            op_params.update(parse_qsl(operation.get("body", "")))
+            for key, value in op_params.items():
+                if value[:1] in ("{", "["):
+                    op_params[key] = json.loads(value)
+
+            status, body = await self.dispatch(
+                operation["method"], url.path.split("/"), op_params
+            )
+            results.append({"code": status, "body": json.dumps(body)})
+
+        return 200, results
+
+    def _accounts(self, params: dict[str, Any]) -> tuple[int, dict]:
+        """Return a page of the pages of the user."""
+        page_ids = sorted(self.pages)
+        limit = int(params.get("limit", DEFAULT_PAGE_SIZE))
+        start = (
+            page_ids.index(params["after"]) + 1
+            if params.get("after") in self.pages
+            else 0
+        )
+        chunk = page_ids[start : start + limit]
+
+        body: dict[str, Any] = {
+            "data": [
+                pick_fields(self.pages[page_id], params.get("fields"))
+                for page_id in chunk
+            ]
+        }
+        if chunk:
+            body["paging"] = {"cursors": {"before": chunk[0], "after": chunk[-1]}}
+            if start + limit < len(page_ids):
+                body["paging"]["next"] = f"/me/accounts?after={chunk[-1]}"
+        return 200, body
+
+    def _object(self, object_id: str, params: dict[str, Any]) -> tuple[int, dict]:
+        """Return a page or the app."""
+        if object_id == self.app["id"]:
+            return 200, pick_fields(self.app, params.get("fields"))
+        if (page := self.pages.get(object_id)) is not None:
+            return 200, pick_fields(page, params.get("fields"))
+        return self._missing(object_id)
+
+    def _send_message(self, page_id: str, params: dict[str, Any]) -> tuple[int, dict]:
+        """Accept a message sent from a page."""
+        if page_id not in self.pages:
+            return self._missing(page_id)
+
+        recipient = params.get("recipient") or {}
+        if not recipient.get("id"):
+            return 400, graph_error(100, "The parameter recipient is required")
+
+        self.messages_sent += 1
+        return 200, {
+            "recipient_id": recipient["id"],
+            "message_id": f"m_{uuid.uuid4().hex}",
+        }
+
+    async def _subscribe(self, app_id: str, params: dict[str, Any]) -> tuple[int, dict]:
+        """Verify and store the webhook callback of the app, like Facebook does."""
+        if app_id != self.app["id"]:
+            return self._missing(app_id)
+
+        callback_url = params.get("callback_url")
+        verify_token = params.get("verify_token")
+        challenge = uuid.uuid4().hex
+
+        try:
+            async with ClientSession(
+                timeout=ClientTimeout(total=10)
+            ) as session, session.get(
+                callback_url,
+                params={
+                    "hub.mode": "subscribe",
+                    "hub.challenge": challenge,
+                    "hub.verify_token": verify_token,
+                },
+            ) as resp:
+                verified = resp.status == 200 and await resp.text() == challenge
+        except (ClientError, asyncio.TimeoutError):
+            verified = False
+
+        if not verified:
+            return 400, graph_error(
+                2200, "Callback verification failed: the URL did not echo the challenge"
+            )
+
+        self.callback_url = callback_url
+        self.verify_token = verify_token
+        _LOGGER.info("Webhook subscribed: %s", callback_url)
+        return 200, {"success": True}
+
+    def _ids_for_pages(self, user_id: str, params: dict[str, Any]) -> tuple[int, dict]:
+        """Return the page scoped IDs of a user."""
+        pages = (
+            [self.pages[params["page"]]]
+            if params.get("page") in self.pages
+            else self.pages.values()
+        )
+        return 200, {
+            "data": [
+                {
+                    "id": f"{user_id}{page['id'][-4:]}",
+                    "page": {"id": page["id"], "name": page["name"]},
+                }
+                for page in pages
+            ]
+        }
+
+    def webhook_payload(self) -> bytes:
+        """Return a webhook payload with a message to a random page."""
+        page_id = random.choice(list(self.pages))
+        now = int(time.time() * 1000)
+        return json.dumps(
+            {
+                "object": "page",
+                "entry": [
+                    {
+                        "id": page_id,
+                        "time": now,
+                        "messaging": [
+                            {
+                                "sender": {
+                                    "id": str(random.randint(10**15, 10**16))
+                                },
+                                "recipient": {"id": page_id},
+                                "timestamp": now,
+                                "message": {
+                                    "mid": f"m_{uuid.uuid4().hex}",
+                                    "text": "Hello",
+                                },
+                            }
+                        ],
+                    }
+                ],
+            }
+        ).encode()
+
+    async def deliver_webhooks(self) -> None:
+        """Deliver signed message webhooks at the configured rate."""
+        interval = 1 / self.args.webhook_rate
+        next_at = time.monotonic()
+
+        async with ClientSession(timeout=ClientTimeout(total=10)) as session:
+            while True:
+                next_at += interval
+                await asyncio.sleep(max(0, next_at - time.monotonic()))
+
+                if self.callback_url is None:
+                    continue
+
+                task = asyncio.create_task(
+                    self._deliver(session, self.webhook_payload())
+                )
+                self._deliveries.add(task)
+                task.add_done_callback(self._deliveries.discard)
+
+    async def _deliver(self, session: ClientSession, payload: bytes) -> None:
+        """Post a signed webhook payload to the callback URL."""
+        signature = hmac.new(
+            self.args.app_secret.encode(), payload, hashlib.sha256
+        ).hexdigest()
+        try:
+            async with session.post(
+                self.callback_url,
+                data=payload,
+                headers={
+                    "Content-Type": "application/json",
+                    "X-Hub-Signature-256": f"sha256={signature}",
+                },
+            ) as resp:
+                self.webhooks[str(resp.status)] += 1
+        except (ClientError, asyncio.TimeoutError):
+            self.webhooks["error"] += 1
+
+    async def log_stats(self) -> None:
+        """Log the counters periodically."""
+        while True:
+            await asyncio.sleep(STATS_INTERVAL)
+            _LOGGER.info("%s", json.dumps(self.stats))
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    """Parse the command line, or argv when given."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--app-id", default="1234567890")
+    parser.add_argument("--app-name", default="Fake Messenger app")
+    parser.add_argument(
+        "--app-secret", default="secret", help="used to sign delivered webhooks"
+    )
+    parser.add_argument("--pages", type=int, default=3, help="number of pages")
+    parser.add_argument(
+        "--latency", type=float, default=0.05, help="seconds added to each request"
+    )
+    parser.add_argument(
+        "--jitter", type=float, default=0.02, help="random extra latency in seconds"
+    )
+    parser.add_argument(
+        "--error-rate", type=float, default=0.0, help="share of transient 500 errors"
+    )
+    parser.add_argument(
+        "--throttle-rate", type=float, default=0.0, help="share of throttling errors"
+    )
+    parser.add_argument(
+        "--call-limit",
+        type=int,
+        default=2000,
+        help="calls per usage window reported as 100%% usage",
+    )
+    parser.add_argument(
+        "--usage-window", type=float, default=60.0, help="usage window in seconds"
+    )
+    parser.add_argument(
+        "--enforce-limit",
+        action="store_true",
+        help="throttle calls while usage is at 100%%",
+    )
+    parser.add_argument(
+        "--omit-304-etag",
+        action="store_true",
+        help="leave the ETag out of 304 responses, as some proxies do",
+    )
+    parser.add_argument(
+        "--webhook-url", help="deliver webhooks here without waiting for a subscription"
+    )
+    parser.add_argument(
+        "--webhook-rate", type=float, default=0.0, help="webhooks delivered per second"
+    )
+    parser.add_argument("--verbose", action="store_true")
+    return parser.parse_args(argv)
+
+
+def create_app(graph: FakeGraph) -> web.Application:
+    """Return the web application serving a fake Graph API."""
+    app = web.Application()
+    app.router.add_route("*", "/{tail:.*}", graph.handle)
+    return app
+
+
+def main() -> None:
+    """Run the server."""
+    args = parse_args()
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.INFO,
+        format="%(asctime)s %(levelname)s %(message)s",
+    )
+
+    graph = FakeGraph(args)
+
+    async def _start_background(app: web.Application) -> None:
+        app["tasks"] = [asyncio.create_task(graph.log_stats())]
+        if args.webhook_rate > 0:
+            app["tasks"].append(asyncio.create_task(graph.deliver_webhooks()))
+
+    async def _stop_background(app: web.Application) -> None:
+        for task in app["tasks"]:
+            task.cancel()
+
+    app = create_app(graph)
+    app.on_startup.append(_start_background)
+    app.on_cleanup.append(_stop_background)
+
+    _LOGGER.info(
+        "Serving %s pages of app %s on http://%s:%s",
+        len(graph.pages),
+        args.app_id,
+        args.host,
+        args.port,
+    )
+    web.run_app(app, host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
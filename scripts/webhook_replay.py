@@ -0,0 +1,447 @@
+#!/usr/bin/env python3
+r"""Generate, record and replay Facebook webhook traffic.
+
+Recordings are made by Home Assistant with webhook_record in
+configuration.yaml, or synthesised with the generate command. The format is
+described in custom_components/facebook_messenger/recorder.py: JSON lines,
+gzip compressed for .gz files, of [received unix time, signature, payload].
+
+Replay a recording against a running Home Assistant at its original pace:
+
+    python scripts/webhook_replay.py replay webhooks.jsonl.gz \
+        --url http://localhost:8123/api/webhook/<webhook_id>
+
+or as fast as possible through WebhookHandler and a page coordinator per
+page in this process, reporting what their webhook queues dropped, rejected
+and processed:
+
+    python scripts/webhook_replay.py replay webhooks.jsonl.gz \
+        --in-process --app-secret <secret> --speed 0 --overflow reject
+
+Home Assistant must be installed, as it is with requirements.txt.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+from collections import Counter
+from collections.abc import Iterator
+import gzip
+import hashlib
+import hmac
+import json
+import logging
+import math
+import os
+import random
+import sys
+import time
+from typing import Any
+import uuid
+
+from aiohttp import ClientError, ClientSession
+from multidict import CIMultiDict
+
+# The integration is imported from this checkout
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from custom_components.facebook_messenger.recorder import (  # noqa: E402
+    decode_record,
+    encode_record,
+)
+
+_LOGGER = logging.getLogger("webhook_replay")
+
+SIGNATURE_HEADER = "X-Hub-Signature-256"
+
+
+def open_recording(path: str, mode: str):
+    """Open a recording, gzip compressed if its name ends in .gz."""
+    opener = gzip.open if path.endswith(".gz") else open
+    return opener(path, mode, encoding="utf-8")
+
+
+def read_recording(path: str) -> Iterator[tuple[float, str | None, bytes]]:
+    """Yield the received time, signature and payload of each recorded webhook."""
+    with open_recording(path, "rt") as file:
+        for line in file:
+            if line.strip():
+                yield decode_record(line)
+
+
+def sign(app_secret: str, payload: bytes) -> str:
+    """Return the signature header of a payload."""
+    digest = hmac.new(app_secret.encode(), payload, hashlib.sha256).hexdigest()
+    return f"sha256={digest}"
+
+
+def percentile(values: list[float], percent: float) -> float | None:
+    """Return a percentile of sorted values."""
+    if not values:
+        return None
+    return values[min(len(values) - 1, math.ceil(percent / 100 * len(values)) - 1)]
+
+
+def generate(args: argparse.Namespace) -> None:
+    """Write a recording of synthetic message webhooks."""
+    page_ids = [str(100000000000000 + index) for index in range(args.pages)]
+    senders = [str(random.randint(10**15, 10**16)) for _ in range(args.senders)]
+    started = time.time()
+
+    with open_recording(args.output, "wt") as file:
+        for index in range(args.count):
+            received = started + index / args.rate
+            timestamp = int(received * 1000)
+            page_id = random.choice(page_ids)
+            payload = json.dumps(
+                {
+                    "object": "page",
+                    "entry": [
+                        {
+                            "id": page_id,
+                            "time": timestamp,
+                            "messaging": [
+                                {
+                                    "sender": {"id": random.choice(senders)},
+                                    "recipient": {"id": page_id},
+                                    "timestamp": timestamp,
+                                    "message": {
+                                        "mid": f"m_{uuid.uuid4().hex}",
+                                        "text": f"Message {index}",
+                                    },
+                                }
+                            ],
+                        }
+                    ],
+                },
+                separators=(",", ":"),
+            ).encode()
+            file.write(
+                encode_record(received, sign(args.app_secret, payload), payload) + "\n"
+            )
+
+    _LOGGER.info(
+        "Wrote %d webhooks for %d pages to %s", args.count, args.pages, args.output
+    )
+
+
+class FakeRequest:
+    """Just enough of an aiohttp request for WebhookHandler."""
+
+    method = "POST"
+
+    def __init__(self, payload: bytes, signature: str | None) -> None:
+        """Initialize the request."""
+        self._payload = payload
+        self.headers = CIMultiDict({SIGNATURE_HEADER: signature} if signature else {})
+
+    async def read(self) -> bytes:
+        """Return the body."""
+        return self._payload
+
+
+class InProcessTarget:
+    """Replays webhooks through WebhookHandler into real page coordinators.
+
+    Each page gets a FacebookDataUpdateCoordinator, so entries go through
+    its DedupeCache and WorkQueue to handle_webhook_entry and fire events on
+    a Home Assistant instance in this process. Graph is never called.
+    """
+
+    def __init__(self, args: argparse.Namespace, page_ids: set[str]) -> None:
+        """Initialize the target."""
+        self.args = args
+        self.page_ids = page_ids
+        self.events: Counter[str] = Counter()
+        self.hass = None
+        self.handler = None
+
+    async def async_start(self) -> None:
+        """Create Home Assistant, the coordinators and the webhook handler."""
+        # pylint: disable=import-outside-toplevel
+        from custom_components.facebook_messenger.api import Facebook
+        from custom_components.facebook_messenger.const import (
+            DATA_PLATFORM_CONFIG,
+            DOMAIN,
+        )
+        from custom_components.facebook_messenger.coordinator import (
+            FacebookDataUpdateCoordinator,
+        )
+        from custom_components.facebook_messenger.webhook import WebhookHandler
+        from homeassistant import config_entries
+        from homeassistant.const import MATCH_ALL
+        from homeassistant.core import HomeAssistant
+        from homeassistant.helpers.config_entry_oauth2_flow import (
+            LocalOAuth2Implementation,
+        )
+
+        hass = self.hass = HomeAssistant()
+        hass.data[DOMAIN] = {DATA_PLATFORM_CONFIG: self.platform_config()}
+        hass.bus.async_listen(
+            MATCH_ALL, lambda event: self.events.update((event.event_type,))
+        )
+
+        handler = self.handler = WebhookHandler(app_secret=self.args.app_secret)
+        facebook = Facebook(
+            client_session=None,
+            oauth_implementation=LocalOAuth2Implementation(
+                hass, DOMAIN, "replay", self.args.app_secret, "", ""
+            ),
+            token={"access_token": "replay"},
+        )
+
+        for page_id in sorted(self.page_ids):
+            config_entries.current_entry.set(
+                config_entries.ConfigEntry(
+                    version=1,
+                    domain=DOMAIN,
+                    title=page_id,
+                    data={"page_id": page_id},
+                    source=config_entries.SOURCE_USER,
+                )
+            )
+            coordinator = FacebookDataUpdateCoordinator(hass, facebook)
+            coordinator.webhook_queue.async_start()
+            handler.attach(coordinator)
+
+    def platform_config(self) -> dict[str, Any]:
+        """Return the webhook queue options given on the command line."""
+        # pylint: disable=import-outside-toplevel
+        from custom_components.facebook_messenger.const import (
+            CONF_WEBHOOK_OVERFLOW,
+            CONF_WEBHOOK_QUEUE_SIZE,
+            CONF_WEBHOOK_WORKERS,
+        )
+
+        options = {
+            CONF_WEBHOOK_QUEUE_SIZE: self.args.queue_size,
+            CONF_WEBHOOK_WORKERS: self.args.workers,
+            CONF_WEBHOOK_OVERFLOW: self.args.overflow,
+        }
+        return {key: value for key, value in options.items() if value is not None}
+
+    async def send(self, payload: bytes, signature: str | None) -> int:
+        """Call WebhookHandler with a webhook, returning the response status."""
+        request = FakeRequest(payload, signature)
+        response = await self.handler(self.hass, "replay", request)
+        return response.status
+
+    async def async_stop(self) -> dict[str, Any]:
+        """Wait for the queues to drain, stop them and return their counters."""
+        coordinators = list(self.handler.coordinators.values())
+        for coordinator in coordinators:
+            await coordinator.webhook_queue.async_join()
+            await coordinator.webhook_queue.async_stop()
+        await self.hass.async_block_till_done()
+
+        queues = [coordinator.webhook_queue for coordinator in coordinators]
+        return {
+            "webhook_queue": {
+                counter: sum(getattr(queue, counter) for queue in queues)
+                for counter in ("processed", "dropped", "rejected", "failed")
+            },
+            "max_queue_latency_ms": round(
+                max(queue.max_latency for queue in queues) * 1000, 2
+            ),
+            "duplicates": sum(coordinator.dedupe.hits for coordinator in coordinators),
+            "events_fired": dict(self.events),
+        }
+
+
+def http_sender(session: ClientSession, url: str):
+    """Return a sender posting to a webhook URL."""
+
+    async def _send(payload: bytes, signature: str | None) -> int:
+        headers = {"Content-Type": "application/json"}
+        if signature:
+            headers[SIGNATURE_HEADER] = signature
+        async with session.post(url, data=payload, headers=headers) as resp:
+            await resp.read()
+            return resp.status
+
+    return _send
+
+
+def load_records(args: argparse.Namespace) -> list[tuple[float, str | None, bytes]]:
+    """Return the webhooks to replay, re-signed if an app secret is given."""
+    records = list(read_recording(args.recording))
+    if args.limit:
+        records = records[: args.limit]
+
+    if args.app_secret and not args.keep_signatures:
+        records = [
+            (received, sign(args.app_secret, payload), payload)
+            for received, _, payload in records
+        ]
+    return records
+
+
+def due_offset(args: argparse.Namespace, index: int, elapsed: float) -> float:
+    """Return when a webhook is due, in seconds from the start of the replay."""
+    if args.rate:
+        return index / args.rate
+    if args.speed:
+        return max(0.0, elapsed) / args.speed
+    return 0.0
+
+
+async def replay(args: argparse.Namespace) -> None:
+    """Replay a recording and report throughput, latency and drops."""
+    if not (records := load_records(args)):
+        _LOGGER.error("Nothing to replay in %s", args.recording)
+        return
+
+    session = None
+    target: InProcessTarget | None = None
+    if args.in_process:
+        if not args.app_secret:
+            sys.exit("--app-secret is required with --in-process")
+        page_ids = {
+            entry["id"]
+            for _, _, payload in records
+            for entry in json.loads(payload).get("entry", [])
+        }
+        target = InProcessTarget(args, page_ids)
+        await target.async_start()
+        send = target.send
+    else:
+        session = ClientSession()
+        send = http_sender(session, args.url)
+
+    statuses: Counter[str] = Counter()
+    latencies: list[float] = []
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def _replay_one(payload: bytes, signature: str | None) -> None:
+        started = time.perf_counter()
+        try:
+            status = str(await send(payload, signature))
+        except (ClientError, asyncio.TimeoutError) as err:
+            status = type(err).__name__
+        finally:
+            semaphore.release()
+        latencies.append(time.perf_counter() - started)
+        statuses[status] += 1
+
+    first_received = records[0][0]
+    started = time.perf_counter()
+    tasks = []
+
+    for index, (received, signature, payload) in enumerate(records):
+        due = started + due_offset(args, index, received - first_received)
+        if (delay := due - time.perf_counter()) > 0:
+            await asyncio.sleep(delay)
+
+        await semaphore.acquire()
+        tasks.append(asyncio.create_task(_replay_one(payload, signature)))
+
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+
+    if session is not None:
+        await session.close()
+
+    report = build_report(len(records), elapsed, sorted(latencies), statuses)
+    if target is not None:
+        report.update(await target.async_stop())
+        report["seconds_to_drain"] = round(time.perf_counter() - started, 3)
+
+    _LOGGER.info("%s", json.dumps(report, indent=2))
+
+
+def build_report(
+    sent: int, elapsed: float, latencies: list[float], statuses: Counter[str]
+) -> dict:
+    """Return the throughput, latency percentiles and drops of a replay."""
+    return {
+        "sent": sent,
+        "seconds": round(elapsed, 3),
+        "throughput": round(sent / elapsed, 1) if elapsed else None,
+        "latency_ms": {
+            name: None if value is None else round(value * 1000, 2)
+            for name, value in (
+                ("p50", percentile(latencies, 50)),
+                ("p95", percentile(latencies, 95)),
+                ("p99", percentile(latencies, 99)),
+                ("max", latencies[-1] if latencies else None),
+            )
+        },
+        "statuses": dict(statuses),
+        # Anything but 200 means the webhook was rejected, shed or lost
+        "not_accepted": sent - statuses["200"],
+    }
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse the command line."""
+    parser = argparse.ArgumentParser(
+        description=__doc__.split("\n\n")[0],
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__.split("\n\n", 1)[1],
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    gen = commands.add_parser("generate", help="write synthetic message webhooks")
+    gen.add_argument("output", help="recording to write, .gz to compress")
+    gen.add_argument("--app-secret", required=True, help="secret to sign with")
+    gen.add_argument("--count", type=int, default=1000)
+    gen.add_argument("--pages", type=int, default=3)
+    gen.add_argument("--senders", type=int, default=100)
+    gen.add_argument(
+        "--rate", type=float, default=10.0, help="webhooks per second recorded"
+    )
+
+    rep = commands.add_parser("replay", help="replay a recording")
+    rep.add_argument("recording")
+    target = rep.add_mutually_exclusive_group(required=True)
+    target.add_argument("--url", help="webhook URL of a running Home Assistant")
+    target.add_argument(
+        "--in-process", action="store_true", help="call WebhookHandler directly"
+    )
+    rep.add_argument(
+        "--app-secret", help="re-sign payloads, or verify them with --in-process"
+    )
+    rep.add_argument(
+        "--keep-signatures",
+        action="store_true",
+        help="send the recorded signatures even when --app-secret is given",
+    )
+    pace = rep.add_mutually_exclusive_group()
+    pace.add_argument(
+        "--speed",
+        type=float,
+        default=1.0,
+        help="multiple of the recorded pace, 0 for as fast as possible",
+    )
+    pace.add_argument("--rate", type=float, help="fixed webhooks per second")
+    rep.add_argument(
+        "--concurrency", type=int, default=50, help="webhooks in flight at once"
+    )
+    rep.add_argument("--limit", type=int, help="replay only the first webhooks")
+    queue = rep.add_argument_group(
+        "webhook queue", "with --in-process, as set in configuration.yaml"
+    )
+    queue.add_argument("--queue-size", type=int, help="webhook_queue_size per page")
+    queue.add_argument("--workers", type=int, help="webhook_workers per page")
+    queue.add_argument(
+        "--overflow",
+        choices=("drop_oldest", "block", "reject"),
+        help="webhook_overflow",
+    )
+
+    return parser.parse_args()
+
+
+def main() -> None:
+    """Run the command."""
+    args = parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    if args.command == "generate":
+        generate(args)
+    else:
+        asyncio.run(replay(args))
+
+
+if __name__ == "__main__":
+    main()
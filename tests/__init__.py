@@ -0,0 +1 @@
+"""Tests for the Facebook Messenger integration."""
@@ -0,0 +1,84 @@
+"""Helpers for the Facebook Messenger tests."""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable
+import hashlib
+import hmac
+import json
+import time
+from typing import Any
+import uuid
+
+import async_timeout
+from multidict import CIMultiDict
+
+from .const import CLIENT_SECRET, PAGE_ID
+
+
+class MockRequest:
+    """Just enough of an aiohttp request for WebhookHandler."""
+
+    def __init__(
+        self,
+        method: str = "POST",
+        body: bytes = b"",
+        headers: dict[str, str] | None = None,
+        query: dict[str, str] | None = None,
+    ) -> None:
+        """Initialize the request."""
+        self.method = method
+        self.headers = CIMultiDict(headers or {})
+        self.query = query or {}
+        self._body = body
+
+    async def read(self) -> bytes:
+        """Return the body."""
+        return self._body
+
+
+def sign(payload: bytes, app_secret: str = CLIENT_SECRET) -> str:
+    """Return the signature header of a payload."""
+    digest = hmac.new(app_secret.encode(), payload, hashlib.sha256).hexdigest()
+    return f"sha256={digest}"
+
+
+def signed_request(payload: bytes, app_secret: str = CLIENT_SECRET) -> MockRequest:
+    """Return a webhook POST signed with an app secret."""
+    return MockRequest(
+        body=payload, headers={"X-Hub-Signature-256": sign(payload, app_secret)}
+    )
+
+
+def message_event(
+    page_id: str = PAGE_ID, text: str = "Hello", sender_id: str = "1234"
+) -> dict[str, Any]:
+    """Return a messaging event with a unique mid."""
+    timestamp = int(time.time() * 1000)
+    return {
+        "sender": {"id": sender_id},
+        "recipient": {"id": page_id},
+        "timestamp": timestamp,
+        "message": {"mid": f"m_{uuid.uuid4().hex}", "text": text},
+    }
+
+
+def webhook_payload(entries: dict[str, list[dict[str, Any]]]) -> bytes:
+    """Return a webhook payload with the messaging events of each page."""
+    timestamp = int(time.time() * 1000)
+    return json.dumps(
+        {
+            "object": "page",
+            "entry": [
+                {"id": page_id, "time": timestamp, "messaging": events}
+                for page_id, events in entries.items()
+            ],
+        }
+    ).encode()
+
+
+async def async_wait_for(predicate: Callable[[], bool], timeout: float = 10) -> None:
+    """Wait until a condition holds."""
+    async with async_timeout.timeout(timeout):
+        while not predicate():
+            await asyncio.sleep(0.001)
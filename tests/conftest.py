@@ -0,0 +1,159 @@
+"""Fixtures for the Facebook Messenger tests."""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import AsyncGenerator, Awaitable, Callable
+import time
+from typing import Any
+
+from aiohttp.test_utils import TestServer
+import pytest
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from custom_components.facebook_messenger.api import Facebook
+from custom_components.facebook_messenger.const import CONF_GRAPH_URL, DOMAIN
+from homeassistant.components.application_credentials import (
+    ClientCredential,
+    async_import_client_credential,
+)
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from homeassistant.helpers.config_entry_oauth2_flow import (
+    LocalOAuth2Implementation,
+)
+from homeassistant.setup import async_setup_component
+from scripts.fake_graph import FakeGraph, create_app, parse_args
+
+from .const import CLIENT_ID, CLIENT_SECRET, PAGE_ID, PAGE_NAME, PAGE_TOKEN, USER_TOKEN
+
+
+@pytest.fixture(autouse=True)
+def auto_enable_custom_integrations(enable_custom_integrations):
+    """Enable custom integrations in every test."""
+    yield
+
+
+@pytest.fixture
+def benchmark_async(
+    benchmark, event_loop: asyncio.AbstractEventLoop
+) -> Callable[..., Any]:
+    """Return a function benchmarking a coroutine function on the test loop.
+
+    The benchmark is sync, so tests using it are sync too and still get the
+    async fixtures set up on the same loop.
+    """
+
+    def _benchmark(
+        func: Callable[..., Awaitable[Any]],
+        *,
+        rounds: int = 5,
+        setup: Callable[[], Any] | None = None,
+    ) -> Any:
+        return benchmark.pedantic(
+            lambda *args: event_loop.run_until_complete(func(*args)),
+            setup=setup,
+            rounds=rounds,
+        )
+
+    return _benchmark
+
+
+@pytest.fixture
+def graph_options() -> list[str]:
+    """Return the command line options of the fake Graph API."""
+    return ["--latency", "0", "--jitter", "0"]
+
+
+@pytest.fixture
+def fake_graph(graph_options: list[str]) -> FakeGraph:
+    """Return the fake Graph API."""
+    return FakeGraph(parse_args(graph_options))
+
+
+@pytest.fixture
+async def graph_server(
+    socket_enabled: None, fake_graph: FakeGraph
+) -> AsyncGenerator[TestServer, None]:
+    """Serve the fake Graph API in-process, on a local port."""
+    server = TestServer(create_app(fake_graph))
+    await server.start_server()
+    yield server
+    await server.close()
+
+
+@pytest.fixture
+def graph_url(graph_server: TestServer) -> str:
+    """Return the versioned URL of the fake Graph API."""
+    return str(graph_server.make_url("/v17.0"))
+
+
+@pytest.fixture
+async def facebook(hass: HomeAssistant, graph_url: str) -> Facebook:
+    """Return a Facebook API bound to the test page, using the fake Graph API."""
+    facebook = Facebook(
+        client_session=async_get_clientsession(hass),
+        oauth_implementation=LocalOAuth2Implementation(
+            hass,
+            DOMAIN,
+            CLIENT_ID,
+            CLIENT_SECRET,
+            "https://www.facebook.com/dialog/oauth",
+            "https://graph.facebook.com/oauth/access_token",
+        ),
+        token={"access_token": USER_TOKEN},
+        base_url=graph_url,
+    )
+    facebook.set_page_token(PAGE_TOKEN, PAGE_ID)
+    return facebook
+
+
+@pytest.fixture
+def config_entry(hass: HomeAssistant) -> MockConfigEntry:
+    """Return the config entry of the test page."""
+    config_entry = MockConfigEntry(
+        domain=DOMAIN,
+        title=PAGE_NAME,
+        unique_id=PAGE_ID,
+        data={
+            "auth_implementation": DOMAIN,
+            "token": {
+                "access_token": USER_TOKEN,
+                "token_type": "bearer",
+                "expires_at": time.time() + 3600,
+            },
+            "page_id": PAGE_ID,
+            "page_name": PAGE_NAME,
+            "page_token": PAGE_TOKEN,
+        },
+    )
+    config_entry.add_to_hass(hass)
+    return config_entry
+
+
+@pytest.fixture
+async def setup_credentials(hass: HomeAssistant) -> None:
+    """Import the app credentials."""
+    assert await async_setup_component(hass, "application_credentials", {})
+    await async_import_client_credential(
+        hass, DOMAIN, ClientCredential(CLIENT_ID, CLIENT_SECRET), DOMAIN
+    )
+
+
+@pytest.fixture
+def integration_config(graph_url: str) -> dict[str, Any]:
+    """Return the configuration.yaml of the integration."""
+    return {DOMAIN: {CONF_GRAPH_URL: graph_url}}
+
+
+@pytest.fixture
+async def setup_integration(
+    hass: HomeAssistant,
+    setup_credentials: None,
+    config_entry: MockConfigEntry,
+    integration_config: dict[str, Any],
+) -> MockConfigEntry:
+    """Set up the integration with the test page."""
+    assert await async_setup_component(hass, "webhook", {})
+    assert await async_setup_component(hass, DOMAIN, integration_config)
+    await hass.async_block_till_done()
+    return config_entry
@@ -0,0 +1,9 @@
+"""Constants for the Facebook Messenger tests."""
+
+# These match the defaults of scripts/fake_graph.py
+CLIENT_ID = "1234567890"
+CLIENT_SECRET = "secret"
+USER_TOKEN = "user-token"
+PAGE_ID = "100000000000000"
+PAGE_NAME = "Test page 0"
+PAGE_TOKEN = f"page-token-{PAGE_ID}"
@@ -0,0 +1,355 @@
+"""Tests for the Graph API client."""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable
+import hashlib
+import hmac
+import io
+import json
+import random
+import time
+import tracemalloc
+from typing import Any
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from custom_components.facebook_messenger.api import (
+    APPSECRET_TIME_SKEW,
+    DEFAULT_PAGE_SIZE,
+    AppSecretProofCache,
+    Facebook,
+    FacebookApiError,
+    GraphBatchResponse,
+)
+from custom_components.facebook_messenger.const import DOMAIN
+from custom_components.facebook_messenger.ratelimit import RateLimiter
+from homeassistant.core import HomeAssistant
+from scripts.fake_graph import FakeGraph, graph_error
+
+from .const import CLIENT_ID, CLIENT_SECRET, PAGE_ID, PAGE_TOKEN, USER_TOKEN
+
+REFRESHED_TOKEN = "refreshed-page-token"
+
+PROOF_TOKENS = [USER_TOKEN, f"{CLIENT_ID}|{CLIENT_SECRET}", PAGE_TOKEN]
+PROOFS_PER_ROUND = 10000
+
+ACCOUNTS = 10000
+MANY_ACCOUNTS = ["--latency", "0", "--jitter", "0", "--pages", str(ACCOUNTS)]
+
+
+def proof_of(access_token: str, timestamp: int) -> str:
+    """Return the appsecret proof of a token, computed from scratch."""
+    return hmac.new(
+        CLIENT_SECRET.encode(), f"{access_token}|{timestamp}".encode(), hashlib.sha256
+    ).hexdigest()
+
+
+@pytest.fixture
+def invalid_token(facebook: Facebook, fake_graph: FakeGraph):
+    """Make Graph reject the first request for an invalid token."""
+    facebook.page_token_refresher = AsyncMock(return_value=REFRESHED_TOKEN)
+    dispatch = fake_graph.dispatch
+    tokens = []
+
+    async def _dispatch(method, path, params):
+        tokens.append(params["access_token"])
+        if len(tokens) == 1:
+            return 401, graph_error(190, "Error validating access token")
+        return await dispatch(method, path, params)
+
+    with patch.object(fake_graph, "dispatch", _dispatch):
+        yield tokens
+
+
+async def test_upload_url_refreshes_token(
+    facebook: Facebook, invalid_token: list[str]
+) -> None:
+    """Test an upload by URL is sent again with a refreshed page token."""
+    attachment_id = await facebook.page().upload_attachment(
+        PAGE_ID, "image", url="https://example.com/image.png"
+    )
+
+    assert attachment_id
+    assert invalid_token == [PAGE_TOKEN, REFRESHED_TOKEN]
+    facebook.page_token_refresher.assert_awaited_once()
+
+
+async def test_streamed_upload_not_resent(
+    facebook: Facebook, invalid_token: list[str]
+) -> None:
+    """Test a streamed upload rejected for its token fails instead of being resent."""
+    with pytest.raises(FacebookApiError) as exc_info:
+        await facebook.page().upload_attachment(
+            PAGE_ID,
+            "image",
+            file=io.BytesIO(b"\x89PNG"),
+            filename="image.png",
+            content_type="image/png",
+        )
+
+    assert exc_info.value.invalid_token
+    assert invalid_token == [PAGE_TOKEN]
+    facebook.page_token_refresher.assert_not_awaited()
+
+
+async def test_concurrent_calls_share_refresh(
+    hass: HomeAssistant, fake_graph: FakeGraph, setup_integration: MockConfigEntry
+) -> None:
+    """Test calls rejected for the same page token share one refresh."""
+    fb = hass.data[DOMAIN][setup_integration.entry_id].fb
+    # Facebook replaced the page token, rejecting the one the entry has
+    fake_graph.pages[PAGE_ID]["access_token"] = REFRESHED_TOKEN
+    dispatch = fake_graph.dispatch
+    tokens = []
+
+    async def _dispatch(method, path, params):
+        if path[-1] == "messages":
+            tokens.append(params["access_token"])
+            if params["access_token"] == PAGE_TOKEN:
+                return 401, graph_error(190, "Error validating access token")
+        return await dispatch(method, path, params)
+
+    async def _send(index: int):
+        return await fb.page().send_message(PAGE_ID, {"id": str(index)}, {"text": "Hi"})
+
+    refreshes = fake_graph.requests["GET /me/accounts"]
+    with patch.object(fake_graph, "dispatch", _dispatch):
+        results = await asyncio.gather(*(_send(index) for index in range(10)))
+
+    assert [result["recipient_id"] for result in results] == [
+        str(index) for index in range(10)
+    ]
+    assert fake_graph.requests["GET /me/accounts"] - refreshes == 1
+    # Every call was sent once with the old token and retried once with the new
+    assert sorted(tokens) == sorted([PAGE_TOKEN, REFRESHED_TOKEN] * 10)
+
+
+@pytest.mark.parametrize("omit_etag", [False, True], ids=["etag", "no_etag"])
+async def test_get_page_revalidated(
+    facebook: Facebook, fake_graph: FakeGraph, omit_etag: bool
+) -> None:
+    """Test an unchanged page is revalidated with its ETag and not downloaded."""
+    fake_graph.args.omit_304_etag = omit_etag
+    client = facebook.page()
+    cache = facebook.response_cache
+
+    first = await client.get_page(PAGE_ID)
+    # Still revalidated after a 304, whether or not it repeated the ETag
+    assert await client.get_page(PAGE_ID) == first
+    assert await client.get_page(PAGE_ID) == first
+    assert (cache.misses, cache.revalidated) == (1, 2)
+
+    fake_graph.pages[PAGE_ID]["name"] = "Renamed page"
+    assert (await client.get_page(PAGE_ID))["name"] == "Renamed page"
+    assert (cache.misses, cache.revalidated) == (2, 2)
+
+
+async def test_interleaved_tokens(facebook: Facebook, fake_graph: FakeGraph) -> None:
+    """Test concurrent user, app and page calls each send their own token."""
+    # Vary the latency so that the calls overlap and finish out of order
+    fake_graph.args.jitter = 0.005
+    facebook.rate_limiter = RateLimiter(rate=10000, burst=10000)
+    expected = {
+        "user": USER_TOKEN,
+        "app": f"{CLIENT_ID}|{CLIENT_SECRET}",
+        "page": PAGE_TOKEN,
+    }
+    dispatch = fake_graph.dispatch
+    seen: dict[str, tuple[str, str, str]] = {}
+
+    async def _dispatch(method, path, params):
+        seen[params["recipient"]["id"]] = (
+            params["access_token"],
+            params["appsecret_proof"],
+            params["appsecret_time"],
+        )
+        return await dispatch(method, path, params)
+
+    async def _call(index: int, kind: str) -> None:
+        client = getattr(facebook, kind)()
+        await client.send_message(PAGE_ID, {"id": f"{kind}-{index}"}, {"text": "Hi"})
+
+    calls = [(index, random.choice(list(expected))) for index in range(600)]
+    with patch.object(fake_graph, "dispatch", _dispatch):
+        await asyncio.gather(*(_call(index, kind) for index, kind in calls))
+
+    assert len(seen) == len(calls)
+    for index, kind in calls:
+        token, proof, timestamp = seen[f"{kind}-{index}"]
+        assert token == expected[kind]
+        assert (
+            proof
+            == hmac.new(
+                CLIENT_SECRET.encode(), f"{token}|{timestamp}".encode(), hashlib.sha256
+            ).hexdigest()
+        )
+
+
+async def test_batch(facebook: Facebook, fake_graph: FakeGraph) -> None:
+    """Test each batched operation gets its own result, in order."""
+    batch = facebook.page().batch()
+    page = batch.get_page(PAGE_ID)
+    missing = batch.get_page("999")
+    sent = batch.send_message(PAGE_ID, {"id": "1234"}, {"text": "Hello"})
+
+    results = await batch.execute()
+
+    assert fake_graph.requests["POST /"] == 1
+    assert fake_graph.messages_sent == 1
+    assert len(results) == 3
+    assert results[page].ok
+    assert results[page].body["id"] == PAGE_ID
+    assert not results[missing].ok
+    assert results[missing].error.code == 100
+    assert results[sent].ok
+    assert results[sent].body["recipient_id"] == "1234"
+
+
+async def test_batch_envelope(facebook: Facebook, fake_graph: FakeGraph) -> None:
+    """Test null, failed and malformed entries of a batch envelope."""
+    envelope = [
+        {"code": 200, "headers": [], "body": json.dumps({"id": PAGE_ID})},
+        None,
+        {
+            "code": 400,
+            "body": json.dumps({"error": {"code": 190, "message": "Bad token"}}),
+        },
+        {"code": 500, "body": "Internal error"},
+        {"body": json.dumps({"id": "1"})},
+    ]
+    batch = facebook.page().batch()
+    for _ in envelope:
+        batch.get_page(PAGE_ID)
+
+    with patch.object(fake_graph, "_batch", AsyncMock(return_value=(200, envelope))):
+        results = await batch.execute()
+
+    assert results == [
+        GraphBatchResponse(200, {"id": PAGE_ID}),
+        # Graph returns null for operations that did not complete in time
+        GraphBatchResponse(504, None),
+        GraphBatchResponse(400, {"error": {"code": 190, "message": "Bad token"}}),
+        GraphBatchResponse(500, "Internal error"),
+        GraphBatchResponse(500, {"id": "1"}),
+    ]
+    assert results[1].error is not None
+    assert results[2].error.invalid_token
+    assert results[3].error.code is None
+
+
+async def test_empty_batch(facebook: Facebook, fake_graph: FakeGraph) -> None:
+    """Test an empty batch is not sent."""
+    assert await facebook.page().batch().execute() == []
+    assert not fake_graph.requests
+
+
+def test_proof_cache() -> None:
+    """Test proofs are reused within a time bucket and valid for their time."""
+    cache = AppSecretProofCache(CLIENT_SECRET, bucket_seconds=30)
+
+    with patch("time.time", return_value=1_700_000_010):
+        proof, timestamp = cache.get(PAGE_TOKEN)
+        assert cache.get(PAGE_TOKEN) == (proof, timestamp)
+        assert cache.get(USER_TOKEN)[0] != proof
+
+    assert proof == proof_of(PAGE_TOKEN, timestamp)
+    # Within Facebook's allowed clock skew, and never in the future
+    assert 1_700_000_010 - 30 - APPSECRET_TIME_SKEW <= timestamp < 1_700_000_010
+
+    with patch("time.time", return_value=1_700_000_040):
+        assert cache.get(PAGE_TOKEN)[1] == timestamp + 30
+
+
+@pytest.mark.parametrize("cached", [False, True], ids=["uncached", "cached"])
+def test_proofs_per_second(benchmark, cached: bool) -> None:
+    """Measure proofs per second with and without the proof cache."""
+    benchmark.group = "appsecret proofs"
+    cache = AppSecretProofCache(CLIENT_SECRET)
+
+    def _uncached(access_token: str) -> tuple[str, int]:
+        # What every request did before the cache
+        timestamp = int(time.time()) - APPSECRET_TIME_SKEW
+        return proof_of(access_token, timestamp), timestamp
+
+    get = cache.get if cached else _uncached
+
+    def _proofs() -> None:
+        for index in range(PROOFS_PER_ROUND):
+            get(PROOF_TOKENS[index % len(PROOF_TOKENS)])
+
+    benchmark.pedantic(_proofs, rounds=5)
+    if benchmark.enabled:
+        benchmark.extra_info["proofs_per_second"] = round(
+            PROOFS_PER_ROUND / benchmark.stats.stats.mean
+        )
+
+
+@pytest.mark.parametrize("graph_options", [MANY_ACCOUNTS], ids=["10k_accounts"])
+@pytest.mark.parametrize("position", [0, ACCOUNTS - 1], ids=["first", "last"])
+def test_time_to_first_match(
+    benchmark,
+    benchmark_async: Callable[..., Any],
+    event_loop: asyncio.AbstractEventLoop,
+    facebook: Facebook,
+    fake_graph: FakeGraph,
+    position: int,
+) -> None:
+    """Measure finding a page among 10,000 accounts, stopping at the match."""
+    benchmark.group = "time to first match"
+    # Paging is measured, not the limiter pacing its requests
+    facebook.rate_limiter = RateLimiter(rate=1e6, burst=ACCOUNTS)
+    target = str(int(PAGE_ID) + position)
+    accounts_requests = []
+
+    async def _find() -> None:
+        requests = fake_graph.requests["GET /me/accounts"]
+        async for page in facebook.user().iter_pages(fields="id,access_token"):
+            if page["id"] == target:
+                break
+        assert page["access_token"] == f"page-token-{target}"
+        accounts_requests.append(fake_graph.requests["GET /me/accounts"] - requests)
+
+    benchmark_async(_find)
+    if benchmark.enabled:
+        tracemalloc.start()
+        try:
+            event_loop.run_until_complete(_find())
+            benchmark.extra_info["peak_memory"] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    # Only the pages up to the match are requested
+    assert set(accounts_requests) == {position // DEFAULT_PAGE_SIZE + 1}
+
+
+@pytest.mark.parametrize("graph_options", [MANY_ACCOUNTS], ids=["10k_accounts"])
+async def test_paging_peak_memory(facebook: Facebook) -> None:
+    """Test iterating 10,000 accounts holds one page of them at a time."""
+    facebook.rate_limiter = RateLimiter(rate=1e6, burst=ACCOUNTS)
+    client = facebook.user()
+
+    async def _peak(scan: Callable[[], Any]) -> int:
+        tracemalloc.start()
+        try:
+            await scan()
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    async def _iterate() -> None:
+        count = 0
+        async for _ in client.iter_pages(fields="id,access_token"):
+            count += 1
+        assert count == ACCOUNTS
+
+    async def _list() -> None:
+        pages = [page async for page in client.iter_pages(fields="id,access_token")]
+        assert len(pages) == ACCOUNTS
+
+    iterated = await _peak(_iterate)
+    listed = await _peak(_list)
+
+    assert iterated < listed / 2
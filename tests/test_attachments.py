@@ -0,0 +1,80 @@
+"""Tests for the attachments uploaded once and reused."""
+from __future__ import annotations
+
+import asyncio
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from custom_components.facebook_messenger.const import DOMAIN
+from homeassistant.core import HomeAssistant
+from scripts.fake_graph import FakeGraph
+
+from .common import async_wait_for
+
+UPLOADS = "POST /{id}/message_attachments"
+
+
+@pytest.fixture
+def image(hass: HomeAssistant, tmp_path: Path) -> Path:
+    """Return an image in a directory files may be sent from."""
+    hass.config.allowlist_external_dirs = {str(tmp_path)}
+    path = tmp_path / "snapshot.jpg"
+    path.write_bytes(b"\xff\xd8\xff" + b"\0" * 1024)
+    return path
+
+
+async def test_file_uploaded_once(
+    hass: HomeAssistant,
+    fake_graph: FakeGraph,
+    image: Path,
+    setup_integration: MockConfigEntry,
+) -> None:
+    """Test a file sent again, even under another name, reuses its attachment."""
+    attachments = hass.data[DOMAIN][setup_integration.entry_id].attachments
+    copy = image.with_name("copy.jpg")
+    copy.write_bytes(image.read_bytes())
+    messages = []
+    send_message = fake_graph._send_message
+
+    def _send_message(page_id, params):
+        messages.append(params["message"])
+        return send_message(page_id, params)
+
+    with patch.object(fake_graph, "_send_message", _send_message):
+        for path in (image, copy):
+            await hass.services.async_call(
+                "notify",
+                "facebook_messenger_test_page_0",
+                {"message": "", "target": ["1234"], "data": {"file": str(path)}},
+                blocking=True,
+            )
+        await async_wait_for(lambda: len(messages) == 2)
+
+    assert fake_graph.requests[UPLOADS] == 1
+    assert (attachments.uploads, attachments.hits) == (1, 1)
+    assert messages[0] == messages[1]
+    assert messages[0]["attachment"]["type"] == "image"
+    assert messages[0]["attachment"]["payload"]["attachment_id"]
+
+
+async def test_concurrent_uploads_coalesced(
+    hass: HomeAssistant,
+    fake_graph: FakeGraph,
+    image: Path,
+    setup_integration: MockConfigEntry,
+) -> None:
+    """Test concurrent sends of a file share one upload."""
+    attachments = hass.data[DOMAIN][setup_integration.entry_id].attachments
+    # Keep the upload in flight while the other sends hash the file
+    fake_graph.args.latency = 0.2
+
+    results = await asyncio.gather(
+        *(attachments.async_get_file_attachment(str(image)) for _ in range(5))
+    )
+
+    assert fake_graph.requests[UPLOADS] == 1
+    assert (attachments.uploads, attachments.hits) == (1, 0)
+    assert all(result == results[0] for result in results)
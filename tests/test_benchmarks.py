@@ -0,0 +1,120 @@
+"""End-to-end benchmarks against the fake Graph API.
+
+Run with pytest as usual; pytest-benchmark reports the timings, and
+--benchmark-compare shows regressions against a saved run.
+"""
+from __future__ import annotations
+
+import asyncio
+
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from custom_components.facebook_messenger.const import DATA_WEBHOOKS, DOMAIN
+from homeassistant.config_entries import ConfigEntryState
+from homeassistant.core import HomeAssistant
+from scripts.fake_graph import FakeGraph
+
+from .common import async_wait_for, message_event, signed_request, webhook_payload
+from .const import PAGE_ID
+
+SEND_TARGETS = 200
+WEBHOOK_PAYLOADS = 500
+ROUNDS = 5
+
+
+def test_outbox_send_throughput(
+    benchmark,
+    hass: HomeAssistant,
+    event_loop: asyncio.AbstractEventLoop,
+    fake_graph: FakeGraph,
+    setup_integration: MockConfigEntry,
+) -> None:
+    """Measure sending a notification to many targets through the outbox."""
+    coordinator = hass.data[DOMAIN][setup_integration.entry_id]
+    targets = [str(10**15 + index) for index in range(SEND_TARGETS)]
+
+    async def _send() -> None:
+        sent = fake_graph.messages_sent
+        await hass.services.async_call(
+            "notify",
+            "facebook_messenger_test_page_0",
+            {"message": "Benchmark", "target": targets},
+            blocking=True,
+        )
+        await async_wait_for(
+            lambda: fake_graph.messages_sent - sent >= SEND_TARGETS
+            and not coordinator.outbox.pending
+        )
+        assert fake_graph.messages_sent - sent == SEND_TARGETS
+
+    benchmark.pedantic(lambda: event_loop.run_until_complete(_send()), rounds=ROUNDS)
+
+    assert not coordinator.outbox.dead_letters
+
+
+def test_webhook_ingest(
+    benchmark,
+    hass: HomeAssistant,
+    event_loop: asyncio.AbstractEventLoop,
+    setup_integration: MockConfigEntry,
+) -> None:
+    """Measure webhooks from being received to their events being fired."""
+    coordinator = hass.data[DOMAIN][setup_integration.entry_id]
+    webhook_id, handler = next(iter(hass.data[DOMAIN][DATA_WEBHOOKS].items()))
+
+    fired = []
+    hass.bus.async_listen(f"{DOMAIN}_message", fired.append)
+
+    def _requests():
+        payloads = [
+            webhook_payload({PAGE_ID: [message_event()]})
+            for _ in range(WEBHOOK_PAYLOADS)
+        ]
+        return ([signed_request(payload) for payload in payloads],), {}
+
+    async def _ingest(requests) -> None:
+        expected = len(fired) + len(requests)
+        for request in requests:
+            response = await handler(hass, webhook_id, request)
+            assert response.status == 200
+        await async_wait_for(lambda: len(fired) >= expected)
+        assert len(fired) == expected
+
+    benchmark.pedantic(
+        lambda requests: event_loop.run_until_complete(_ingest(requests)),
+        setup=_requests,
+        rounds=ROUNDS,
+    )
+
+    assert coordinator.dedupe.hits == 0
+    assert coordinator.webhook_queue.dropped == 0
+
+
+def test_setup_entry_startup_time(
+    benchmark,
+    hass: HomeAssistant,
+    event_loop: asyncio.AbstractEventLoop,
+    fake_graph: FakeGraph,
+    setup_integration: MockConfigEntry,
+) -> None:
+    """Measure setting up a config entry, as on a restart or reload."""
+    entry_id = setup_integration.entry_id
+
+    def _unload():
+        event_loop.run_until_complete(hass.config_entries.async_unload(entry_id))
+
+    async def _setup() -> None:
+        assert await hass.config_entries.async_setup(entry_id)
+        await hass.async_block_till_done()
+
+    benchmark.pedantic(
+        lambda: event_loop.run_until_complete(_setup()),
+        setup=_unload,
+        rounds=ROUNDS,
+    )
+
+    assert setup_integration.state is ConfigEntryState.LOADED
+    timings = hass.data[DOMAIN][entry_id].startup_timings
+    assert {"load", "page_token", "app_data", "first_refresh", "total"} <= set(timings)
+    # The cached page token is used, so the pages are never listed
+    assert "GET /me/accounts" not in fake_graph.requests
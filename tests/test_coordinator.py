@@ -0,0 +1,179 @@
+"""Tests for the Facebook Messenger coordinator."""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable
+from datetime import timedelta
+import time
+from typing import Any
+from unittest.mock import Mock, patch
+
+import pytest
+from pytest_homeassistant_custom_component.common import (
+    MockConfigEntry,
+    async_fire_time_changed,
+)
+
+from custom_components.facebook_messenger.api import FacebookApiError
+from custom_components.facebook_messenger.const import (
+    ACTIVE_UPDATE_INTERVAL,
+    DOMAIN,
+    IDLE_UPDATE_INTERVAL,
+)
+from custom_components.facebook_messenger.retry import CircuitOpenError
+from homeassistant.core import HomeAssistant
+from homeassistant.exceptions import ConfigEntryAuthFailed
+from homeassistant.helpers.update_coordinator import (
+    REQUEST_REFRESH_DEFAULT_COOLDOWN,
+    UpdateFailed,
+)
+from homeassistant.util import dt as dt_util
+from scripts.fake_graph import FakeGraph
+
+from .common import message_event
+from .const import PAGE_ID
+
+# Minutes of the day conversations start at, and their messages
+CONVERSATIONS = [9 * 60, 13 * 60, 19 * 60]
+MESSAGES_PER_CONVERSATION = 10
+MINUTES_BETWEEN_MESSAGES = 2
+# Polling every page every 5 minutes, as before adaptive polling
+FIXED_POLLS = timedelta(days=1) // ACTIVE_UPDATE_INTERVAL
+
+
+@pytest.mark.parametrize(
+    "error",
+    [
+        FacebookApiError(500, {"code": 2, "message": "Service unavailable"}),
+        CircuitOpenError("Graph API is failing, not calling it for now"),
+    ],
+)
+async def test_poll_error(
+    hass: HomeAssistant, setup_integration: MockConfigEntry, error: Exception
+) -> None:
+    """Test a failed poll is reported as an update failure."""
+    coordinator = hass.data[DOMAIN][setup_integration.entry_id]
+
+    with patch(
+        "custom_components.facebook_messenger.api.FacebookClient.get_page",
+        side_effect=error,
+    ):
+        await coordinator.async_refresh()
+
+    assert not coordinator.last_update_success
+    assert isinstance(coordinator.last_exception, UpdateFailed)
+
+
+async def test_poll_invalid_token(
+    hass: HomeAssistant, setup_integration: MockConfigEntry
+) -> None:
+    """Test a poll rejected for an invalid token starts reauthentication."""
+    coordinator = hass.data[DOMAIN][setup_integration.entry_id]
+
+    with patch(
+        "custom_components.facebook_messenger.api.FacebookClient.get_page",
+        side_effect=FacebookApiError(401, {"code": 190, "message": "Invalid token"}),
+    ):
+        await coordinator.async_refresh()
+    await hass.async_block_till_done()
+
+    assert isinstance(coordinator.last_exception, ConfigEntryAuthFailed)
+    flows = hass.config_entries.flow.async_progress()
+    assert [flow["context"]["source"] for flow in flows] == ["reauth"]
+
+
+async def test_activity_polls_page(
+    hass: HomeAssistant, fake_graph: FakeGraph, setup_integration: MockConfigEntry
+) -> None:
+    """Test webhook activity on an idle page polls it, then at the active interval."""
+    coordinator = hass.data[DOMAIN][setup_integration.entry_id]
+    assert coordinator.update_interval == IDLE_UPDATE_INTERVAL
+    polls = fake_graph.requests["GET /{id}"]
+
+    entry = {"id": PAGE_ID, "messaging": [message_event()]}
+    assert await coordinator.async_enqueue_webhook_entry("page", entry)
+    # The refresh requested is debounced after the one done during setup
+    now = dt_util.utcnow() + timedelta(seconds=REQUEST_REFRESH_DEFAULT_COOLDOWN)
+    async_fire_time_changed(hass, now)
+    await hass.async_block_till_done()
+
+    assert coordinator.update_interval == ACTIVE_UPDATE_INTERVAL
+    assert fake_graph.requests["GET /{id}"] - polls == 1
+
+    async_fire_time_changed(hass, now + ACTIVE_UPDATE_INTERVAL)
+    await hass.async_block_till_done()
+    assert fake_graph.requests["GET /{id}"] - polls == 2
+
+
+@pytest.mark.parametrize("adaptive", [False, True], ids=["fixed", "adaptive"])
+def test_polling_simulation(
+    benchmark,
+    benchmark_async: Callable[..., Any],
+    hass: HomeAssistant,
+    event_loop: asyncio.AbstractEventLoop,
+    fake_graph: FakeGraph,
+    setup_integration: MockConfigEntry,
+    adaptive: bool,
+) -> None:
+    """Count the page polls of a simulated day of webhook traffic."""
+    benchmark.group = "polling simulation"
+    coordinator = hass.data[DOMAIN][setup_integration.entry_id]
+    start = dt_util.utcnow()
+    minute = 0
+    message_minutes = {
+        first + index * MINUTES_BETWEEN_MESSAGES
+        for first in CONVERSATIONS
+        for index in range(MESSAGES_PER_CONVERSATION)
+    }
+    clock = Mock(wraps=time, monotonic=lambda: minute * 60)
+    polls = 0
+
+    async def _day() -> None:
+        nonlocal minute, polls
+        # Start the day from a poll, which schedules the next one
+        await coordinator.async_refresh()
+        polls = fake_graph.requests["GET /{id}"]
+
+        for minute in range(1, 24 * 60 + 1):
+            if minute in message_minutes:
+                entry = {"id": PAGE_ID, "messaging": [message_event()]}
+                assert await coordinator.async_enqueue_webhook_entry("page", entry)
+            async_fire_time_changed(hass, start + timedelta(minutes=minute))
+            await hass.async_block_till_done()
+
+    with patch("custom_components.facebook_messenger.coordinator.time", clock), patch(
+        "homeassistant.helpers.update_coordinator.utcnow",
+        lambda: start + timedelta(minutes=minute),
+    ), patch(
+        "custom_components.facebook_messenger.coordinator.IDLE_UPDATE_INTERVAL",
+        IDLE_UPDATE_INTERVAL if adaptive else ACTIVE_UPDATE_INTERVAL,
+    ):
+        benchmark_async(_day, rounds=1)
+    polls = fake_graph.requests["GET /{id}"] - polls
+
+    if benchmark.enabled:
+        benchmark.extra_info["api_calls"] = polls
+
+    if adaptive:
+        # Idle polls, plus the active ones during and after each conversation
+        assert polls < FIXED_POLLS / 5
+    else:
+        assert polls == FIXED_POLLS
+
+
+async def test_unchanged_poll_skips_listeners(
+    hass: HomeAssistant, fake_graph: FakeGraph, setup_integration: MockConfigEntry
+) -> None:
+    """Test listeners are only updated when a poll returns changed data."""
+    coordinator = hass.data[DOMAIN][setup_integration.entry_id]
+    updates = []
+    unsub = coordinator.async_add_listener(lambda: updates.append(coordinator.data))
+
+    await coordinator.async_refresh()
+    await coordinator.async_refresh()
+    assert updates == []
+
+    fake_graph.pages[PAGE_ID]["name"] = "Renamed page"
+    await coordinator.async_refresh()
+    assert [data["name"] for data in updates] == ["Renamed page"]
+    unsub()
@@ -0,0 +1,146 @@
+"""Tests for deduplication of redelivered webhook events."""
+from __future__ import annotations
+
+import random
+import tracemalloc
+from typing import Any
+from unittest.mock import patch
+
+import pytest
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from custom_components.facebook_messenger.const import (
+    CONF_GRAPH_URL,
+    CONF_WEBHOOK_OVERFLOW,
+    CONF_WEBHOOK_QUEUE_SIZE,
+    CONF_WEBHOOK_WORKERS,
+    DATA_WEBHOOKS,
+    DOMAIN,
+)
+from custom_components.facebook_messenger.dedupe import (
+    DedupeCache,
+    messaging_event_key,
+)
+from homeassistant.core import HomeAssistant
+
+from .common import async_wait_for, message_event, signed_request, webhook_payload
+from .const import PAGE_ID
+
+
+@pytest.fixture
+def integration_config(graph_url: str) -> dict[str, Any]:
+    """Return a configuration with a webhook queue that rejects when full."""
+    return {
+        DOMAIN: {
+            CONF_GRAPH_URL: graph_url,
+            CONF_WEBHOOK_QUEUE_SIZE: 1,
+            CONF_WEBHOOK_WORKERS: 1,
+            CONF_WEBHOOK_OVERFLOW: "reject",
+        }
+    }
+
+
+def test_duplicate_replay() -> None:
+    """Test redelivered events are recognised and counted as hits."""
+    cache = DedupeCache(maxsize=10000, ttl=3600)
+    events = [message_event() for _ in range(1000)]
+    # Facebook redelivers some events, in any order
+    redelivered = random.sample(events, 300)
+    deliveries = events + redelivered
+    random.shuffle(deliveries)
+
+    first = [
+        event for event in deliveries if not cache.seen(messaging_event_key(event))
+    ]
+
+    assert len(first) == len(events)
+    assert {event["message"]["mid"] for event in first} == {
+        event["message"]["mid"] for event in events
+    }
+    assert cache.stats["hits"] == len(redelivered)
+    assert cache.stats["misses"] == len(events)
+    assert cache.stats["hit_rate"] == pytest.approx(len(redelivered) / len(deliveries))
+
+
+def test_expiry() -> None:
+    """Test a key is processed again once its TTL has passed."""
+    cache = DedupeCache(maxsize=10, ttl=60)
+
+    with patch("time.monotonic", return_value=1000):
+        assert not cache.seen("m_1")
+        assert cache.seen("m_1")
+
+    with patch("time.monotonic", return_value=1061):
+        assert not cache.seen("m_1")
+
+
+def test_memory_ceiling() -> None:
+    """Test the cache holds at most maxsize keys, and stops growing there."""
+    maxsize = 1000
+    cache = DedupeCache(maxsize=maxsize, ttl=3600)
+
+    tracemalloc.start()
+    try:
+        for index in range(maxsize):
+            cache.seen(f"m_{index:032x}")
+        full = tracemalloc.get_traced_memory()[0]
+
+        for index in range(maxsize, 50 * maxsize):
+            cache.seen(f"m_{index:032x}")
+            assert len(cache) <= maxsize
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+    assert len(cache) == maxsize
+    # The oldest keys were evicted, the newest are still recognised
+    assert not cache.seen(f"m_{0:032x}")
+    assert cache.seen(f"m_{50 * maxsize - 1:032x}")
+    assert after < full * 1.5
+
+
+async def test_rejected_entry_redelivered(
+    hass: HomeAssistant, setup_integration: MockConfigEntry
+) -> None:
+    """Test an entry rejected by a full queue is processed when redelivered."""
+    coordinator = hass.data[DOMAIN][setup_integration.entry_id]
+    queue = coordinator.webhook_queue
+    fired = []
+    hass.bus.async_listen(f"{DOMAIN}_message", fired.append)
+
+    # Hold the queue full while its worker is stopped
+    await queue.async_stop()
+    queued = {"id": PAGE_ID, "messaging": [message_event()]}
+    rejected = {"id": PAGE_ID, "messaging": [message_event(text="Rejected")]}
+    assert await coordinator.async_enqueue_webhook_entry("page", queued)
+
+    assert not await coordinator.async_enqueue_webhook_entry("page", rejected)
+    assert queue.rejected == 1
+    # The rejected event was forgotten, so its redelivery is not a duplicate
+    assert coordinator.dedupe.stats["size"] == 1
+
+    queue.async_start()
+    await async_wait_for(lambda: len(fired) == 1)
+    assert await coordinator.async_enqueue_webhook_entry("page", rejected)
+    await async_wait_for(lambda: len(fired) == 2)
+
+    assert [event.data["text"] for event in fired] == ["Hello", "Rejected"]
+    assert coordinator.dedupe.hits == 0
+
+
+async def test_rejected_webhook_asks_for_redelivery(
+    hass: HomeAssistant, setup_integration: MockConfigEntry
+) -> None:
+    """Test a webhook the queue rejects is answered with a 503."""
+    coordinator = hass.data[DOMAIN][setup_integration.entry_id]
+    webhook_id, handler = next(iter(hass.data[DOMAIN][DATA_WEBHOOKS].items()))
+
+    await coordinator.webhook_queue.async_stop()
+    payloads = [webhook_payload({PAGE_ID: [message_event()]}) for _ in range(2)]
+
+    first = await handler(hass, webhook_id, signed_request(payloads[0]))
+    second = await handler(hass, webhook_id, signed_request(payloads[1]))
+
+    assert first.status == 200
+    assert second.status == 503
+    assert coordinator.webhook_queue.rejected == 1
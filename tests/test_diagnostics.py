@@ -0,0 +1,42 @@
+"""Tests for facebook_messenger diagnostics."""
+from __future__ import annotations
+
+import pytest
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from custom_components.facebook_messenger.diagnostics import (
+    async_get_config_entry_diagnostics,
+)
+from homeassistant.components.diagnostics import REDACTED
+from homeassistant.core import HomeAssistant
+
+from .const import PAGE_TOKEN, USER_TOKEN
+
+
+@pytest.fixture
+def config_entry(hass: HomeAssistant, config_entry: MockConfigEntry) -> MockConfigEntry:
+    """Return a config entry from before the page list was dropped from it."""
+    hass.config_entries.async_update_entry(
+        config_entry,
+        data={
+            **config_entry.data,
+            "page_data": [
+                {"id": "1", "name": "Other page", "access_token": "other-token"}
+            ],
+        },
+    )
+    return config_entry
+
+
+async def test_diagnostics_redacts_tokens(
+    hass: HomeAssistant, setup_integration: MockConfigEntry
+) -> None:
+    """Test no access token appears in the diagnostics."""
+    diagnostics = await async_get_config_entry_diagnostics(hass, setup_integration)
+
+    data = diagnostics["entry"]["data"]
+    assert data["token"] == REDACTED
+    assert data["page_token"] == REDACTED
+    assert data["page_data"][0]["access_token"] == REDACTED
+    for secret in (USER_TOKEN, PAGE_TOKEN, "other-token"):
+        assert secret not in str(diagnostics)
@@ -0,0 +1,134 @@
+"""Tests for the typed messaging event parser."""
+from __future__ import annotations
+
+import json
+from typing import Any
+
+import pytest
+
+from custom_components.facebook_messenger.events import (
+    DeliveryEvent,
+    MessageEvent,
+    PostbackEvent,
+    ReadEvent,
+    parse_messaging_event,
+)
+from homeassistant.util.json import json_loads
+
+from .const import PAGE_ID
+
+EVENTS_PER_PAYLOAD = 5000
+
+
+def raw_event(index: int) -> dict[str, Any]:
+    """Return one of the messaging event types, as Facebook sends them."""
+    common = {
+        "sender": {"id": "1234"},
+        "recipient": {"id": PAGE_ID},
+        "timestamp": 1700000000000 + index,
+    }
+    match index % 5:
+        case 0:
+            return {**common, "message": {"mid": f"m_{index}", "text": "Hello"}}
+        case 1:
+            return {
+                **common,
+                "message": {
+                    "mid": f"m_{index}",
+                    "attachments": [
+                        {
+                            "type": "image",
+                            "payload": {"url": "https://example.com/a.png"},
+                        }
+                    ],
+                    # Not exposed on the event, so never read
+                    "nlp": {"entities": {"greetings": [{"confidence": 0.99}]}},
+                },
+            }
+        case 2:
+            return {
+                **common,
+                "postback": {"mid": f"m_{index}", "title": "Yes", "payload": "YES"},
+            }
+        case 3:
+            return {
+                **common,
+                "delivery": {"mids": [f"m_{index}"], "watermark": 1700000000000},
+            }
+    return {**common, "read": {"watermark": 1700000000000}}
+
+
+@pytest.mark.parametrize(
+    ("index", "expected"),
+    [
+        (
+            0,
+            MessageEvent(
+                PAGE_ID, "1234", PAGE_ID, 1700000000000, "m_0", "Hello", [], None, False
+            ),
+        ),
+        (
+            1,
+            MessageEvent(
+                PAGE_ID,
+                "1234",
+                PAGE_ID,
+                1700000000001,
+                "m_1",
+                None,
+                [{"type": "image", "url": "https://example.com/a.png"}],
+                None,
+                False,
+            ),
+        ),
+        (
+            2,
+            PostbackEvent(PAGE_ID, "1234", PAGE_ID, 1700000000002, "m_2", "Yes", "YES"),
+        ),
+        (
+            3,
+            DeliveryEvent(
+                PAGE_ID, "1234", PAGE_ID, 1700000000003, ["m_3"], 1700000000000
+            ),
+        ),
+        (4, ReadEvent(PAGE_ID, "1234", PAGE_ID, 1700000000004, 1700000000000)),
+    ],
+)
+def test_parse(index: int, expected: Any) -> None:
+    """Test each event type is parsed into its typed event."""
+    assert parse_messaging_event(PAGE_ID, raw_event(index)) == expected
+
+
+def test_parse_unsupported() -> None:
+    """Test an unsupported event type is skipped."""
+    assert parse_messaging_event(PAGE_ID, {"account_linking": {}}) is None
+
+
+def test_events_per_second(benchmark) -> None:
+    """Measure decoding and parsing a large recorded payload."""
+    payload = json.dumps(
+        {
+            "object": "page",
+            "entry": [
+                {
+                    "id": PAGE_ID,
+                    "time": 1700000000000,
+                    "messaging": [raw_event(index) for index in range(100)],
+                }
+                for _ in range(EVENTS_PER_PAYLOAD // 100)
+            ],
+        }
+    ).encode()
+
+    def _parse() -> int:
+        return sum(
+            parse_messaging_event(entry["id"], event) is not None
+            for entry in json_loads(payload)["entry"]
+            for event in entry["messaging"]
+        )
+
+    assert benchmark.pedantic(_parse, rounds=5) == EVENTS_PER_PAYLOAD
+    if benchmark.enabled:
+        benchmark.extra_info["events_per_second"] = round(
+            EVENTS_PER_PAYLOAD / benchmark.stats.stats.mean
+        )
@@ -0,0 +1,68 @@
+"""Tests for sending to many recipients at once."""
+from __future__ import annotations
+
+from collections.abc import Callable
+from typing import Any
+
+import pytest
+
+from custom_components.facebook_messenger.api import Facebook, FacebookApiError
+from custom_components.facebook_messenger.const import DEFAULT_SEND_CONCURRENCY
+from custom_components.facebook_messenger.fanout import async_fan_out
+from custom_components.facebook_messenger.ratelimit import RateLimiter
+from scripts.fake_graph import FakeGraph
+
+from .const import PAGE_ID
+
+GRAPH_LATENCY = 0.005
+
+
+@pytest.fixture
+def graph_options() -> list[str]:
+    """Give every Graph call a fixed latency, as a real round trip has."""
+    return ["--latency", str(GRAPH_LATENCY), "--jitter", "0"]
+
+
+async def test_partial_failure() -> None:
+    """Test a failed recipient is reported without stopping the others."""
+
+    async def _send(target: str) -> str:
+        if target == "bad":
+            raise FacebookApiError(400, {"code": 100, "message": "No such user"})
+        return target
+
+    result = await async_fan_out(["1", "bad", "2", "1"], _send, limit=2)
+
+    assert result.succeeded == ["1", "2"]
+    assert result.failed == ["bad"]
+    assert result.partial_failure
+
+
+@pytest.mark.parametrize("limit", [1, DEFAULT_SEND_CONCURRENCY])
+@pytest.mark.parametrize("targets", [1, 10, 100])
+def test_fan_out_wall_clock(
+    benchmark,
+    benchmark_async: Callable[..., Any],
+    facebook: Facebook,
+    fake_graph: FakeGraph,
+    targets: int,
+    limit: int,
+) -> None:
+    """Measure sending to a growing number of targets, in turn and at once."""
+    benchmark.group = f"fan-out to {targets} targets"
+    # Measure the fan-out, not the client side rate limit
+    facebook.rate_limiter = RateLimiter(rate=10000, burst=10000)
+    client = facebook.page()
+    recipients = [str(10**15 + index) for index in range(targets)]
+
+    async def _send(recipient: str):
+        return await client.send_message(PAGE_ID, {"id": recipient}, {"text": "Hi"})
+
+    async def _fan_out() -> None:
+        result = await async_fan_out(recipients, _send, limit=limit)
+        assert not result.failed
+
+    benchmark_async(_fan_out, rounds=3)
+
+    assert fake_graph.messages_sent
+    assert fake_graph.messages_sent % targets == 0
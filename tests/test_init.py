@@ -0,0 +1,124 @@
+"""Tests for setting up the Facebook Messenger integration."""
+from __future__ import annotations
+
+from typing import Any
+
+import pytest
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+import voluptuous as vol
+
+from custom_components.facebook_messenger import CONFIG_SCHEMA
+from custom_components.facebook_messenger.const import DOMAIN
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers import device_registry as dr, entity_registry as er
+
+
+def test_config_schema() -> None:
+    """Test a full configuration is accepted and normalised."""
+    config = CONFIG_SCHEMA(
+        {
+            DOMAIN: {
+                "send_concurrency": "5",
+                "webhook_queue_size": 100,
+                "webhook_workers": 2,
+                "webhook_overflow": "reject",
+                "metrics": "on",
+                "connection": {"limit": 50, "read_timeout": 5},
+                "apps": {1234567890: {"connection": {"limit_per_host": 8}}},
+                "graph_url": "http://127.0.0.1:8765/v17.0",
+                "webhook_record": "webhooks.jsonl.gz",
+            }
+        }
+    )
+
+    assert config[DOMAIN]["send_concurrency"] == 5
+    assert config[DOMAIN]["metrics"] is True
+    assert config[DOMAIN]["apps"] == {
+        "1234567890": {"connection": {"limit_per_host": 8}}
+    }
+    # App options only override what they set, so no defaults are filled in
+    assert config[DOMAIN]["connection"] == {"limit": 50, "read_timeout": 5.0}
+
+
+@pytest.mark.parametrize(
+    "config",
+    [
+        {"send_concurrency": 0},
+        {"webhook_workers": -1},
+        {"webhook_overflow": "drop_newest"},
+        {"connection": {"limit": "many"}},
+        {"connection": {"pool": 10}},
+        {"apps": {"1234567890": {"connection": {"read_timeout": -1}}}},
+        {"graph_url": "not a url"},
+        {"unknown": True},
+    ],
+)
+def test_config_schema_invalid(config: dict[str, Any]) -> None:
+    """Test invalid options are rejected."""
+    with pytest.raises(vol.Invalid):
+        CONFIG_SCHEMA({DOMAIN: config})
+
+
+async def test_one_device_per_entry(
+    hass: HomeAssistant, setup_integration: MockConfigEntry
+) -> None:
+    """Test the entities of an entry share one device, keyed on the entry."""
+    entity_registry = er.async_get(hass)
+    device_registry = dr.async_get(hass)
+    entities = er.async_entries_for_config_entry(
+        entity_registry, setup_integration.entry_id
+    )
+
+    devices = dr.async_entries_for_config_entry(
+        device_registry, setup_integration.entry_id
+    )
+    assert entities
+    assert len(devices) == 1
+    assert devices[0].identifiers == {(DOMAIN, setup_integration.entry_id)}
+    assert {entity.device_id for entity in entities} == {devices[0].id}
+
+
+@pytest.fixture
+def old_devices(
+    hass: HomeAssistant, config_entry: MockConfigEntry
+) -> list[dr.DeviceEntry]:
+    """Register the devices of an entry keyed on its entities' unique ids."""
+    device_registry = dr.async_get(hass)
+    entity_registry = er.async_get(hass)
+    devices = []
+
+    for platform, key in (("button", "matchASID"), ("sensor", "request_latency")):
+        unique_id = f"{config_entry.entry_id}_{key}"
+        device = device_registry.async_get_or_create(
+            config_entry_id=config_entry.entry_id, identifiers={(DOMAIN, unique_id)}
+        )
+        entity_registry.async_get_or_create(
+            platform,
+            DOMAIN,
+            unique_id,
+            config_entry=config_entry,
+            device_id=device.id,
+        )
+        devices.append(device)
+
+    return devices
+
+
+async def test_devices_migrated(
+    hass: HomeAssistant,
+    old_devices: list[dr.DeviceEntry],
+    setup_integration: MockConfigEntry,
+) -> None:
+    """Test devices keyed on unique ids are merged into the device of the entry."""
+    devices = dr.async_entries_for_config_entry(
+        dr.async_get(hass), setup_integration.entry_id
+    )
+    entities = er.async_entries_for_config_entry(
+        er.async_get(hass), setup_integration.entry_id
+    )
+
+    # The first device is kept, with the settings the user gave it
+    assert [device.id for device in devices] == [old_devices[0].id]
+    assert devices[0].identifiers == {(DOMAIN, setup_integration.entry_id)}
+    assert len(entities) == 2
+    assert {entity.device_id for entity in entities} == {old_devices[0].id}
@@ -0,0 +1,174 @@
+"""Tests for the durable outbox of the notify service."""
+from __future__ import annotations
+
+import time
+from typing import Any
+from unittest.mock import patch
+
+import pytest
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from custom_components.facebook_messenger.const import DOMAIN
+from custom_components.facebook_messenger.outbox import (
+    DEAD_LETTER_LIMIT,
+    EVENT_SEND_FAILED,
+    OUTBOX_MAX_ATTEMPTS,
+    OUTBOX_RETRY_DELAY,
+    OUTBOX_STORAGE_VERSION,
+)
+from custom_components.facebook_messenger.ratelimit import DEFAULT_THROTTLE_BACKOFF
+from homeassistant.core import HomeAssistant
+from scripts.fake_graph import FakeGraph, graph_error
+
+from .common import async_wait_for
+from .const import PAGE_ID
+
+STORAGE_KEY = f"{DOMAIN}.outbox.{PAGE_ID}"
+
+
+def queued_item(recipient: str) -> dict[str, Any]:
+    """Return a message queued for a recipient, as saved in the outbox."""
+    now = time.time()
+    return {
+        "id": f"id-{recipient}",
+        "recipient": recipient,
+        "message": {"text": "Queued"},
+        "attempts": 0,
+        "created": now,
+        "next_attempt": now,
+    }
+
+
+@pytest.fixture
+def stored_outbox(hass_storage: dict[str, Any]) -> None:
+    """Store messages left queued when Home Assistant last stopped."""
+    hass_storage[STORAGE_KEY] = {
+        "version": OUTBOX_STORAGE_VERSION,
+        "minor_version": 1,
+        "key": STORAGE_KEY,
+        "data": {"pending": [queued_item("1"), queued_item("2")], "dead_letters": []},
+    }
+
+
+@pytest.fixture
+def failing_sends(fake_graph: FakeGraph):
+    """Make Graph fail every message, returning the error to fail them with."""
+    error = [500, graph_error(2, "Service temporarily unavailable", transient=True)]
+
+    with patch.object(fake_graph, "_send_message", lambda *args: tuple(error)):
+        yield error
+
+
+async def test_replay_after_restart(
+    hass: HomeAssistant,
+    hass_storage: dict[str, Any],
+    stored_outbox: None,
+    fake_graph: FakeGraph,
+    setup_integration: MockConfigEntry,
+) -> None:
+    """Test messages saved when Home Assistant stopped are sent on start."""
+    outbox = hass.data[DOMAIN][setup_integration.entry_id].outbox
+
+    await async_wait_for(lambda: not outbox.pending)
+    assert fake_graph.messages_sent == 2
+
+    assert await hass.config_entries.async_unload(setup_integration.entry_id)
+    assert hass_storage[STORAGE_KEY]["data"]["pending"] == []
+
+
+async def test_saved_on_stop(
+    hass: HomeAssistant,
+    hass_storage: dict[str, Any],
+    fake_graph: FakeGraph,
+    setup_integration: MockConfigEntry,
+) -> None:
+    """Test messages not yet sent are saved when the entry is unloaded."""
+    outbox = hass.data[DOMAIN][setup_integration.entry_id].outbox
+    await outbox.async_stop()
+
+    outbox.async_enqueue(["1", "2", "1"], {"text": "Hello"})
+    assert await hass.config_entries.async_unload(setup_integration.entry_id)
+
+    pending = hass_storage[STORAGE_KEY]["data"]["pending"]
+    assert [item["recipient"] for item in pending] == ["1", "2"]
+    assert fake_graph.messages_sent == 0
+
+
+async def test_failed_message_rescheduled(
+    hass: HomeAssistant, failing_sends: list, setup_integration: MockConfigEntry
+) -> None:
+    """Test a failed message is retried later, backing off after each attempt."""
+    outbox = hass.data[DOMAIN][setup_integration.entry_id].outbox
+
+    started = time.time()
+    outbox.async_enqueue(["1234"], {"text": "Hello"})
+    await async_wait_for(lambda: outbox.pending[0]["attempts"] == 1)
+
+    item = outbox.pending[0]
+    assert item["error"] == "Service temporarily unavailable"
+    assert item["next_attempt"] - started >= OUTBOX_RETRY_DELAY
+    assert not outbox.dead_letters
+
+
+async def test_throttled_message_waits_for_reset(
+    hass: HomeAssistant, fake_graph: FakeGraph, setup_integration: MockConfigEntry
+) -> None:
+    """Test a throttled message is retried after the hold, without using an attempt."""
+    outbox = hass.data[DOMAIN][setup_integration.entry_id].outbox
+    fake_graph.args.throttle_rate = 1
+
+    outbox.async_enqueue(["1234"], {"text": "Hello"})
+    started = time.time()
+    await async_wait_for(lambda: "error" in outbox.pending[0])
+
+    item = outbox.pending[0]
+    assert item["attempts"] == 0
+    assert item["next_attempt"] - started > DEFAULT_THROTTLE_BACKOFF - 1
+    assert fake_graph.statuses[400] == 1
+    assert not outbox.dead_letters
+
+
+async def test_dead_letter_after_max_attempts(
+    hass: HomeAssistant, failing_sends: list, setup_integration: MockConfigEntry
+) -> None:
+    """Test a message that keeps failing is given up on and reported."""
+    outbox = hass.data[DOMAIN][setup_integration.entry_id].outbox
+    failed = []
+    hass.bus.async_listen(EVENT_SEND_FAILED, failed.append)
+
+    with patch("custom_components.facebook_messenger.outbox.OUTBOX_RETRY_DELAY", 0):
+        outbox.async_enqueue(["1234"], {"text": "Hello"})
+        await async_wait_for(lambda: outbox.dead_letters)
+    await hass.async_block_till_done()
+
+    assert not outbox.pending
+    assert outbox.dead_letters[0]["attempts"] == OUTBOX_MAX_ATTEMPTS
+    assert [event.data for event in failed] == [
+        {
+            "page_id": PAGE_ID,
+            "recipient": "1234",
+            "message": {"text": "Hello"},
+            "attempts": OUTBOX_MAX_ATTEMPTS,
+            "error": "Service temporarily unavailable",
+        }
+    ]
+
+
+async def test_dead_letters_capped(
+    hass: HomeAssistant, failing_sends: list, setup_integration: MockConfigEntry
+) -> None:
+    """Test only the most recent dead letters are kept."""
+    outbox = hass.data[DOMAIN][setup_integration.entry_id].outbox
+    failed = []
+    hass.bus.async_listen(EVENT_SEND_FAILED, failed.append)
+    # Rejected for good, so given up on after the first attempt
+    failing_sends[:] = [400, graph_error(100, "Invalid parameter")]
+    recipients = [str(index) for index in range(DEAD_LETTER_LIMIT + 5)]
+
+    outbox.async_enqueue(recipients, {"text": "Hello"})
+    await async_wait_for(lambda: not outbox.pending)
+    await hass.async_block_till_done()
+
+    assert len(failed) == len(recipients)
+    assert [item["recipient"] for item in outbox.dead_letters] == recipients[5:]
+    assert all(item["attempts"] == 1 for item in outbox.dead_letters)
@@ -0,0 +1,125 @@
+"""Tests for rate limiting Graph API calls."""
+from __future__ import annotations
+
+from collections.abc import Callable
+from typing import Any
+
+import pytest
+
+from custom_components.facebook_messenger.api import Facebook
+from custom_components.facebook_messenger.fanout import async_fan_out
+from custom_components.facebook_messenger.ratelimit import (
+    RateLimiter,
+    parse_usage_headers,
+)
+from scripts.fake_graph import FakeGraph
+
+from .const import PAGE_ID
+
+CALL_LIMIT = 100
+MESSAGES = 200
+
+
+class UnlimitedRateLimiter(RateLimiter):
+    """Lets every call through, ignoring usage headers and throttling."""
+
+    async def async_acquire(self, key: str) -> None:
+        """Never wait."""
+
+    def update(self, key: str, headers) -> None:
+        """Ignore usage headers."""
+
+    def throttled(self, key: str, retry_after: float | None = None) -> float:
+        """Ignore throttling."""
+        return 0.0
+
+
+@pytest.fixture
+def graph_options() -> list[str]:
+    """Throttle calls beyond CALL_LIMIT a second, as Graph does per hour."""
+    return [
+        "--latency",
+        "0.005",
+        "--jitter",
+        "0",
+        "--call-limit",
+        str(CALL_LIMIT),
+        "--usage-window",
+        "1",
+        "--enforce-limit",
+    ]
+
+
+def test_parse_usage_headers() -> None:
+    """Test the highest usage and regain time are taken from all headers."""
+    headers = {
+        "X-App-Usage": '{"call_count": 10, "total_time": 20, "total_cputime": 5}',
+        "X-Business-Use-Case-Usage": (
+            '{"1": [{"type": "messenger", "call_count": 80,'
+            ' "estimated_time_to_regain_access": 2}]}'
+        ),
+        "X-Page-Usage": "not json",
+    }
+
+    assert parse_usage_headers(headers) == (80, 120)
+    assert parse_usage_headers({}) is None
+
+
+def test_slows_down_near_limit() -> None:
+    """Test the rate is scaled down as usage passes the threshold."""
+    limiter = RateLimiter(rate=100, burst=10)
+
+    limiter.update("page:1", {"X-Page-Usage": '{"call_count": 50}'})
+    assert limiter.utilisation["page:1"]["rate"] == 100
+
+    limiter.update("page:1", {"X-Page-Usage": '{"call_count": 90}'})
+    assert limiter.utilisation["page:1"]["rate"] == pytest.approx(40)
+
+    assert limiter.throttled("page:1", 5) == pytest.approx(5, abs=0.1)
+    assert limiter.utilisation["page:1"]["usage"] == 100
+
+
+@pytest.mark.parametrize("limited", [False, True], ids=["unlimited", "limited"])
+def test_throttling_simulation(
+    benchmark,
+    benchmark_async: Callable[..., Any],
+    facebook: Facebook,
+    fake_graph: FakeGraph,
+    limited: bool,
+) -> None:
+    """Measure a burst of sends against a Graph that throttles past its limit."""
+    benchmark.group = "throttling simulation"
+    # Left alone the limiter would use up the whole allowance, so only the
+    # usage headers keep it from being throttled
+    facebook.rate_limiter = (
+        RateLimiter(rate=CALL_LIMIT, burst=10) if limited else UnlimitedRateLimiter()
+    )
+    client = facebook.page()
+    result = None
+
+    async def _send(recipient: str):
+        return await client.send_message(PAGE_ID, {"id": recipient}, {"text": "Hi"})
+
+    async def _burst() -> None:
+        nonlocal result
+        recipients = [str(10**15 + index) for index in range(MESSAGES)]
+        result = await async_fan_out(recipients, _send, limit=20)
+
+    benchmark_async(_burst, rounds=1)
+
+    throttled = fake_graph.statuses[400]
+    failed = len(result.failed)
+    if benchmark.enabled:
+        benchmark.extra_info.update(
+            delivered_per_second=round(
+                len(result.succeeded) / benchmark.stats.stats.mean, 1
+            ),
+            throttled_responses=throttled,
+            failed=failed,
+        )
+
+    if limited:
+        assert throttled == 0
+        assert failed == 0
+    else:
+        assert throttled > 0
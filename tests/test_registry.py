@@ -0,0 +1,114 @@
+"""Tests for the app registry shared by all config entries."""
+from __future__ import annotations
+
+import asyncio
+from datetime import timedelta
+import time
+from typing import Any
+from unittest.mock import Mock, patch
+
+from pytest_homeassistant_custom_component.common import (
+    MockConfigEntry,
+    async_fire_time_changed,
+)
+
+from custom_components.facebook_messenger.api import APP_CACHE_TTL
+from custom_components.facebook_messenger.const import (
+    CONF_APP_NAME,
+    DOMAIN,
+    SAVE_DELAY,
+    STORAGE_KEY,
+)
+from custom_components.facebook_messenger.registry import AppRegistry
+from homeassistant.core import HomeAssistant
+from homeassistant.setup import async_setup_component
+from homeassistant.util import dt as dt_util
+from scripts.fake_graph import FakeGraph
+
+from .const import CLIENT_ID
+
+OTHER_PAGE_ID = "100000000000001"
+
+
+async def test_entries_share_registry(
+    hass: HomeAssistant,
+    setup_credentials: None,
+    config_entry: MockConfigEntry,
+    integration_config: dict[str, Any],
+) -> None:
+    """Test entries share one registry, loaded from storage once."""
+    other_entry = MockConfigEntry(
+        domain=DOMAIN,
+        title="Test page 1",
+        unique_id=OTHER_PAGE_ID,
+        data={
+            **config_entry.data,
+            "page_id": OTHER_PAGE_ID,
+            "page_name": "Test page 1",
+            "page_token": f"page-token-{OTHER_PAGE_ID}",
+        },
+    )
+    other_entry.add_to_hass(hass)
+
+    with patch.object(
+        AppRegistry, "async_load", autospec=True, side_effect=AppRegistry.async_load
+    ) as load:
+        assert await async_setup_component(hass, "webhook", {})
+        assert await async_setup_component(hass, DOMAIN, integration_config)
+        await hass.async_block_till_done()
+
+    first = hass.data[DOMAIN][config_entry.entry_id].registry
+    assert first is hass.data[DOMAIN][other_entry.entry_id].registry
+    assert load.await_count == 1
+
+
+async def test_saves_are_delayed(
+    hass: HomeAssistant,
+    hass_storage: dict[str, Any],
+    setup_integration: MockConfigEntry,
+) -> None:
+    """Test changes are batched into one save after SAVE_DELAY."""
+    registry = hass.data[DOMAIN][setup_integration.entry_id].registry
+    # Let the save scheduled during setup happen first
+    async_fire_time_changed(hass, dt_util.utcnow() + timedelta(seconds=SAVE_DELAY))
+    await hass.async_block_till_done()
+
+    with patch.object(
+        registry._store, "_async_write_data", wraps=registry._store._async_write_data
+    ) as write:
+        registry.async_set_page_token("1", "token-1")
+        registry.async_set_page_token("2", "token-2")
+        await hass.async_block_till_done()
+        assert write.call_count == 0
+
+        async_fire_time_changed(hass, dt_util.utcnow() + timedelta(seconds=SAVE_DELAY))
+        await hass.async_block_till_done()
+
+    assert write.call_count == 1
+    page_tokens = hass_storage[STORAGE_KEY]["data"]["page_tokens"]
+    assert page_tokens["1"]["access_token"] == "token-1"
+    assert page_tokens["2"]["access_token"] == "token-2"
+
+
+async def test_app_info_refreshed(
+    hass: HomeAssistant, fake_graph: FakeGraph, setup_integration: MockConfigEntry
+) -> None:
+    """Test concurrent updates share a request, and a renamed app is picked up."""
+    coordinator = hass.data[DOMAIN][setup_integration.entry_id]
+    registry = coordinator.registry
+    fb = coordinator.fb
+    # Setup fetched the app info, move past its expiry in the response cache
+    expired = 0
+    clock = Mock(wraps=time, monotonic=lambda: time.monotonic() + expired)
+
+    with patch("custom_components.facebook_messenger.response_cache.time", clock):
+        expired = APP_CACHE_TTL
+        requests = fake_graph.requests["GET /{id}"]
+        await asyncio.gather(*(registry.async_update_app_info(fb) for _ in range(3)))
+        assert fake_graph.requests["GET /{id}"] - requests == 1
+
+        fake_graph.app["name"] = "Renamed app"
+        expired = 2 * APP_CACHE_TTL
+        await registry.async_update_app_info(fb)
+
+    assert registry.async_get_app(CLIENT_ID)[CONF_APP_NAME] == "Renamed app"
@@ -0,0 +1,207 @@
+"""Tests for retries of Graph API calls."""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable
+import statistics
+import time
+from typing import Any
+
+import pytest
+
+from custom_components.facebook_messenger.api import (
+    Facebook,
+    FacebookApiError,
+    build_message_body,
+    is_retryable_error,
+)
+from custom_components.facebook_messenger.fanout import async_fan_out
+from custom_components.facebook_messenger.ratelimit import RateLimiter
+from custom_components.facebook_messenger.retry import (
+    GET_RETRY_POLICY,
+    CircuitBreaker,
+    RetryPolicy,
+    async_retry,
+)
+from scripts.fake_graph import FakeGraph
+
+from .const import PAGE_ID
+
+SHORT_POLICY = RetryPolicy(
+    attempts=3, base_delay=0, max_delay=0, deadline=0.2, retry_ambiguous=True
+)
+# SEND_RETRY_POLICY scaled down, so the simulation runs in well under a second
+FAST_SEND_POLICY = RetryPolicy(
+    attempts=3, base_delay=0.01, max_delay=0.1, deadline=3, retry_ambiguous=False
+)
+NO_RETRY_POLICY = RetryPolicy(
+    attempts=1, base_delay=0, max_delay=0, deadline=3, retry_ambiguous=False
+)
+ERROR_RATE = 0.1
+MESSAGES = 200
+
+
+def throttling_error(retry_after: float) -> FacebookApiError:
+    """Return a Graph throttling error."""
+    return FacebookApiError(
+        400,
+        {"code": 4, "message": "Application request limit reached"},
+        retry_after=retry_after,
+    )
+
+
+async def test_throttled_past_deadline_raises_graph_error() -> None:
+    """Test a throttle longer than the deadline re-raises the Graph error."""
+    breaker = CircuitBreaker(failure_threshold=1)
+    calls = 0
+
+    async def _call():
+        nonlocal calls
+        calls += 1
+        raise throttling_error(60)
+
+    started = time.monotonic()
+    with pytest.raises(FacebookApiError) as exc_info:
+        await async_retry(
+            _call,
+            policy=SHORT_POLICY,
+            is_retryable=is_retryable_error,
+            breaker=breaker,
+        )
+
+    assert exc_info.value.throttled
+    assert calls == 1
+    assert time.monotonic() - started < SHORT_POLICY.deadline
+    assert breaker.failures == 0
+    assert not breaker.is_open
+
+
+async def test_acquire_past_deadline_raises_last_error() -> None:
+    """Test waiting on the limiter past the deadline re-raises the last error."""
+    breaker = CircuitBreaker(failure_threshold=1)
+    acquired = 0
+
+    async def _acquire(remaining: float):
+        nonlocal acquired
+        acquired += 1
+        if acquired > 1:
+            await asyncio.sleep(60)
+
+    async def _call():
+        raise throttling_error(0.01)
+
+    with pytest.raises(FacebookApiError):
+        await async_retry(
+            _call,
+            policy=SHORT_POLICY,
+            is_retryable=is_retryable_error,
+            breaker=breaker,
+            acquire=_acquire,
+        )
+
+    assert acquired == 2
+    assert breaker.failures == 0
+
+
+async def test_acquire_timeout_is_not_a_breaker_failure() -> None:
+    """Test a call that never got past the limiter is not counted as a failure."""
+    breaker = CircuitBreaker(failure_threshold=1)
+
+    async def _call():
+        raise AssertionError("called while the limiter was held")
+
+    with pytest.raises(asyncio.TimeoutError):
+        await async_retry(
+            _call,
+            policy=SHORT_POLICY,
+            is_retryable=is_retryable_error,
+            breaker=breaker,
+            acquire=lambda remaining: asyncio.sleep(60),
+        )
+
+    assert breaker.failures == 0
+    assert not breaker.is_open
+
+
+async def test_throttled_graph_call(facebook: Facebook, fake_graph: FakeGraph) -> None:
+    """Test calls held past their deadline fail at once with a throttling error."""
+    fake_graph.args.throttle_rate = 1
+    client = facebook.page()
+    url = f"{client.base_url}/{PAGE_ID}"
+
+    started = time.monotonic()
+    with pytest.raises(FacebookApiError) as exc_info:
+        await client._get(url)
+
+    assert exc_info.value.code == 4
+    # The limiter holds the page for the default backoff, past the deadline
+    assert exc_info.value.retry_after > GET_RETRY_POLICY.deadline
+    assert facebook.rate_limiter.blocked_for(f"page:{PAGE_ID}") > 0
+    assert fake_graph.statuses[400] == 1
+
+    # Later calls are not sent, and say when to try again
+    with pytest.raises(FacebookApiError) as exc_info:
+        await client._get(url)
+
+    assert exc_info.value.throttled
+    assert exc_info.value.retry_after > GET_RETRY_POLICY.deadline
+    assert time.monotonic() - started < 1
+    assert sum(fake_graph.statuses.values()) == 1
+    assert facebook.circuit_breaker.failures == 0
+    assert not facebook.circuit_breaker.is_open
+
+
+@pytest.mark.parametrize(
+    "policy", [NO_RETRY_POLICY, FAST_SEND_POLICY], ids=["no_retry", "retry"]
+)
+def test_fault_injection(
+    benchmark,
+    benchmark_async: Callable[..., Any],
+    facebook: Facebook,
+    fake_graph: FakeGraph,
+    policy: RetryPolicy,
+) -> None:
+    """Measure delivery and p99 latency of sends while Graph fails transiently."""
+    benchmark.group = "fault injection"
+    fake_graph.args.error_rate = ERROR_RATE
+    fake_graph.args.latency = 0.005
+    # Only faults are measured, so the limiter never holds a send back
+    facebook.rate_limiter = RateLimiter(rate=100 * MESSAGES, burst=MESSAGES)
+    client = facebook.page()
+    url = f"{client.base_url}/{PAGE_ID}/messages"
+    latencies: list[float] = []
+    result = None
+
+    async def _send(recipient: str):
+        started = time.monotonic()
+        try:
+            return await client._post(
+                url,
+                json=build_message_body({"id": recipient}, {"text": "Hi"}),
+                retry_policy=policy,
+            )
+        finally:
+            latencies.append(time.monotonic() - started)
+
+    async def _burst() -> None:
+        nonlocal result
+        latencies.clear()
+        recipients = [str(10**15 + index) for index in range(MESSAGES)]
+        result = await async_fan_out(recipients, _send, limit=20)
+
+    benchmark_async(_burst, rounds=1)
+
+    success_rate = len(result.succeeded) / MESSAGES
+    p99 = statistics.quantiles(latencies, n=100)[98]
+    if benchmark.enabled:
+        benchmark.extra_info.update(
+            success_rate=round(success_rate, 3), p99_latency=round(p99, 3)
+        )
+
+    assert fake_graph.statuses[500] > 0
+    if policy.attempts > 1:
+        # A send only fails if all its attempts do, one in a thousand
+        assert success_rate >= 0.98
+        assert p99 < policy.deadline
+    else:
+        assert success_rate < 1
@@ -0,0 +1,63 @@
+"""Tests for the Facebook Messenger services."""
+from __future__ import annotations
+
+from unittest.mock import patch
+
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from custom_components.facebook_messenger.const import DOMAIN
+from custom_components.facebook_messenger.services import (
+    ATTR_IDS,
+    EVENT_IDS_RESOLVED,
+    SERVICE_RESOLVE_IDS,
+)
+from homeassistant.core import HomeAssistant
+from scripts.fake_graph import FakeGraph
+
+from .common import async_wait_for
+from .const import PAGE_ID
+
+
+async def test_resolve_ids(
+    hass: HomeAssistant, fake_graph: FakeGraph, setup_integration: MockConfigEntry
+) -> None:
+    """Test IDs are looked up in one batch and later sends use the cached PSIDs."""
+    resolver = hass.data[DOMAIN][setup_integration.entry_id].id_resolver
+    resolved = []
+    hass.bus.async_listen(EVENT_IDS_RESOLVED, resolved.append)
+
+    await hass.services.async_call(
+        DOMAIN,
+        SERVICE_RESOLVE_IDS,
+        {"ids": ["5551"], "names": {"john": "5552"}},
+        blocking=True,
+    )
+    await hass.async_block_till_done()
+
+    john = f"5552{PAGE_ID[-4:]}"
+    assert [event.data for event in resolved] == [
+        {ATTR_IDS: {"5551": {PAGE_ID: f"5551{PAGE_ID[-4:]}"}, "5552": {PAGE_ID: john}}}
+    ]
+    assert fake_graph.requests["POST /"] == 1
+    assert fake_graph.requests["GET /{id}/ids_for_pages"] == 2
+
+    recipients = []
+    send_message = fake_graph._send_message
+
+    def _send_message(page_id, params):
+        recipients.append(params["recipient"]["id"])
+        return send_message(page_id, params)
+
+    hits = resolver.hits
+    with patch.object(fake_graph, "_send_message", _send_message):
+        await hass.services.async_call(
+            "notify",
+            "facebook_messenger_test_page_0",
+            {"message": "Hello", "target": ["john"]},
+            blocking=True,
+        )
+        await async_wait_for(lambda: recipients)
+
+    assert recipients == [john]
+    assert resolver.hits == hits + 1
+    assert fake_graph.requests["GET /{id}/ids_for_pages"] == 2
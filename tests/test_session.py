@@ -0,0 +1,106 @@
+"""Tests for the Graph sessions shared per app."""
+from __future__ import annotations
+
+from collections.abc import AsyncGenerator, Callable
+from typing import Any
+
+import aiohttp
+import pytest
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from custom_components.facebook_messenger.api import Facebook
+from custom_components.facebook_messenger.const import (
+    DATA_SESSIONS,
+    DEFAULT_CONNECTION_LIMIT_PER_HOST,
+    DOMAIN,
+)
+from custom_components.facebook_messenger.fanout import async_fan_out
+from custom_components.facebook_messenger.ratelimit import RateLimiter
+from custom_components.facebook_messenger.session import create_session
+from homeassistant.config_entries import ConfigEntryState
+from homeassistant.core import HomeAssistant
+from scripts.fake_graph import FakeGraph
+
+from .const import PAGE_ID
+
+OTHER_PAGE_ID = "100000000000001"
+MESSAGES = 500
+# As many sends as the dedicated pool has connections to Graph
+CONCURRENCY = DEFAULT_CONNECTION_LIMIT_PER_HOST
+
+
+@pytest.fixture
+async def dedicated_session() -> AsyncGenerator[aiohttp.ClientSession, None]:
+    """Return a dedicated Graph session with the default connection options."""
+    session = create_session({})
+    yield session
+    await session.close()
+
+
+async def test_entries_of_an_app_share_limits(
+    hass: HomeAssistant, setup_integration: MockConfigEntry
+) -> None:
+    """Test entries of one app share its session, rate limiter and breaker."""
+    other_entry = MockConfigEntry(
+        domain=DOMAIN,
+        title="Test page 1",
+        unique_id=OTHER_PAGE_ID,
+        data={
+            **setup_integration.data,
+            "page_id": OTHER_PAGE_ID,
+            "page_name": "Test page 1",
+            "page_token": f"page-token-{OTHER_PAGE_ID}",
+        },
+    )
+    other_entry.add_to_hass(hass)
+    assert await hass.config_entries.async_setup(other_entry.entry_id)
+    await hass.async_block_till_done()
+    assert other_entry.state is ConfigEntryState.LOADED
+
+    first = hass.data[DOMAIN][setup_integration.entry_id].fb
+    second = hass.data[DOMAIN][other_entry.entry_id].fb
+    assert first.client_session is second.client_session
+    assert first.rate_limiter is second.rate_limiter
+    assert first.circuit_breaker is second.circuit_breaker
+    assert hass.data[DOMAIN][DATA_SESSIONS][first.client_id].users == 2
+
+    assert await hass.config_entries.async_unload(other_entry.entry_id)
+    assert hass.data[DOMAIN][DATA_SESSIONS][first.client_id].users == 1
+
+    assert await hass.config_entries.async_unload(setup_integration.entry_id)
+    assert first.client_id not in hass.data[DOMAIN][DATA_SESSIONS]
+    assert first.client_session.closed
+
+
+@pytest.mark.parametrize("dedicated", [False, True], ids=["shared", "dedicated"])
+def test_send_throughput(
+    benchmark,
+    benchmark_async: Callable[..., Any],
+    dedicated_session: aiohttp.ClientSession,
+    facebook: Facebook,
+    fake_graph: FakeGraph,
+    dedicated: bool,
+) -> None:
+    """Measure sustained sends through HA's shared session and a dedicated one."""
+    benchmark.group = "session send throughput"
+    fake_graph.args.latency = 0.005
+    # The sessions are measured, not the limiter pacing the sends
+    facebook.rate_limiter = RateLimiter(rate=100 * MESSAGES, burst=MESSAGES)
+    if dedicated:
+        facebook.client_session = dedicated_session
+    client = facebook.page()
+
+    async def _send(recipient: str):
+        return await client.send_message(PAGE_ID, {"id": recipient}, {"text": "Hi"})
+
+    async def _sends() -> None:
+        recipients = [str(10**15 + index) for index in range(MESSAGES)]
+        result = await async_fan_out(recipients, _send, limit=CONCURRENCY)
+        assert not result.failed
+
+    benchmark_async(_sends, rounds=3)
+
+    if benchmark.enabled:
+        benchmark.extra_info["sends_per_second"] = round(
+            MESSAGES / benchmark.stats.stats.mean
+        )
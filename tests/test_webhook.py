@@ -0,0 +1,206 @@
+"""Tests for the Facebook Messenger webhook handler."""
+from __future__ import annotations
+
+from collections.abc import Callable
+import json
+import logging
+import time
+from typing import Any
+
+import pytest
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from custom_components.facebook_messenger.const import DATA_WEBHOOKS, DOMAIN
+from custom_components.facebook_messenger.webhook import WebhookHandler
+from homeassistant.components.webhook import DOMAIN as WEBHOOK_DOMAIN
+from homeassistant.core import HomeAssistant
+
+from .common import (
+    MockRequest,
+    async_wait_for,
+    message_event,
+    sign,
+    signed_request,
+    webhook_payload,
+)
+from .const import CLIENT_SECRET, PAGE_ID
+
+OTHER_PAGE_ID = "100000000000001"
+ENTRIES_PER_PAYLOAD = 100
+PAYLOADS_PER_ROUND = 100
+REQUESTS_PER_ROUND = 2000
+
+
+class PageSink:
+    """Stands in for a page coordinator, counting the entries routed to it."""
+
+    def __init__(self, page_id: str) -> None:
+        """Initialize the sink."""
+        self.page_id = page_id
+        self.entries = 0
+
+    async def async_enqueue_webhook_entry(
+        self, object: str, entry: dict, received: float | None = None
+    ) -> bool:
+        """Accept an entry."""
+        self.entries += 1
+        return True
+
+
+def page_ids(count: int) -> list[str]:
+    """Return the ids of a number of pages."""
+    return [str(100000000000000 + index) for index in range(count)]
+
+
+def entries_payload(pages: list[str], count: int) -> bytes:
+    """Return a webhook payload of entries spread over pages."""
+    timestamp = int(time.time() * 1000)
+    return json.dumps(
+        {
+            "object": "page",
+            "entry": [
+                {
+                    "id": (page_id := pages[index % len(pages)]),
+                    "time": timestamp,
+                    "messaging": [message_event(page_id)],
+                }
+                for index in range(count)
+            ],
+        }
+    ).encode()
+
+
+@pytest.mark.parametrize("pages", [1, 50, 500])
+def test_routing(benchmark_async: Callable[..., Any], pages: int) -> None:
+    """Measure routing payloads of many entries to one of many pages."""
+    handler = WebhookHandler(app_secret=CLIENT_SECRET)
+    sinks = [PageSink(page_id) for page_id in page_ids(pages)]
+    for sink in sinks:
+        handler.attach(sink)
+
+    # Every other entry is for a page of another app, and is skipped
+    foreign = page_ids(2 * pages)[pages:]
+    targets = [page_id for pair in zip(page_ids(pages), foreign) for page_id in pair]
+    requests = [
+        signed_request(entries_payload(targets, ENTRIES_PER_PAYLOAD))
+        for _ in range(PAYLOADS_PER_ROUND)
+    ]
+
+    async def _route() -> None:
+        for request in requests:
+            response = await handler.handle_post(None, request)
+            assert response.status == 200
+
+    benchmark_async(_route)
+
+    routed = sum(sink.entries for sink in sinks)
+    assert routed
+    assert routed % (ENTRIES_PER_PAYLOAD // 2 * PAYLOADS_PER_ROUND) == 0
+    assert all(sink.entries for sink in sinks[: ENTRIES_PER_PAYLOAD // 2])
+
+
+def load_request(kind: str, payload: bytes) -> MockRequest:
+    """Return a valid or invalid webhook POST of a payload."""
+    if kind == "valid":
+        return signed_request(payload)
+    if kind == "unsigned":
+        return MockRequest(body=payload)
+    if kind == "forged":
+        return signed_request(payload, app_secret="not-the-secret")
+    # Signed, but not JSON
+    body = payload[:-1]
+    return MockRequest(body=body, headers={"X-Hub-Signature-256": sign(body)})
+
+
+@pytest.mark.parametrize(
+    ("kind", "status"),
+    [("valid", 200), ("unsigned", 401), ("forged", 401), ("junk", 400)],
+)
+def test_post_load(
+    benchmark, benchmark_async: Callable[..., Any], kind: str, status: int
+) -> None:
+    """Measure requests per second of valid and invalid webhook POSTs."""
+    benchmark.group = "webhook POSTs"
+    handler = WebhookHandler(app_secret=CLIENT_SECRET)
+    sink = PageSink(PAGE_ID)
+    handler.attach(sink)
+
+    payload = entries_payload([PAGE_ID], 10)
+    requests = [load_request(kind, payload) for _ in range(REQUESTS_PER_ROUND)]
+
+    async def _post() -> None:
+        for request in requests:
+            response = await handler.handle_post(None, request)
+            assert response.status == status
+
+    benchmark_async(_post)
+    if benchmark.enabled:
+        benchmark.extra_info["requests_per_second"] = round(
+            REQUESTS_PER_ROUND / benchmark.stats.stats.mean
+        )
+
+    # Only verified payloads reach the pages
+    assert bool(sink.entries) is (kind == "valid")
+
+
+@pytest.mark.parametrize("kind", ["unsigned", "forged"])
+async def test_rejected_post_not_logged_as_warning(
+    caplog: pytest.LogCaptureFixture, kind: str
+) -> None:
+    """Test anyone can POST to the webhook without flooding the log."""
+    handler = WebhookHandler(app_secret=CLIENT_SECRET)
+    request = load_request(kind, entries_payload([PAGE_ID], 1))
+
+    with caplog.at_level(logging.DEBUG):
+        response = await handler.handle_post(None, request)
+
+    assert response.status == 401
+    assert caplog.records
+    assert all(record.levelno < logging.WARNING for record in caplog.records)
+
+
+async def test_webhook_shared_by_pages_of_an_app(
+    hass: HomeAssistant, setup_integration: MockConfigEntry
+) -> None:
+    """Test the app webhook stays registered until its last page is unloaded."""
+    other_entry = MockConfigEntry(
+        domain=DOMAIN,
+        title="Test page 1",
+        unique_id=OTHER_PAGE_ID,
+        data={
+            **setup_integration.data,
+            "page_id": OTHER_PAGE_ID,
+            "page_name": "Test page 1",
+            "page_token": f"page-token-{OTHER_PAGE_ID}",
+        },
+    )
+    other_entry.add_to_hass(hass)
+    assert await hass.config_entries.async_setup(other_entry.entry_id)
+    await hass.async_block_till_done()
+
+    handlers = hass.data[DOMAIN][DATA_WEBHOOKS]
+    assert len(handlers) == 1
+    webhook_id, handler = next(iter(handlers.items()))
+    assert set(handler.coordinators) == {PAGE_ID, OTHER_PAGE_ID}
+
+    # Unloading one page keeps the webhook routing for the other
+    assert await hass.config_entries.async_unload(setup_integration.entry_id)
+    assert webhook_id in hass.data[WEBHOOK_DOMAIN]
+    assert set(handler.coordinators) == {OTHER_PAGE_ID}
+
+    fired = []
+    hass.bus.async_listen(f"{DOMAIN}_message", fired.append)
+    registered = hass.data[WEBHOOK_DOMAIN][webhook_id]["handler"]
+    payload = webhook_payload(
+        {PAGE_ID: [message_event()], OTHER_PAGE_ID: [message_event(OTHER_PAGE_ID)]}
+    )
+    response = await registered(hass, webhook_id, signed_request(payload))
+    assert response.status == 200
+    await async_wait_for(lambda: fired)
+    await hass.async_block_till_done()
+    assert [event.data["page_id"] for event in fired] == [OTHER_PAGE_ID]
+
+    # The last page unregisters it
+    assert await hass.config_entries.async_unload(other_entry.entry_id)
+    assert webhook_id not in hass.data[WEBHOOK_DOMAIN]
+    assert not handlers